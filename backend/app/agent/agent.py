@@ -1,8 +1,11 @@
 from langchain.agents import create_agent
 from langchain.chat_models import init_chat_model
-from langgraph.checkpoint.memory import InMemorySaver
 
+from app.agent.checkpointer import BoundedCheckpointSaver
+from app.agent.compaction import compaction_middleware
+from app.agent.fake_model import ScriptedChatModel
 from app.agent.prompts import SYSTEM_PROMPT
+from app.agent.response_cache import ResponseCache, load_embedder
 from app.agent.tools import AGENT_TOOLS
 from app.core.config import get_settings
 
@@ -14,7 +17,8 @@ def create_neighborhood_agent():
     The agent is configured with:
     - GPT-5-nano model (or configured alternative)
     - All neighborhood exploration tools
-    - In-memory checkpointer for conversation persistence
+    - Bounded, database-backed checkpointer for conversation persistence
+    - History compaction (old tool results trimmed, older turns summarized)
     - Custom system prompt for neighborhood guidance
 
     Returns:
@@ -26,15 +30,37 @@ def create_neighborhood_agent():
     # This allows easy switching between providers via config
     model_name = getattr(settings, "AGENT_MODEL", "openai:gpt-5-nano")
 
-    model = init_chat_model(
-        model_name,
-        temperature=0.3,  # Slightly creative but mostly factual
-        max_tokens=2048,
-    )
+    if model_name == "fake":
+        # Scripted offline model for load tests and local development
+        model = ScriptedChatModel(
+            token_delay=settings.AGENT_FAKE_TOKEN_DELAY,
+            response_tokens=settings.AGENT_FAKE_RESPONSE_TOKENS,
+        )
+    else:
+        model = init_chat_model(
+            model_name,
+            temperature=0.3,  # Slightly creative but mostly factual
+            max_tokens=2048,
+        )
 
     # Create checkpointer for conversation memory
-    # In production, replace with PostgresSaver for persistence across restarts
-    checkpointer = InMemorySaver()
+    checkpointer = get_checkpointer()
+
+    # Keep per-turn context bounded as conversations grow
+    middleware = []
+    if settings.AGENT_COMPACTION:
+        summary_model = (
+            init_chat_model(settings.AGENT_SUMMARY_MODEL, temperature=0)
+            if settings.AGENT_SUMMARY_MODEL
+            else model
+        )
+        middleware = compaction_middleware(
+            summary_model,
+            tool_result_trigger_tokens=settings.AGENT_TOOL_RESULT_TRIGGER_TOKENS,
+            keep_tool_results=settings.AGENT_KEEP_TOOL_RESULTS,
+            summary_trigger_tokens=settings.AGENT_SUMMARY_TRIGGER_TOKENS,
+            keep_messages=settings.AGENT_SUMMARY_KEEP_MESSAGES,
+        )
 
     # Create the agent with tools
     agent = create_agent(
@@ -42,6 +68,7 @@ def create_neighborhood_agent():
         tools=AGENT_TOOLS,
         system_prompt=SYSTEM_PROMPT,
         checkpointer=checkpointer,
+        middleware=middleware,
     )
 
     return agent
@@ -50,6 +77,45 @@ def create_neighborhood_agent():
 # Create a singleton agent instance for the application
 # This is initialized once at module load time
 _agent_instance = None
+_checkpointer = None
+_response_cache = None
+
+
+def get_checkpointer() -> BoundedCheckpointSaver:
+    """
+    Get the singleton conversation checkpointer.
+
+    Threads are keyed as user_id:thread_id, kept in memory up to
+    AGENT_MAX_THREADS and stored in the agent_checkpoints tables.
+    """
+    global _checkpointer
+    if _checkpointer is None:
+        settings = get_settings()
+        _checkpointer = BoundedCheckpointSaver(
+            max_threads=settings.AGENT_MAX_THREADS,
+            ttl=settings.AGENT_THREAD_TTL_HOURS * 3600,
+            max_checkpoints=settings.AGENT_MAX_CHECKPOINTS_PER_THREAD,
+            persist=settings.AGENT_CHECKPOINT_PERSIST,
+        )
+    return _checkpointer
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Get the singleton first-turn response cache.
+
+    Loads AGENT_RESPONSE_CACHE_EMBEDDING_MODEL on first use when it is set.
+    """
+    global _response_cache
+    if _response_cache is None:
+        settings = get_settings()
+        _response_cache = ResponseCache(
+            maxsize=settings.AGENT_RESPONSE_CACHE_MAX_ENTRIES,
+            ttl=settings.AGENT_RESPONSE_CACHE_TTL,
+            similarity=settings.AGENT_RESPONSE_CACHE_SIMILARITY,
+            embedder=load_embedder(settings.AGENT_RESPONSE_CACHE_EMBEDDING_MODEL),
+        )
+    return _response_cache
 
 
 def get_agent():
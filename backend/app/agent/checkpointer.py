@@ -0,0 +1,392 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+
+from langgraph.checkpoint.memory import InMemorySaver
+from sqlalchemy import func
+
+from app.core.db import SessionLocal
+from app.models.models import AgentCheckpoint, AgentCheckpointBlob
+
+logger = logging.getLogger(__name__)
+
+
+def _as_utc(dt: datetime) -> datetime:
+    # SQLite hands back naive datetimes for timezone-aware columns
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+class BoundedCheckpointSaver(InMemorySaver):
+    """
+    InMemorySaver whose memory stays flat over long uptimes.
+
+    - Only the newest ``max_checkpoints`` checkpoints of each thread are kept;
+      older ones, their pending writes and unreferenced channel blobs are dropped.
+    - At most ``max_threads`` threads are resident; the least recently used one
+      is evicted first, and threads idle for ``ttl`` seconds are dropped.
+    - With ``persist``, every new checkpoint and the channel values it
+      introduced are written to the agent_checkpoints and agent_checkpoint_blobs
+      tables (pruned ones are deleted in the same transaction), and threads are
+      reloaded on demand, so evicted threads and restarts don't lose
+      conversations. Threads idle past ``ttl`` are deleted. Values are stored
+      as the (type, bytes) pairs ``self.serde`` produced; nothing is pickled.
+    - Pending writes (put_writes) stay in memory only. They belong to a run
+      that is still in progress, which a restart ends anyway; a restored thread
+      resumes from its last checkpoint. The agent doesn't use interrupts, which
+      would need them persisted.
+
+    Thread IDs are opaque here; callers key them as ``user_id:thread_id``.
+    """
+
+    def __init__(
+        self,
+        max_threads: int = 1000,
+        ttl: float = 72 * 3600.0,
+        max_checkpoints: int = 5,
+        persist: bool = True,
+        cleanup_interval: float = 600.0,
+    ):
+        super().__init__()
+        self.max_threads = max_threads
+        self.ttl = ttl
+        self.max_checkpoints = max(1, max_checkpoints)
+        self.persist = persist
+        self.cleanup_interval = cleanup_interval
+
+        self._lock = threading.RLock()
+        self._last_used: OrderedDict[str, float] = OrderedDict()
+        self._write_keys: dict[str, set] = defaultdict(set)
+        self._blob_keys: dict[str, set] = defaultdict(set)
+        self._last_cleanup = 0.0
+
+        self.evictions = 0
+        self.expirations = 0
+        self.restores = 0
+        self.pruned_checkpoints = 0
+        self.persist_errors = 0
+
+    # ----------------------------------------------------------
+    # In-memory bookkeeping (caller holds _lock)
+    # ----------------------------------------------------------
+    def _touch(self, thread_id: str):
+        self._last_used[thread_id] = time.monotonic()
+        self._last_used.move_to_end(thread_id)
+
+    def _drop(self, thread_id: str):
+        self.storage.pop(thread_id, None)
+        for key in self._write_keys.pop(thread_id, ()):
+            self.writes.pop(key, None)
+        for key in self._blob_keys.pop(thread_id, ()):
+            self.blobs.pop(key, None)
+        self._last_used.pop(thread_id, None)
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._last_used:
+            thread_id, used = next(iter(self._last_used.items()))
+            if now - used >= self.ttl:
+                self.expirations += 1
+            elif len(self._last_used) > self.max_threads:
+                self.evictions += 1
+            else:
+                break
+            self._drop(thread_id)
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> tuple[list, list]:
+        """
+        Keep the newest max_checkpoints checkpoints and the blobs they use;
+        returns the dropped checkpoint ids and blob keys.
+        """
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.max_checkpoints:
+            return [], []
+
+        pruned = sorted(checkpoints)[: -self.max_checkpoints]
+        for checkpoint_id in pruned:
+            del checkpoints[checkpoint_id]
+            key = (thread_id, checkpoint_ns, checkpoint_id)
+            self.writes.pop(key, None)
+            self._write_keys[thread_id].discard(key)
+            self.pruned_checkpoints += 1
+
+        referenced = set()
+        for checkpoint, _, _ in checkpoints.values():
+            versions = self.serde.loads_typed(checkpoint)["channel_versions"]
+            referenced.update(
+                (thread_id, checkpoint_ns, channel, version)
+                for channel, version in versions.items()
+            )
+        dropped = []
+        for key in list(self._blob_keys[thread_id]):
+            if key[1] == checkpoint_ns and key not in referenced:
+                self.blobs.pop(key, None)
+                self._blob_keys[thread_id].discard(key)
+                dropped.append(key)
+        return pruned, dropped
+
+    def _needs_restore(self, thread_id: str) -> bool:
+        return self.persist and thread_id not in self._last_used
+
+    def _restore(self, thread_id: str, data: dict | None):
+        with self._lock:
+            if thread_id not in self._last_used and data is not None:
+                self.storage[thread_id] = defaultdict(dict, data["storage"])
+                for key, value in data["blobs"].items():
+                    self.blobs[key] = value
+                    self._blob_keys[thread_id].add(key)
+                self.restores += 1
+            self._touch(thread_id)
+            self._evict()
+
+    # ----------------------------------------------------------
+    # agent_checkpoints / agent_checkpoint_blobs tables
+    # ----------------------------------------------------------
+    def _read_thread(self, thread_id: str) -> dict | None:
+        db = SessionLocal()
+        try:
+            checkpoints = (
+                db.query(AgentCheckpoint)
+                .filter(AgentCheckpoint.thread_id == thread_id)
+                .all()
+            )
+            blobs = (
+                db.query(AgentCheckpointBlob)
+                .filter(AgentCheckpointBlob.thread_id == thread_id)
+                .all()
+                if checkpoints
+                else []
+            )
+        except Exception as e:
+            logger.warning(f"Agent thread read failed: {e}")
+            return None
+        finally:
+            db.close()
+        if not checkpoints:
+            return None
+        last_used = max(_as_utc(c.created_at) for c in checkpoints)
+        if datetime.now(timezone.utc) - last_used > timedelta(seconds=self.ttl):
+            return None
+
+        storage = defaultdict(dict)
+        for c in checkpoints:
+            storage[c.checkpoint_ns][c.checkpoint_id] = (
+                (c.checkpoint_type, bytes(c.checkpoint)),
+                (c.metadata_type, bytes(c.checkpoint_metadata)),
+                c.parent_checkpoint_id,
+            )
+        return {
+            "storage": storage,
+            "blobs": {
+                (thread_id, b.checkpoint_ns, b.channel, b.version): (
+                    b.type,
+                    bytes(b.data),
+                )
+                for b in blobs
+            },
+        }
+
+    @staticmethod
+    def _delete_threads(db, thread_ids: list[str]):
+        db.query(AgentCheckpoint).filter(
+            AgentCheckpoint.thread_id.in_(thread_ids)
+        ).delete(synchronize_session=False)
+        db.query(AgentCheckpointBlob).filter(
+            AgentCheckpointBlob.thread_id.in_(thread_ids)
+        ).delete(synchronize_session=False)
+
+    def _write_checkpoint(self, thread_id: str, delta: dict):
+        """Store one new checkpoint and its blobs; delete what pruning dropped."""
+        db = SessionLocal()
+        try:
+            now = datetime.now(timezone.utc)
+            checkpoint_ns = delta["checkpoint_ns"]
+            checkpoint, metadata, parent = delta["saved"]
+            db.merge(
+                AgentCheckpoint(
+                    thread_id=thread_id,
+                    checkpoint_ns=checkpoint_ns,
+                    checkpoint_id=delta["checkpoint_id"],
+                    parent_checkpoint_id=parent,
+                    checkpoint_type=checkpoint[0],
+                    checkpoint=checkpoint[1],
+                    metadata_type=metadata[0],
+                    checkpoint_metadata=metadata[1],
+                    created_at=now,
+                )
+            )
+            for (_, ns, channel, version), (type_, data) in delta["blobs"].items():
+                db.merge(
+                    AgentCheckpointBlob(
+                        thread_id=thread_id,
+                        checkpoint_ns=ns,
+                        channel=channel,
+                        version=str(version),
+                        type=type_,
+                        data=data,
+                    )
+                )
+            if delta["pruned"]:
+                db.query(AgentCheckpoint).filter(
+                    AgentCheckpoint.thread_id == thread_id,
+                    AgentCheckpoint.checkpoint_ns == checkpoint_ns,
+                    AgentCheckpoint.checkpoint_id.in_(delta["pruned"]),
+                ).delete(synchronize_session=False)
+            for _, ns, channel, version in delta["dropped_blobs"]:
+                db.query(AgentCheckpointBlob).filter(
+                    AgentCheckpointBlob.thread_id == thread_id,
+                    AgentCheckpointBlob.checkpoint_ns == ns,
+                    AgentCheckpointBlob.channel == channel,
+                    AgentCheckpointBlob.version == str(version),
+                ).delete(synchronize_session=False)
+
+            if time.monotonic() - self._last_cleanup >= self.cleanup_interval:
+                self._last_cleanup = time.monotonic()
+                cutoff = now - timedelta(seconds=self.ttl)
+                expired = [
+                    row.thread_id
+                    for row in db.query(AgentCheckpoint.thread_id)
+                    .group_by(AgentCheckpoint.thread_id)
+                    .having(func.max(AgentCheckpoint.created_at) < cutoff)
+                ]
+                if expired:
+                    self._delete_threads(db, expired)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.persist_errors += 1
+            logger.warning(f"Agent checkpoint write failed: {e}")
+        finally:
+            db.close()
+
+    def _delete_rows(self, thread_id: str):
+        db = SessionLocal()
+        try:
+            self._delete_threads(db, [thread_id])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Agent thread delete failed: {e}")
+        finally:
+            db.close()
+
+    # ----------------------------------------------------------
+    # BaseCheckpointSaver API
+    # ----------------------------------------------------------
+    def _get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            self._touch(thread_id)
+            return super().get_tuple(config)
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        if self._needs_restore(thread_id):
+            self._restore(thread_id, self._read_thread(thread_id))
+        return self._get_tuple(config)
+
+    async def aget_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        if self._needs_restore(thread_id):
+            data = await asyncio.to_thread(self._read_thread, thread_id)
+            self._restore(thread_id, data)
+        return self._get_tuple(config)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        if config and self._needs_restore(config["configurable"]["thread_id"]):
+            thread_id = config["configurable"]["thread_id"]
+            self._restore(thread_id, self._read_thread(thread_id))
+        with self._lock:
+            items = list(
+                super().list(config, filter=filter, before=before, limit=limit)
+            )
+        yield from items
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        if config and self._needs_restore(config["configurable"]["thread_id"]):
+            thread_id = config["configurable"]["thread_id"]
+            data = await asyncio.to_thread(self._read_thread, thread_id)
+            self._restore(thread_id, data)
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    def _put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            result = super().put(config, checkpoint, metadata, new_versions)
+            blob_keys = [
+                (thread_id, checkpoint_ns, channel, version)
+                for channel, version in new_versions.items()
+            ]
+            self._blob_keys[thread_id].update(blob_keys)
+            self._touch(thread_id)
+            delta = None
+            if self.persist:
+                # Only what this put added; earlier checkpoints are already stored
+                delta = {
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint["id"],
+                    "saved": self.storage[thread_id][checkpoint_ns][checkpoint["id"]],
+                    "blobs": {key: self.blobs[key] for key in blob_keys},
+                }
+            pruned, dropped_blobs = self._prune(thread_id, checkpoint_ns)
+            if delta is not None:
+                delta["pruned"], delta["dropped_blobs"] = pruned, dropped_blobs
+            self._evict()
+        return result, delta
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result, delta = self._put(config, checkpoint, metadata, new_versions)
+        if delta is not None:
+            self._write_checkpoint(config["configurable"]["thread_id"], delta)
+        return result
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        result, delta = self._put(config, checkpoint, metadata, new_versions)
+        if delta is not None:
+            thread_id = config["configurable"]["thread_id"]
+            await asyncio.to_thread(self._write_checkpoint, thread_id, delta)
+        return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+            self._write_keys[thread_id].add(
+                (
+                    thread_id,
+                    config["configurable"].get("checkpoint_ns", ""),
+                    config["configurable"]["checkpoint_id"],
+                )
+            )
+            self._touch(thread_id)
+
+    def delete_thread(self, thread_id: str):
+        with self._lock:
+            self._drop(thread_id)
+        if self.persist:
+            self._delete_rows(thread_id)
+
+    async def adelete_thread(self, thread_id: str):
+        with self._lock:
+            self._drop(thread_id)
+        if self.persist:
+            await asyncio.to_thread(self._delete_rows, thread_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "threads": len(self._last_used),
+                "max_threads": self.max_threads,
+                "ttl": self.ttl,
+                "max_checkpoints": self.max_checkpoints,
+                "persist": self.persist,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "restores": self.restores,
+                "pruned_checkpoints": self.pruned_checkpoints,
+                "persist_errors": self.persist_errors,
+            }
@@ -0,0 +1,160 @@
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from langchain.agents.middleware import (
+    ClearToolUsesEdit,
+    ContextEditingMiddleware,
+    SummarizationMiddleware,
+)
+from langchain.messages import RemoveMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.config import get_config
+from langgraph.constants import TAG_NOSTREAM
+
+# Placeholder the model sees instead of an old tool output
+CLEARED_TOOL_RESULT = "[older tool result removed to save context]"
+
+
+class CompactionStats:
+    """Process-wide compaction counters plus tokens saved per in-flight turn."""
+
+    MAX_PENDING_TURNS = 10_000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._turns: OrderedDict[str, int] = OrderedDict()
+        self.model_calls = 0
+        self.trimmed_calls = 0
+        self.tool_tokens_saved = 0
+        self.summaries = 0
+        self.summary_tokens_saved = 0
+
+    def record(self, kind: str, saved: int):
+        thread_id = _current_thread_id()
+        with self._lock:
+            if kind == "tool_results":
+                self.model_calls += 1
+                if saved > 0:
+                    self.trimmed_calls += 1
+                    self.tool_tokens_saved += saved
+            elif kind == "summary":
+                self.summaries += 1
+                self.summary_tokens_saved += max(saved, 0)
+            if thread_id is not None and saved > 0:
+                self._turns[thread_id] = self._turns.get(thread_id, 0) + saved
+                self._turns.move_to_end(thread_id)
+                while len(self._turns) > self.MAX_PENDING_TURNS:
+                    self._turns.popitem(last=False)
+
+    def pop_turn(self, thread_id: str) -> int:
+        """Tokens saved for thread_id since the last call; call once per turn."""
+        with self._lock:
+            return self._turns.pop(thread_id, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "model_calls": self.model_calls,
+                "trimmed_calls": self.trimmed_calls,
+                "tool_tokens_saved": self.tool_tokens_saved,
+                "summaries": self.summaries,
+                "summary_tokens_saved": self.summary_tokens_saved,
+            }
+
+
+compaction_stats = CompactionStats()
+
+
+def _current_thread_id() -> str | None:
+    try:
+        return get_config()["configurable"].get("thread_id")
+    except RuntimeError:
+        return None
+
+
+class TrimToolResultsMiddleware(ContextEditingMiddleware):
+    """Clears all but the newest tool outputs from the model request and records the savings."""
+
+    def wrap_model_call(self, request, handler):
+        before = count_tokens_approximately(request.messages)
+
+        def tracked(edited):
+            saved = before - count_tokens_approximately(edited.messages)
+            compaction_stats.record("tool_results", saved)
+            return handler(edited)
+
+        return super().wrap_model_call(request, tracked)
+
+    async def awrap_model_call(self, request, handler):
+        before = count_tokens_approximately(request.messages)
+
+        async def tracked(edited):
+            saved = before - count_tokens_approximately(edited.messages)
+            compaction_stats.record("tool_results", saved)
+            return await handler(edited)
+
+        return await super().awrap_model_call(request, tracked)
+
+
+class SummarizeHistoryMiddleware(SummarizationMiddleware):
+    """Summarizes older turns in the checkpointed thread and records the savings."""
+
+    @staticmethod
+    def _track(state: dict, update: dict[str, Any] | None):
+        if not update:
+            return
+        before = count_tokens_approximately(state["messages"])
+        after = count_tokens_approximately(
+            [m for m in update["messages"] if not isinstance(m, RemoveMessage)]
+        )
+        compaction_stats.record("summary", before - after)
+
+    def before_model(self, state, runtime):
+        update = super().before_model(state, runtime)
+        self._track(state, update)
+        return update
+
+    async def abefore_model(self, state, runtime):
+        update = await super().abefore_model(state, runtime)
+        self._track(state, update)
+        return update
+
+
+def compaction_middleware(
+    summary_model,
+    tool_result_trigger_tokens: int,
+    keep_tool_results: int,
+    summary_trigger_tokens: int,
+    keep_messages: int,
+) -> list:
+    """
+    Middleware that keeps per-turn context bounded:
+
+    - once a request exceeds tool_result_trigger_tokens, tool outputs other than
+      the newest keep_tool_results are replaced by a short placeholder
+    - once the thread exceeds summary_trigger_tokens, everything but the newest
+      keep_messages messages is replaced by a summary written by summary_model
+
+    The summary model is tagged nostream so its tokens never reach the client
+    or the turn's final message.
+    """
+    summary_model = summary_model.model_copy(
+        update={"tags": [*(summary_model.tags or []), TAG_NOSTREAM]}
+    )
+    return [
+        SummarizeHistoryMiddleware(
+            summary_model,
+            trigger=("tokens", summary_trigger_tokens),
+            keep=("messages", keep_messages),
+        ),
+        TrimToolResultsMiddleware(
+            edits=[
+                ClearToolUsesEdit(
+                    trigger=tool_result_trigger_tokens,
+                    keep=keep_tool_results,
+                    placeholder=CLEARED_TOOL_RESULT,
+                )
+            ]
+        ),
+    ]
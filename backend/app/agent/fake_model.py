@@ -0,0 +1,115 @@
+"""
+Scripted chat model selected with AGENT_MODEL="fake".
+
+Lets /api/agent/chat/stream run end to end (load tests, local development)
+without an API key or a paid model. A question that mentions a ZIP code
+gets one tool call; everything else gets a fixed-length answer, streamed
+word by word with a configurable delay between tokens.
+"""
+
+import asyncio
+import json
+import re
+import time
+import uuid
+from typing import Any, AsyncIterator, Iterator
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+ZIP_RE = re.compile(r"\b\d{5}\b")
+
+_VOCABULARY = (
+    "This neighborhood has a solid mix of housing, transit access and local "
+    "amenities, with quality scores that have held steady over recent months."
+).split()
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for a provider chat model.
+
+    - A question mentioning a ZIP code calls ``tool_name`` once, if that tool
+      is bound and ``call_tools`` is set.
+    - Otherwise (or after the tool result) it answers with ``response_tokens``
+      words, waiting ``token_delay`` seconds before each one.
+    """
+
+    token_delay: float = 0.02
+    response_tokens: int = 60
+    call_tools: bool = True
+    tool_name: str = "get_nsqi_prediction"
+    bound_tools: list[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        names = [t["name"] if isinstance(t, dict) else t.name for t in tools]
+        return self.model_copy(update={"bound_tools": names})
+
+    def _reply(self, messages: list[BaseMessage]) -> AIMessage:
+        last = messages[-1]
+        zips = ZIP_RE.findall(str(last.content))
+        if (
+            self.call_tools
+            and self.tool_name in self.bound_tools
+            and not isinstance(last, ToolMessage)
+            and zips
+        ):
+            return AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": self.tool_name,
+                        "args": {"zip_code": zips[0]},
+                        "id": f"call_{uuid.uuid4().hex[:12]}",
+                    }
+                ],
+            )
+        words = [_VOCABULARY[i % len(_VOCABULARY)] for i in range(self.response_tokens)]
+        return AIMessage(content=" ".join(words))
+
+    @staticmethod
+    def _chunks(message: AIMessage) -> Iterator[AIMessageChunk]:
+        words = message.content.split(" ") if message.content else []
+        for i, word in enumerate(words):
+            yield AIMessageChunk(content=word if i == 0 else f" {word}")
+        for i, tc in enumerate(message.tool_calls):
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {
+                        "name": tc["name"],
+                        "args": json.dumps(tc["args"]),
+                        "id": tc["id"],
+                        "index": i,
+                    }
+                ],
+            )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        message = self._reply(messages)
+        time.sleep(self.token_delay * max(1, len(message.content.split())))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        message = self._reply(messages)
+        await asyncio.sleep(self.token_delay * max(1, len(message.content.split())))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self, messages, stop=None, run_manager=None, **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        for chunk in self._chunks(self._reply(messages)):
+            time.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(
+        self, messages, stop=None, run_manager=None, **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        for chunk in self._chunks(self._reply(messages)):
+            await asyncio.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=chunk)
@@ -0,0 +1,193 @@
+"""
+Response cache for first-turn agent questions.
+
+Stores the final answer and the tool-call trace of a completed first turn so
+the same question, however it is worded, can be replayed without running the
+agent. Questions are matched by a normalized-text key and, when a local
+sentence-transformers model is configured, by embedding similarity. Numbers
+in the question (ZIP codes, thresholds) must always match exactly, since
+embeddings barely distinguish "NSQI for 11211" from "NSQI for 11222".
+
+Entries are bounded (LRU + TTL) and dropped when the active model version or
+the local ACS data version changes.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+
+from app import model_loader
+from app.api import acs
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+# Articles and politeness only: question words, modals and pronouns ("what",
+# "can", "would", "my") change what is being asked, so they stay in the key
+_FILLER = {"a", "an", "the", "please", "show", "tell", "me"}
+
+Embedder = Callable[[str], np.ndarray]
+
+
+def normalize_question(message: str) -> str:
+    """Lowercased words without punctuation or filler words."""
+    return " ".join(w for w in _WORD_RE.findall(message.lower()) if w not in _FILLER)
+
+
+def _numbers(message: str) -> tuple[str, ...]:
+    return tuple(sorted(set(_NUMBER_RE.findall(message))))
+
+
+def load_embedder(model_name: str) -> Embedder | None:
+    """
+    Load a local sentence-transformers model, or return None when no model is
+    configured or the package isn't installed.
+    """
+    if not model_name:
+        return None
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        logger.warning(
+            "sentence-transformers is not installed; "
+            "response cache falls back to normalized-text keys"
+        )
+        return None
+    model = SentenceTransformer(model_name)
+    return lambda text: np.asarray(
+        model.encode(text, normalize_embeddings=True), dtype=np.float32
+    )
+
+
+class CachedResponse:
+    """A first-turn answer and the tool events that produced it."""
+
+    def __init__(
+        self,
+        question: str,
+        answer: str,
+        trace: list[dict],
+        numbers: tuple[str, ...],
+        embedding: np.ndarray | None,
+    ):
+        self.question = question
+        self.answer = answer
+        self.trace = trace
+        self.numbers = numbers
+        self.embedding = embedding
+        self.created = time.monotonic()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 3600.0,
+        similarity: float = 0.92,
+        embedder: Embedder | None = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.similarity = similarity
+        self.embedder = embedder
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._version: tuple | None = None
+
+        self.lookups = 0
+        self.hits = 0
+        self.semantic_hits = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    def _check_version(self):
+        """Drop every entry when the model or ACS data version changes (caller holds _lock)."""
+        version = (model_loader.registry.active_version, acs.ACS_DATA_VERSION)
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def _expire(self):
+        now = time.monotonic()
+        for key in [k for k, e in self._entries.items() if now - e.created >= self.ttl]:
+            del self._entries[key]
+
+    def _closest(
+        self, embedding: np.ndarray, numbers: tuple[str, ...]
+    ) -> CachedResponse | None:
+        candidates = [
+            e
+            for e in self._entries.values()
+            if e.embedding is not None and e.numbers == numbers
+        ]
+        if not candidates:
+            return None
+        scores = np.stack([e.embedding for e in candidates]) @ embedding
+        best = int(np.argmax(scores))
+        return candidates[best] if scores[best] >= self.similarity else None
+
+    def lookup(self, message: str) -> CachedResponse | None:
+        """Return the cached response for message, if any. May embed message (blocking)."""
+        key = normalize_question(message)
+        with self._lock:
+            self.lookups += 1
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if self.embedder is None or not self._entries:
+                return None
+
+        embedding = self.embedder(message)
+        with self._lock:
+            self._check_version()
+            self._expire()
+            entry = self._closest(embedding, _numbers(message))
+            if entry is not None:
+                self.hits += 1
+                self.semantic_hits += 1
+            return entry
+
+    def store(self, message: str, answer: str, trace: list[dict]):
+        """Cache a completed first turn. May embed message (blocking)."""
+        embedding = self.embedder(message) if self.embedder else None
+        entry = CachedResponse(message, answer, trace, _numbers(message), embedding)
+        with self._lock:
+            self._check_version()
+            key = normalize_question(message)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self.stores += 1
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "semantic": self.embedder is not None,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "hit_rate": (
+                    round(self.hits / self.lookups, 4) if self.lookups else 0.0
+                ),
+                "stores": self.stores,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,162 @@
+"""
+Deterministic fast path for simple lookups.
+
+Messages like "what's the NSQI for 11211" or "compare 10001 and 11211" map to
+exactly one tool call. They are answered by calling the tool directly and
+streaming a templated reply in the usual SSE event format, skipping the LLM.
+
+Only plain lookup phrasing qualifies: the whole message has to match one of
+the templates below. Questions that ask for reasons or advice ("why is
+11211's score so low?"), extra free text, unknown ZIPs and long messages all
+fall through to the agent.
+"""
+
+import re
+import threading
+
+from app.agent.tools import MAX_COMPARE_ZIPS, ZIP_TO_DISTRICT
+
+# Longer messages usually carry extra asks the template can't answer
+MAX_FAST_PATH_CHARS = 120
+
+ZIP_RE = re.compile(r"\b\d{5}\b")
+
+# Explanations, advice and hypotheticals need the agent even when they name a ZIP
+FREE_TEXT_RE = re.compile(r"\b(why|how|should|explain|would|could)\b", re.I)
+
+_ZIP = r"(?:zip(?:\s*code)?\s+)?\d{5}"
+_ASK = (
+    r"(?:(?:what(?:'s|\s+is|\s+are)|show(?:\s+me)?|get|give\s+me|look\s*up|find)\s+)?"
+    r"(?:the\s+)?"
+)
+_PLACES = r"(?:neighborhoods?|areas?|places|zips?(?:\s*codes?)?)"
+
+
+def _lookup(noun: str) -> re.Pattern:
+    """'<ask> <noun> for <zip>' or '<ask> <zip>'s <noun>'."""
+    return re.compile(
+        rf"{_ASK}(?:(?:{noun})\s+(?:(?:for|of|in)\s+)?{_ZIP}|{_ZIP}(?:'s)?\s+(?:{noun}))",
+        re.I,
+    )
+
+
+# intent -> template; the whole message must match exactly one of these
+INTENTS = {
+    "compare": re.compile(
+        rf"(?:compare\s+(?:the\s+)?(?:(?:nsqi|quality|scores?|{_PLACES})\s+(?:of|for)\s+)?"
+        rf"{_ZIP}(?:\s*(?:,|and|vs\.?|versus|with|to)\s*(?:and\s+)?{_ZIP})+"
+        rf"|{_ZIP}\s+(?:vs\.?|versus)\s+{_ZIP})",
+        re.I,
+    ),
+    "trends": _lookup(r"trends?|trend\s+data"),
+    "similar": re.compile(
+        rf"{_ASK}(?:{_PLACES}\s+(?:similar|comparable)\s+to"
+        rf"|similar\s+{_PLACES}\s+(?:to|for))\s+{_ZIP}",
+        re.I,
+    ),
+    "demographics": _lookup(
+        r"demographics?|population|(?:median\s+)?(?:household\s+)?income"
+        r"|poverty(?:\s+rate)?|(?:census|acs)(?:\s+data)?|median\s+age"
+    ),
+    "nsqi": _lookup(
+        r"nsqi(?:\s+(?:score|grade|rating|index))?"
+        r"|(?:neighborhood\s+)?quality(?:\s+(?:score|index|grade|rating))?"
+        r"|score|grade|rating"
+    ),
+}
+
+LEAD_INS = {
+    "get_nsqi_prediction": "Here's the neighborhood quality score you asked for:",
+    "get_acs_demographics": "Here are the latest Census (ACS) figures:",
+    "compare_neighborhoods": "Here's how these neighborhoods compare:",
+    "compare_many_neighborhoods": "Here's how these neighborhoods compare:",
+    "find_similar_neighborhoods": "These neighborhoods are the most similar:",
+    "get_neighborhood_trends": "Here's how this neighborhood has been trending:",
+}
+
+
+class FastPathMatch:
+    """A message resolved to one tool call."""
+
+    def __init__(self, intent: str, tool_name: str, args: dict):
+        self.intent = intent
+        self.tool_name = tool_name
+        self.args = args
+
+    def lead_in(self) -> str:
+        return LEAD_INS[self.tool_name]
+
+
+def match_fast_path(message: str) -> FastPathMatch | None:
+    """Return the single tool call that fully answers message, or None."""
+    if len(message) > MAX_FAST_PATH_CHARS:
+        return None
+
+    text = message.strip().replace("\u2019", "'").rstrip("?.! ")
+    if FREE_TEXT_RE.search(text):
+        return None
+
+    zips = list(dict.fromkeys(ZIP_RE.findall(text)))
+    if not zips or any(z not in ZIP_TO_DISTRICT for z in zips):
+        return None
+
+    intents = [name for name, pattern in INTENTS.items() if pattern.fullmatch(text)]
+    if len(intents) != 1:
+        return None
+    intent = intents[0]
+
+    if intent == "compare":
+        if len(zips) == 2:
+            return FastPathMatch(
+                intent,
+                "compare_neighborhoods",
+                {"zip_code_a": zips[0], "zip_code_b": zips[1]},
+            )
+        if 2 < len(zips) <= MAX_COMPARE_ZIPS:
+            return FastPathMatch(
+                intent, "compare_many_neighborhoods", {"zip_codes": zips}
+            )
+        return None
+
+    if len(zips) != 1:
+        return None
+    tool_name = {
+        "nsqi": "get_nsqi_prediction",
+        "demographics": "get_acs_demographics",
+        "trends": "get_neighborhood_trends",
+        "similar": "find_similar_neighborhoods",
+    }[intent]
+    return FastPathMatch(intent, tool_name, {"zip_code": zips[0]})
+
+
+class FastPathStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.hits = 0
+        self.errors = 0
+        self.by_intent: dict[str, int] = {}
+
+    def record(self, match: FastPathMatch | None):
+        with self._lock:
+            self.checked += 1
+            if match is not None:
+                self.hits += 1
+                self.by_intent[match.intent] = self.by_intent.get(match.intent, 0) + 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.checked, 4) if self.checked else 0.0,
+                "errors": self.errors,
+                "by_intent": dict(self.by_intent),
+            }
+
+
+fast_path_stats = FastPathStats()
@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+import pandas as pd
+
+from app import model_loader
+from app.api import acs
+
+logger = logging.getLogger(__name__)
+
+# How long a table built without complete ACS data is used before retrying
+INCOMPLETE_RETRY_SECONDS = 300.0
+
+
+class NeighborhoodIndex:
+    """
+    Columnar ZIP-level table (zip, district, borough, nsqi_score, grade, income,
+    poverty) behind search_neighborhoods.
+
+    Built with one batched model prediction and one batched ACS lookup, and
+    rebuilt when the active model version or the local ACS data version changes.
+    """
+
+    def __init__(self, zip_to_district: dict[str, str], borough_codes: dict[str, str]):
+        self.zip_to_district = zip_to_district
+        self.borough_codes = borough_codes
+        self._lock = threading.Lock()
+        self._table: pd.DataFrame | None = None
+        self._key: tuple | None = None
+        self._complete = False
+        self._built_at = 0.0
+        self.builds = 0
+
+    def _current_key(self) -> tuple:
+        return (model_loader.registry.active.version, acs.ACS_DATA_VERSION)
+
+    def _is_current(self, key: tuple) -> bool:
+        if self._table is None or self._key != key:
+            return False
+        return (
+            self._complete
+            or time.monotonic() - self._built_at < INCOMPLETE_RETRY_SECONDS
+        )
+
+    @property
+    def complete(self) -> bool:
+        """False while the current table lacks ACS data."""
+        return self._complete
+
+    def table(self) -> pd.DataFrame:
+        """Return the current table, rebuilding it first if it is out of date."""
+        key = self._current_key()
+        if self._is_current(key):
+            return self._table
+        with self._lock:
+            if not self._is_current(key):
+                self._table, self._complete = self._build()
+                self._key = key
+                self._built_at = time.monotonic()
+                self.builds += 1
+            return self._table
+
+    def _build(self) -> tuple[pd.DataFrame, bool]:
+        zips = pd.Series(self.zip_to_district, name="district").rename_axis("zip")
+        table = zips.reset_index()
+        table["borough"] = (
+            table["district"].str[:2].map(self.borough_codes).fillna("Unknown")
+        )
+
+        predictions = model_loader.predict_nsqi_for_districts(
+            table["district"].unique().tolist()
+        )
+        table["nsqi_score"] = table["district"].map(
+            {cd: p["percentile"] for cd, p in predictions.items()}
+        )
+        table["grade"] = table["district"].map(
+            {cd: p["grade"] for cd, p in predictions.items()}
+        )
+        # Districts without Furman records can't be scored, so can't be searched
+        table = table.dropna(subset=["nsqi_score"])
+
+        complete = True
+        try:
+            found, _, unavailable = acs._fetch_acs_zctas(table["zip"].tolist())
+            complete = not unavailable
+        except Exception as e:
+            logger.warning(f"Neighborhood index built without ACS data: {e}")
+            found, complete = {}, False
+        table["income"] = table["zip"].map(
+            {z: r.get("median_household_income") for z, r in found.items()}
+        )
+        table["poverty"] = table["zip"].map(
+            {z: r.get("poverty_rate") for z, r in found.items()}
+        )
+        table[["income", "poverty"]] = table[["income", "poverty"]].astype(float)
+
+        return table.reset_index(drop=True), complete
+
+    def search(
+        self,
+        borough: Optional[str] = None,
+        min_nsqi_score: Optional[float] = None,
+        max_poverty_rate: Optional[float] = None,
+        min_income: Optional[float] = None,
+        limit: int = 5,
+    ) -> pd.DataFrame:
+        """
+        Top ``limit`` ZIPs by NSQI score matching every given filter. Missing
+        ACS values don't exclude a ZIP from the income or poverty filters.
+        """
+        table = self.table()
+        mask = pd.Series(True, index=table.index)
+        if borough:
+            mask &= table["borough"].str.lower() == borough.strip().lower()
+        if min_nsqi_score is not None:
+            mask &= table["nsqi_score"] >= min_nsqi_score
+        if max_poverty_rate is not None:
+            mask &= table["poverty"].isna() | (table["poverty"] <= max_poverty_rate)
+        if min_income is not None:
+            mask &= table["income"].isna() | (table["income"] >= min_income)
+
+        return table[mask].nlargest(limit, "nsqi_score")
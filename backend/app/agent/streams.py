@@ -0,0 +1,162 @@
+"""
+Resumable agent runs.
+
+Each streamed turn runs as a background task that appends its events, with
+sequential IDs, to a bounded ring buffer. Clients read the run through
+subscribe(); a client that drops its connection can reconnect with the last
+event ID it saw, get the events it missed and continue with the live run,
+instead of sending the message again and re-running the agent.
+
+A run nobody is subscribed to is cancelled after ``resume_window`` seconds,
+and a finished run stays resumable for the same window.
+
+The registry is per process: a reconnect is only resumed by the worker that
+started the run, and the one-run-per-conversation check only sees that
+worker's runs. Deploy with a single worker, or route each user to the same
+worker (sticky sessions) when running several.
+"""
+
+import asyncio
+import itertools
+import logging
+import uuid
+from collections import deque
+from typing import AsyncIterator, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class StreamRun:
+    """One agent turn: the producing task plus the ring buffer of its events."""
+
+    def __init__(
+        self,
+        key: str,
+        events: AsyncIterator[dict],
+        buffer_size: int,
+        resume_window: float,
+        on_finish: Callable[["StreamRun"], None],
+    ):
+        self.key = key
+        self.run_id = uuid.uuid4().hex[:12]
+        self.resume_window = resume_window
+        self.finished = False
+        self.subscribers = 0
+        self._buffer: deque[tuple[int, dict]] = deque(maxlen=buffer_size)
+        self._last_seq = 0
+        self._changed = asyncio.Event()
+        self._cancel_handle: asyncio.TimerHandle | None = None
+        self._on_finish = on_finish
+        self._task = asyncio.create_task(self._produce(events))
+
+    async def _produce(self, events: AsyncIterator[dict]):
+        try:
+            async for event in events:
+                self._last_seq += 1
+                self._buffer.append((self._last_seq, event))
+                self._notify()
+        except asyncio.CancelledError:
+            logger.info(f"Agent run {self.key} cancelled with no client attached")
+        finally:
+            self.finished = True
+            self._notify()
+            self._on_finish(self)
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.run_id}-{seq}"
+
+    def parse_event_id(self, event_id: str) -> int | None:
+        """Sequence number of one of this run's event IDs, or None."""
+        run_id, _, seq = event_id.strip().rpartition("-")
+        if run_id != self.run_id or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def cancel(self):
+        self._task.cancel()
+
+    async def subscribe(self, after: int = 0) -> AsyncIterator[dict]:
+        """
+        Events after sequence number ``after`` (0 for all), each with its SSE
+        ``id``, followed by live events until the run finishes. Events already
+        evicted from the buffer are skipped.
+        """
+        self.subscribers += 1
+        if self._cancel_handle is not None:
+            self._cancel_handle.cancel()
+            self._cancel_handle = None
+        try:
+            seq = after
+            while True:
+                changed = self._changed
+                if self._buffer:
+                    first = self._buffer[0][0]
+                    start = max(0, seq + 1 - first)
+                    missed = list(itertools.islice(self._buffer, start, None))
+                    for seq, event in missed:
+                        yield {**event, "id": self.event_id(seq)}
+                if self.finished and seq >= self._last_seq:
+                    return
+                if self._changed is changed:
+                    await changed.wait()
+        finally:
+            self.subscribers -= 1
+            if not self.subscribers and not self.finished:
+                # Give the client a moment to reconnect before giving up on the run
+                self._cancel_handle = asyncio.get_running_loop().call_later(
+                    self.resume_window, self.cancel
+                )
+
+
+class StreamRegistry:
+    """The current run of each ``user_id:thread_id`` key in this process."""
+
+    def __init__(self, resume_window: float = 30.0, buffer_size: int = 4096):
+        self.resume_window = resume_window
+        self.buffer_size = buffer_size
+        self._runs: dict[str, StreamRun] = {}
+
+        self.started = 0
+        self.resumed = 0
+        self.cancelled = 0
+
+    def get(self, key: str) -> StreamRun | None:
+        return self._runs.get(key)
+
+    def start(
+        self,
+        key: str,
+        events: AsyncIterator[dict],
+        on_finish: Callable[[], None] | None = None,
+    ) -> StreamRun:
+        """Run events in the background as the current run for key."""
+
+        def finished(run: StreamRun):
+            if run._task.cancelled() or run._task.cancelling():
+                self.cancelled += 1
+            if on_finish is not None:
+                on_finish()
+            asyncio.get_running_loop().call_later(self.resume_window, self._expire, run)
+
+        run = StreamRun(key, events, self.buffer_size, self.resume_window, finished)
+        self._runs[key] = run
+        self.started += 1
+        return run
+
+    def _expire(self, run: StreamRun):
+        if self._runs.get(run.key) is run:
+            del self._runs[run.key]
+
+    def stats(self) -> dict:
+        return {
+            "runs": len(self._runs),
+            "running": sum(not run.finished for run in self._runs.values()),
+            "started": self.started,
+            "resumed": self.resumed,
+            "cancelled": self.cancelled,
+            "resume_window": self.resume_window,
+        }
@@ -0,0 +1,132 @@
+import contextvars
+import functools
+import inspect
+from typing import Any, Awaitable, Callable
+
+from app import model_loader
+from app.api import acs
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+
+_settings = get_settings()
+TOOL_CACHE = TTLCache(
+    maxsize=_settings.AGENT_TOOL_CACHE_MAX_ENTRIES,
+    ttl=_settings.AGENT_TOOL_CACHE_TTL,
+    # A call every turn has walked away from (client disconnected) is cancelled
+    cancel_abandoned=True,
+)
+
+# Set by a tool when its answer reflects a transient failure (e.g. Census down)
+_uncacheable: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "tool_result_uncacheable", default=False
+)
+
+# Set by whoever runs an agent turn to learn whether any tool call in it failed
+_turn_failures: contextvars.ContextVar[list | None] = contextvars.ContextVar(
+    "turn_tool_failures", default=None
+)
+
+
+class _UncacheableResult(Exception):
+    """Carries a tool result out of the cache loader without storing it."""
+
+    def __init__(self, result: Any):
+        super().__init__("uncacheable tool result")
+        self.result = result
+
+
+def mark_uncacheable():
+    """Keep the running tool call's result out of the cache (e.g. partial data)."""
+    _uncacheable.set(True)
+    failures = _turn_failures.get()
+    if failures is not None:
+        failures.append(True)
+
+
+def watch_turn_failures() -> list:
+    """
+    Start collecting uncacheable tool results for the current context; the
+    returned list is non-empty once any tool call marks its result.
+    """
+    failures = []
+    _turn_failures.set(failures)
+    return failures
+
+
+def transient_error(message: str) -> str:
+    """Mark the running tool call's result as not cacheable and return message."""
+    mark_uncacheable()
+    return message
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip().lower()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    return value
+
+
+def cache_key(tool_name: str, kwargs: dict) -> tuple:
+    """Tool name, normalized arguments and the data versions the answer depends on."""
+    return (
+        tool_name,
+        _normalize(kwargs),
+        model_loader.registry.active_version,
+        acs.ACS_DATA_VERSION,
+    )
+
+
+def cached_tool(func: Callable[..., Awaitable[str]]) -> Callable[..., Awaitable[str]]:
+    """
+    Memoize an async tool function across conversations.
+
+    Concurrent identical calls share one execution; results marked with
+    transient_error() are returned but never stored. Apply below @tool.
+
+    The shared execution is cancelled once every turn waiting on it has been
+    cancelled. Work already handed to a thread (_run_blocking in tools.py)
+    can't be interrupted: it finishes in the background and its result is
+    dropped.
+    """
+
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(**kwargs) -> str:
+        # Stray whitespace from the model shouldn't change the answer or the key
+        kwargs = {k: v.strip() if isinstance(v, str) else v for k, v in kwargs.items()}
+        if not get_settings().AGENT_TOOL_CACHE:
+            return await func(**kwargs)
+
+        # Fill in defaults so omitted and explicit default arguments share a key
+        bound = signature.bind(**kwargs)
+        bound.apply_defaults()
+
+        async def load() -> str:
+            # The shared call runs in whichever turn started it; every waiter
+            # marks its own turn below instead
+            token = _uncacheable.set(False)
+            failures_token = _turn_failures.set(None)
+            try:
+                result = await func(**kwargs)
+                if _uncacheable.get():
+                    raise _UncacheableResult(result)
+                return result
+            finally:
+                _turn_failures.reset(failures_token)
+                _uncacheable.reset(token)
+
+        try:
+            return await TOOL_CACHE.get_or_load(
+                cache_key(func.__name__, bound.arguments), load
+            )
+        except _UncacheableResult as e:
+            mark_uncacheable()
+            return e.result
+
+    return wrapper
@@ -1,12 +1,26 @@
+import asyncio
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional, TypeVar
 
+import pandas as pd
 from langchain.tools import tool
 from langgraph.config import get_stream_writer
 
-from app.model_loader import predict_nsqi_for_district
-from app.api.acs import _fetch_acs_zcta
+from app.model_loader import (
+    predict_nsqi_for_district,
+    predict_nsqi_for_districts,
+    find_similar_districts,
+    get_district_trends,
+)
+from app.api.acs import fetch_acs_zcta, fetch_acs_zctas
+from app.agent.search_index import NeighborhoodIndex
+from app.agent.tool_cache import cached_tool, mark_uncacheable, transient_error
+from app.core.config import get_settings
+
+T = TypeVar("T")
 
 
 # Load ZIP to district mapping
@@ -14,6 +28,11 @@ DATA_DIR = Path(__file__).parent.parent / "data"
 with open(DATA_DIR / "nyc_zip_to_district.json") as f:
     ZIP_TO_DISTRICT: dict[str, str] = json.load(f)
 
+# Reverse mapping so district-level results can be shown as ZIP codes
+DISTRICT_TO_ZIPS: dict[str, list[str]] = {}
+for _zip, _district in ZIP_TO_DISTRICT.items():
+    DISTRICT_TO_ZIPS.setdefault(_district, []).append(_zip)
+
 
 # Borough code mapping for display
 BOROUGH_CODES = {
@@ -25,6 +44,34 @@ BOROUGH_CODES = {
 }
 
 
+# ZIP-level NSQI + ACS table used by search_neighborhoods
+SEARCH_INDEX = NeighborhoodIndex(ZIP_TO_DISTRICT, BOROUGH_CODES)
+
+
+# Model inference and pandas work run here so a slow tool call never blocks
+# the event loop that streams tokens to every other session on this worker
+_TOOL_EXECUTOR = ThreadPoolExecutor(
+    max_workers=get_settings().AGENT_TOOL_WORKERS, thread_name_prefix="agent-tool"
+)
+
+
+async def _run_blocking(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a blocking or CPU-bound call on the bounded tool executor. Cancelling
+    the caller stops the wait, not the call: the thread runs it to completion.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_TOOL_EXECUTOR, partial(func, *args, **kwargs))
+
+
+def _progress_writer() -> Callable[[str], None]:
+    """Stream writer for progress messages; a no-op when called outside an agent run."""
+    try:
+        return get_stream_writer()
+    except (RuntimeError, KeyError):
+        return lambda message: None
+
+
 def _get_borough_from_district(district: str) -> str:
     """Extract borough name from district code like 'BK15' -> 'Brooklyn'."""
     prefix = district[:2]
@@ -36,8 +83,14 @@ def _zip_to_district(zip_code: str) -> Optional[str]:
     return ZIP_TO_DISTRICT.get(zip_code)
 
 
+def _is_zip_format(zip_code: str) -> bool:
+    """True for a well-formed 5-digit ZIP code (NYC or not)."""
+    return len(zip_code) == 5 and zip_code.isdigit()
+
+
 @tool
-def get_nsqi_prediction(zip_code: str) -> str:
+@cached_tool
+async def get_nsqi_prediction(zip_code: str) -> str:
     """
     Get the Neighborhood Social Quality Index (NSQI) prediction for an NYC ZIP code.
 
@@ -51,7 +104,7 @@ def get_nsqi_prediction(zip_code: str) -> str:
     Returns:
         A summary of the NSQI score, grade, and percentile for the neighborhood.
     """
-    writer = get_stream_writer()
+    writer = _progress_writer()
     writer(f"Looking up NSQI for ZIP code {zip_code}...")
 
     # Map ZIP to community district
@@ -65,7 +118,7 @@ def get_nsqi_prediction(zip_code: str) -> str:
     writer(f"Found community district {district} in {borough}")
 
     try:
-        result = predict_nsqi_for_district(district)
+        result = await _run_blocking(predict_nsqi_for_district, district)
         writer(f"Retrieved NSQI data successfully")
 
         return (
@@ -78,11 +131,12 @@ def get_nsqi_prediction(zip_code: str) -> str:
     except ValueError as e:
         return f"Could not find NSQI data for ZIP {zip_code} (district {district}): {str(e)}"
     except Exception as e:
-        return f"Error retrieving NSQI for ZIP {zip_code}: {str(e)}"
+        return transient_error(f"Error retrieving NSQI for ZIP {zip_code}: {str(e)}")
 
 
 @tool
-def get_acs_demographics(zip_code: str) -> str:
+@cached_tool
+async def get_acs_demographics(zip_code: str) -> str:
     """
     Get demographic data from the American Community Survey (ACS) for an NYC ZIP code.
 
@@ -95,11 +149,11 @@ def get_acs_demographics(zip_code: str) -> str:
     Returns:
         A summary of demographic statistics for the ZIP code area.
     """
-    writer = get_stream_writer()
+    writer = _progress_writer()
     writer(f"Fetching ACS demographic data for ZIP {zip_code}...")
 
     try:
-        data = _fetch_acs_zcta(zip_code)
+        data = await fetch_acs_zcta(zip_code)
         writer(f"Retrieved census data successfully")
 
         # Format the results
@@ -128,65 +182,71 @@ def get_acs_demographics(zip_code: str) -> str:
             f"- Poverty Rate: {poverty}"
         )
     except Exception as e:
-        return f"Error retrieving ACS data for ZIP {zip_code}: {str(e)}"
-
+        return transient_error(
+            f"Error retrieving ACS data for ZIP {zip_code}: {str(e)}"
+        )
 
-@tool
-def compare_neighborhoods(zip_code_a: str, zip_code_b: str) -> str:
-    """
-    Compare two NYC neighborhoods side by side using NSQI scores and ACS demographics.
 
-    Provides a comprehensive comparison including quality scores, demographics,
-    and highlights which neighborhood is better in each category.
+MAX_COMPARE_ZIPS = 10
 
-    Args:
-        zip_code_a: First 5-digit NYC ZIP code to compare
-        zip_code_b: Second 5-digit NYC ZIP code to compare
 
-    Returns:
-        A side-by-side comparison of both neighborhoods with key metrics.
+async def _gather_comparison(zip_codes: list[str]) -> dict[str, dict]:
     """
-    writer = get_stream_writer()
-    writer(f"Comparing neighborhoods: {zip_code_a} vs {zip_code_b}...")
-
-    results = {"a": {}, "b": {}}
-
-    # Get NSQI for both
-    for label, zip_code in [("a", zip_code_a), ("b", zip_code_b)]:
-        district = _zip_to_district(zip_code)
-        if district:
-            try:
-                nsqi = predict_nsqi_for_district(district)
-                results[label]["nsqi"] = nsqi
-                results[label]["borough"] = _get_borough_from_district(district)
-                results[label]["district"] = district
-            except Exception:
-                results[label]["nsqi"] = None
-        else:
-            results[label]["nsqi"] = None
-            results[label]["error"] = "Not a valid NYC ZIP"
+    Fetch NSQI and ACS data for every ZIP at the same time, using one batched
+    model prediction and one batched ACS lookup.
+    """
+    districts = {zip_code: _zip_to_district(zip_code) for zip_code in zip_codes}
+    known = sorted({d for d in districts.values() if d})
 
-    writer(f"Retrieved NSQI scores")
+    failed = []
 
-    # Get ACS for both
-    for label, zip_code in [("a", zip_code_a), ("b", zip_code_b)]:
+    async def _predict() -> dict:
         try:
-            acs = _fetch_acs_zcta(zip_code)
-            results[label]["acs"] = acs
+            return await _run_blocking(predict_nsqi_for_districts, known)
         except Exception:
-            results[label]["acs"] = None
-
-    writer(f"Retrieved demographic data")
+            failed.append("nsqi")
+            return {}
 
-    # Build comparison output
-    output = [f"Comparison: {zip_code_a} vs {zip_code_b}\n", "=" * 50]
+    async def _demographics() -> dict:
+        try:
+            # One malformed ZIP would fail the whole Census query
+            found, _, unavailable = await fetch_acs_zctas(
+                [z for z in zip_codes if _is_zip_format(z)]
+            )
+            if unavailable:
+                failed.append("acs")
+            return found
+        except Exception:
+            failed.append("acs")
+            return {}
+
+    predictions, acs_rows = await asyncio.gather(_predict(), _demographics())
+    if failed:
+        # Partial data: answer this turn but don't reuse it for others
+        mark_uncacheable()
+
+    results = {}
+    for zip_code, district in districts.items():
+        results[zip_code] = {
+            "nsqi": predictions.get(district) if district else None,
+            "borough": _get_borough_from_district(district) if district else None,
+            "district": district,
+            "acs": acs_rows.get(zip_code),
+        }
+        if not district:
+            results[zip_code]["error"] = "Not a valid NYC ZIP"
+    return results
+
+
+def _format_comparison(zip_codes: list[str], results: dict[str, dict]) -> str:
+    output = [f"Comparison: {' vs '.join(zip_codes)}\n", "=" * 50]
 
     # NSQI Comparison
     output.append("\n📊 NSQI Quality Score:")
-    for label, zip_code in [("a", zip_code_a), ("b", zip_code_b)]:
-        if results[label].get("nsqi"):
-            nsqi = results[label]["nsqi"]
-            borough = results[label].get("borough", "Unknown")
+    for zip_code in zip_codes:
+        nsqi = results[zip_code].get("nsqi")
+        if nsqi:
+            borough = results[zip_code].get("borough") or "Unknown"
             output.append(
                 f"  {zip_code} ({borough}): {nsqi['percentile']:.1f}/100 (Grade {nsqi['grade']})"
             )
@@ -194,23 +254,28 @@ def compare_neighborhoods(zip_code_a: str, zip_code_b: str) -> str:
             output.append(f"  {zip_code}: Data unavailable")
 
     # Determine NSQI winner
-    nsqi_a = results["a"].get("nsqi", {}).get("percentile")
-    nsqi_b = results["b"].get("nsqi", {}).get("percentile")
-    if nsqi_a and nsqi_b:
-        if nsqi_a > nsqi_b:
-            output.append(f"  → {zip_code_a} has a higher quality score")
-        elif nsqi_b > nsqi_a:
-            output.append(f"  → {zip_code_b} has a higher quality score")
+    scores = {
+        zip_code: results[zip_code]["nsqi"]["percentile"]
+        for zip_code in zip_codes
+        if results[zip_code].get("nsqi")
+    }
+    if len(scores) >= 2:
+        best = max(scores, key=scores.get)
+        if len(set(scores.values())) == 1:
+            both = "Both" if len(scores) == 2 else "All"
+            output.append(f"  → {both} have similar quality scores")
+        elif len(zip_codes) == 2:
+            output.append(f"  → {best} has a higher quality score")
         else:
-            output.append(f"  → Both have similar quality scores")
+            output.append(f"  → {best} has the highest quality score")
 
     # Demographics Comparison
     output.append("\n👥 Demographics:")
 
     # Income
     output.append("  Median Income:")
-    for label, zip_code in [("a", zip_code_a), ("b", zip_code_b)]:
-        acs = results[label].get("acs")
+    for zip_code in zip_codes:
+        acs = results[zip_code].get("acs")
         if acs and acs.get("median_household_income"):
             output.append(f"    {zip_code}: ${int(acs['median_household_income']):,}")
         else:
@@ -218,8 +283,8 @@ def compare_neighborhoods(zip_code_a: str, zip_code_b: str) -> str:
 
     # Population
     output.append("  Population:")
-    for label, zip_code in [("a", zip_code_a), ("b", zip_code_b)]:
-        acs = results[label].get("acs")
+    for zip_code in zip_codes:
+        acs = results[zip_code].get("acs")
         if acs and acs.get("total_population"):
             output.append(f"    {zip_code}: {int(acs['total_population']):,}")
         else:
@@ -227,8 +292,8 @@ def compare_neighborhoods(zip_code_a: str, zip_code_b: str) -> str:
 
     # Poverty Rate
     output.append("  Poverty Rate:")
-    for label, zip_code in [("a", zip_code_a), ("b", zip_code_b)]:
-        acs = results[label].get("acs")
+    for zip_code in zip_codes:
+        acs = results[zip_code].get("acs")
         if acs and acs.get("poverty_rate") is not None:
             output.append(f"    {zip_code}: {acs['poverty_rate'] * 100:.1f}%")
         else:
@@ -238,7 +303,67 @@ def compare_neighborhoods(zip_code_a: str, zip_code_b: str) -> str:
 
 
 @tool
-def search_neighborhoods(
+@cached_tool
+async def compare_neighborhoods(zip_code_a: str, zip_code_b: str) -> str:
+    """
+    Compare two NYC neighborhoods side by side using NSQI scores and ACS demographics.
+
+    Provides a comprehensive comparison including quality scores, demographics,
+    and highlights which neighborhood is better in each category.
+
+    Args:
+        zip_code_a: First 5-digit NYC ZIP code to compare
+        zip_code_b: Second 5-digit NYC ZIP code to compare
+
+    Returns:
+        A side-by-side comparison of both neighborhoods with key metrics.
+    """
+    writer = _progress_writer()
+    writer(f"Comparing neighborhoods: {zip_code_a} vs {zip_code_b}...")
+
+    zip_codes = [zip_code_a, zip_code_b]
+    results = await _gather_comparison(zip_codes)
+    writer(f"Retrieved NSQI scores and demographic data")
+
+    return _format_comparison(zip_codes, results)
+
+
+@tool
+@cached_tool
+async def compare_many_neighborhoods(zip_codes: list[str]) -> str:
+    """
+    Compare 2 to 10 NYC neighborhoods at once using NSQI scores and ACS demographics.
+
+    Use this instead of several compare_neighborhoods calls when the user wants
+    to weigh more than two ZIP codes against each other.
+
+    Args:
+        zip_codes: Between 2 and 10 five-digit NYC ZIP codes to compare
+
+    Returns:
+        A side-by-side comparison of every neighborhood with key metrics.
+    """
+    writer = _progress_writer()
+
+    zip_codes = list(dict.fromkeys(z.strip() for z in zip_codes if z.strip()))
+    invalid = [z for z in zip_codes if not _is_zip_format(z)]
+    skipped = f"Invalid ZIP code(s) skipped: {', '.join(invalid)}" if invalid else ""
+    zip_codes = [z for z in zip_codes if _is_zip_format(z)]
+    if not 2 <= len(zip_codes) <= MAX_COMPARE_ZIPS:
+        message = f"Please provide between 2 and {MAX_COMPARE_ZIPS} different 5-digit ZIP codes to compare."
+        return f"{message}\n{skipped}" if skipped else message
+
+    writer(f"Comparing {len(zip_codes)} neighborhoods: {', '.join(zip_codes)}...")
+    results = await _gather_comparison(zip_codes)
+    writer(f"Retrieved NSQI scores and demographic data")
+
+    comparison = _format_comparison(zip_codes, results)
+    return f"{comparison}\n\n{skipped}" if skipped else comparison
+
+
+@tool
+@cached_tool
+async def search_neighborhoods(
     borough: Optional[str] = None,
     min_nsqi_score: Optional[float] = None,
     max_poverty_rate: Optional[float] = None,
@@ -248,7 +373,7 @@ def search_neighborhoods(
     Search for NYC neighborhoods matching specific criteria.
 
     Filter neighborhoods by borough, minimum quality score, maximum poverty rate,
-    or minimum median income. Returns up to 5 matching neighborhoods.
+    or minimum median income. Returns the 5 highest-scoring matching neighborhoods.
 
     Args:
         borough: Filter by borough name (Manhattan, Brooklyn, Queens, Bronx, Staten Island)
@@ -259,7 +384,7 @@ def search_neighborhoods(
     Returns:
         A list of neighborhoods matching the criteria with their key stats.
     """
-    writer = get_stream_writer()
+    writer = _progress_writer()
 
     criteria = []
     if borough:
@@ -275,79 +400,19 @@ def search_neighborhoods(
         f"Searching neighborhoods with criteria: {', '.join(criteria) if criteria else 'none'}"
     )
 
-    # Map borough name to code
-    borough_code = None
-    if borough:
-        borough_lower = borough.lower()
-        for code, name in BOROUGH_CODES.items():
-            if name.lower() == borough_lower:
-                borough_code = code
-                break
-
-    matches = []
-    checked = 0
-
-    # Check each ZIP code
-    for zip_code, district in ZIP_TO_DISTRICT.items():
-        # Filter by borough if specified
-        if borough_code and not district.startswith(borough_code):
-            continue
-
-        checked += 1
-        if checked % 20 == 0:
-            writer(f"Checked {checked} neighborhoods...")
-
-        try:
-            # Get NSQI
-            nsqi_data = predict_nsqi_for_district(district)
-            nsqi_score = nsqi_data.get("percentile", 0)
-
-            # Filter by NSQI
-            if min_nsqi_score and nsqi_score < min_nsqi_score:
-                continue
-
-            # Get ACS data
-            try:
-                acs_data = _fetch_acs_zcta(zip_code)
-                poverty = acs_data.get("poverty_rate")
-                income = acs_data.get("median_household_income")
-
-                # Filter by poverty rate
-                if (
-                    max_poverty_rate
-                    and poverty is not None
-                    and poverty > max_poverty_rate
-                ):
-                    continue
-
-                # Filter by income
-                if min_income and income is not None and income < min_income:
-                    continue
-
-            except Exception:
-                acs_data = {}
-                poverty = None
-                income = None
-
-            # This neighborhood matches!
-            matches.append(
-                {
-                    "zip": zip_code,
-                    "district": district,
-                    "borough": _get_borough_from_district(district),
-                    "nsqi_score": nsqi_score,
-                    "grade": nsqi_data.get("grade", "?"),
-                    "income": income,
-                    "poverty": poverty,
-                }
-            )
-
-            # Limit results
-            if len(matches) >= 5:
-                break
-
-        except Exception:
-            continue
+    try:
+        matches = await _run_blocking(
+            SEARCH_INDEX.search,
+            borough=borough,
+            min_nsqi_score=min_nsqi_score,
+            max_poverty_rate=max_poverty_rate,
+            min_income=min_income,
+        )
+        matches = matches.to_dict("records")
+        if not SEARCH_INDEX.complete:
+            mark_uncacheable()
+    except Exception as e:
+        return transient_error(f"Error searching neighborhoods: {str(e)}")
 
     writer(f"Found {len(matches)} matching neighborhoods")
 
@@ -356,9 +421,6 @@ def search_neighborhoods(
             "No neighborhoods found matching your criteria. Try relaxing some filters."
         )
 
-    # Sort by NSQI score descending
-    matches.sort(key=lambda x: x["nsqi_score"], reverse=True)
-
     # Format output
     output = [f"Found {len(matches)} neighborhood(s) matching your criteria:\n"]
 
@@ -367,19 +429,145 @@ def search_neighborhoods(
             f"{i}. ZIP {m['zip']} - {m['borough']} (District {m['district']})"
         )
         output.append(f"   NSQI: {m['nsqi_score']:.1f}/100 (Grade {m['grade']})")
-        if m["income"]:
+        if pd.notna(m["income"]) and m["income"]:
             output.append(f"   Median Income: ${int(m['income']):,}")
-        if m["poverty"] is not None:
+        if pd.notna(m["poverty"]):
             output.append(f"   Poverty Rate: {m['poverty'] * 100:.1f}%")
         output.append("")
 
     return "\n".join(output)
 
 
+@tool
+@cached_tool
+async def find_similar_neighborhoods(zip_code: str, count: int = 5) -> str:
+    """
+    Find NYC neighborhoods that are most similar to the one containing a ZIP code.
+
+    Similarity is based on the full set of neighborhood indicators (housing,
+    income, safety, commute, etc.), not just the NSQI score.
+
+    Args:
+        zip_code: A 5-digit NYC ZIP code (e.g., "11211")
+        count: How many similar neighborhoods to return (1-10)
+
+    Returns:
+        A ranked list of the most similar community districts with example ZIP codes.
+    """
+    writer = _progress_writer()
+    writer(f"Finding neighborhoods similar to ZIP {zip_code}...")
+
+    district = _zip_to_district(zip_code)
+    if not district:
+        return (
+            f"ZIP code {zip_code} is not a valid NYC ZIP code or not in our database."
+        )
+
+    try:
+        result = await _run_blocking(
+            find_similar_districts, district, k=max(1, min(count, 10))
+        )
+    except ValueError as e:
+        return f"Could not find data for ZIP {zip_code} (district {district}): {str(e)}"
+    except Exception as e:
+        return transient_error(
+            f"Error finding similar neighborhoods for ZIP {zip_code}: {str(e)}"
+        )
+
+    writer(f"Found {len(result['similar'])} similar districts")
+
+    borough = _get_borough_from_district(district)
+    output = [
+        f"Neighborhoods most similar to ZIP {zip_code} ({borough}, District {district}):\n"
+    ]
+    for i, s in enumerate(result["similar"], 1):
+        cd = s["community_district"]
+        zips = ", ".join(DISTRICT_TO_ZIPS.get(cd, [])[:3]) or "N/A"
+        output.append(
+            f"{i}. District {cd} ({s['name']}) - {_get_borough_from_district(cd)} "
+            f"(similarity distance {s['distance']:.2f})"
+        )
+        output.append(f"   Example ZIPs: {zips}")
+
+    return "\n".join(output)
+
+
+@tool
+@cached_tool
+async def get_neighborhood_trends(zip_code: str) -> str:
+    """
+    Tell whether an NYC neighborhood is improving, stable, or declining over time.
+
+    Uses the historical quality score for the ZIP code's community district and
+    highlights the indicators that changed the most over the last year.
+
+    Args:
+        zip_code: A 5-digit NYC ZIP code (e.g., "11211")
+
+    Returns:
+        A summary of the neighborhood's recent trend and its biggest movers.
+    """
+    writer = _progress_writer()
+    writer(f"Looking up trends for ZIP {zip_code}...")
+
+    district = _zip_to_district(zip_code)
+    if not district:
+        return (
+            f"ZIP code {zip_code} is not a valid NYC ZIP code or not in our database."
+        )
+
+    try:
+        result = await _run_blocking(get_district_trends, district)
+    except ValueError as e:
+        return f"Could not find trend data for ZIP {zip_code} (district {district}): {str(e)}"
+    except Exception as e:
+        return transient_error(f"Error retrieving trends for ZIP {zip_code}: {str(e)}")
+
+    writer(f"Retrieved trend data successfully")
+
+    borough = _get_borough_from_district(district)
+    quality = next(
+        (i for i in result["indicators"] if i["indicator"] == "quality_index_0_100"),
+        {},
+    )
+    output = [
+        f"Trend for ZIP {zip_code} ({borough}, District {district}): "
+        f"{result['direction']}"
+    ]
+    if quality.get("yoy_change") is not None:
+        output.append(
+            f"- Quality index change over the last year: {quality['yoy_change']:+.1f} points"
+        )
+    if quality.get("slope_per_year") is not None:
+        output.append(
+            f"- Long-run pace: {quality['slope_per_year']:+.1f} points per year"
+        )
+
+    movers = [
+        i
+        for i in result["indicators"]
+        if i["indicator"] not in ("quality_score", "quality_index_0_100")
+        and i["yoy_pct_change"] is not None
+    ]
+    movers.sort(key=lambda i: abs(i["yoy_pct_change"]), reverse=True)
+    if movers:
+        output.append("\nBiggest changes over the last year:")
+        for i in movers[:5]:
+            output.append(
+                f"  {i['indicator'].replace('_', ' ')}: "
+                f"{i['yoy_pct_change'] * 100:+.1f}% (now {i['latest']:,.2f})"
+            )
+
+    return "\n".join(output)
+
+
 # Export all tools as a list for easy import
 AGENT_TOOLS = [
     get_nsqi_prediction,
     get_acs_demographics,
     compare_neighborhoods,
+    compare_many_neighborhoods,
     search_neighborhoods,
+    find_similar_neighborhoods,
+    get_neighborhood_trends,
 ]
@@ -1,92 +1,698 @@
-from fastapi import APIRouter, HTTPException, Query
-import requests
-import time
-
-from app.core.config import get_settings
-
-router = APIRouter(prefix="/acs", tags=["ACS"])
-
-_CACHE = {}
-_CACHE_TTL = 3600
-
-ACS_VARS = {
-    "B01003_001E": "total_population",
-    "B19013_001E": "median_household_income",
-    "B01002_001E": "median_age",
-    "B17001_002E": "poverty_count",
-    "B17001_001E": "poverty_total",
-}
-
-
-# zip code to ACS ZCTA mapping API endpoint
-def _fetch_acs_zcta(zcta: str) -> dict:
-    settings = get_settings()
-    api_key = getattr(settings, "ACS_API_KEY", None)
-
-    if not api_key:
-        raise HTTPException(status_code=500, detail="ACS API key not configured")
-
-    key = f"zcta: {zcta}"
-    current_time = time.time()
-    cached = _CACHE.get(key)
-    if cached and current_time - cached["timestamp"] < _CACHE_TTL:
-        return cached["data"]
-
-    vars_str = ",".join(ACS_VARS.keys())
-    url = f"https://api.census.gov/data/2023/acs/acs5?get={vars_str}&for=zip%20code%20tabulation%20area:{zcta}&key={api_key}"
-
-    response = requests.get(url)
-
-    if response.status_code != 200:
-        raise HTTPException(status_code=502, detail="Failed to fetch data from ACS API")
-
-    data = response.json()
-    if len(data) < 2:
-        raise HTTPException(
-            status_code=404, detail="No data found for the provided ZCTA"
-        )
-
-    header, values = data[0], data[1]
-    raw = dict(zip(header, values))
-
-    out = {"zcta": zcta, "name": raw.get("NAME", "")}
-    for acs_var, acs_name in ACS_VARS.items():
-        val = raw.get(acs_var)
-
-        try:
-            out[acs_name] = None if val in (None, "", "NA") else float(val)
-        except Exception:
-            out[acs_name] = None
-
-    # compute poverty rate
-    if out.get("poverty_count") is not None and out.get("poverty_total") not in (
-        0,
-        None,
-    ):
-        out["poverty_rate"] = out["poverty_count"] / out["poverty_total"]
-    else:
-        out["poverty_rate"] = None
-
-    _CACHE[key] = {"data": out, "timestamp": current_time}
-
-    return out
-
-
-@router.get("/neighborhood", summary="Get ACS data for a given neighborhood")
-def neighborhood_stats(
-    zip: str = Query(
-        ...,
-        min_length=5,
-        max_length=5,
-        description="The ZIP code to retrieve ACS data for",
-    ),
-):
-    """
-    example: /api/acs/neighborhood?zip=90210
-    """
-    try:
-        return _fetch_acs_zcta(zip)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import quote, urlencode
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
+import httpx
+
+from app.core.cache import Aged, TTLCache
+from app.core.config import get_settings
+from app.core.db import SessionLocal
+from app.core.http import get_http_client, run_async, run_sync
+from app.core.resilience import CircuitBreaker, CircuitOpenError, retry_async
+from app.models.models import AcsZctaData
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/acs", tags=["ACS"])
+
+_CACHE_TTL = get_settings().ACS_CACHE_TTL
+_CACHE = TTLCache(
+    maxsize=get_settings().ACS_CACHE_MAX_ENTRIES,
+    ttl=_CACHE_TTL,
+    # ACS 5-year data changes yearly: past the TTL, serve the old value and
+    # refresh in the background until it is older than ACS_CACHE_MAX_STALE
+    max_stale=get_settings().ACS_CACHE_MAX_STALE,
+    negative_ttl=get_settings().ACS_NEGATIVE_CACHE_TTL,
+    # Remember ZCTAs the Census API has no data for
+    is_negative=lambda e: isinstance(e, HTTPException) and e.status_code == 404,
+)
+
+# Every ZIP the app knows about; these are preloaded in bulk
+DATA_DIR = Path(__file__).parent.parent / "data"
+with open(DATA_DIR / "nyc_zip_to_district.json") as f:
+    NYC_ZCTAS: list[str] = sorted(json.load(f))
+
+# Bulk-loaded ACS rows keyed by ZCTA, served without touching the network
+_LOCAL: dict[str, dict] = {}
+_LOCAL_REFRESHED_AT: datetime | None = None
+# Bumped whenever _LOCAL is replaced, so derived caches know to rebuild
+ACS_DATA_VERSION = 0
+
+ACS_VARS = {
+    "B01003_001E": "total_population",
+    "B19013_001E": "median_household_income",
+    "B01002_001E": "median_age",
+    "B17001_002E": "poverty_count",
+    "B17001_001E": "poverty_total",
+}
+
+
+# Created lazily on the HTTP client loop, which is where every ACS call runs
+_ACS_SEMAPHORE: asyncio.Semaphore | None = None
+
+
+def _acs_semaphore() -> asyncio.Semaphore:
+    global _ACS_SEMAPHORE
+    if _ACS_SEMAPHORE is None:
+        _ACS_SEMAPHORE = asyncio.Semaphore(get_settings().ACS_MAX_CONCURRENCY)
+    return _ACS_SEMAPHORE
+
+
+# Shared by every ACS call in this worker; open means the Census API is skipped
+_BREAKER = CircuitBreaker(
+    failure_threshold=get_settings().ACS_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=get_settings().ACS_BREAKER_RESET_SECONDS,
+)
+
+
+def _upstream_unavailable(e: Exception) -> bool:
+    """True for errors that mean the Census API itself failed (not a bad request)."""
+    return isinstance(e, HTTPException) and e.status_code in (502, 503, 504)
+
+
+async def _get_acs_once(url: str, timeout: httpx.Timeout) -> httpx.Response:
+    async with _acs_semaphore():
+        try:
+            response = await get_http_client().get(url, timeout=timeout)
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail="ACS API timed out")
+        except httpx.HTTPError:
+            raise HTTPException(
+                status_code=502, detail="Failed to fetch data from ACS API"
+            )
+    if response.status_code >= 500 or response.status_code == 429:
+        raise HTTPException(
+            status_code=502,
+            detail=f"ACS API returned {response.status_code}",
+        )
+    return response
+
+
+async def _get_acs(params: dict) -> httpx.Response:
+    """
+    GET the ACS endpoint through the shared pooled client, bounded by
+    ACS_MAX_CONCURRENCY, retried with jittered backoff and guarded by _BREAKER.
+    """
+    settings = get_settings()
+    try:
+        _BREAKER.check()
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503, detail="ACS API temporarily unavailable"
+        ) from e
+
+    timeout = httpx.Timeout(
+        settings.ACS_READ_TIMEOUT, connect=settings.ACS_CONNECT_TIMEOUT
+    )
+    # Census expects "zip%20code%20tabulation%20area:..." with literal ':' and ','
+    url = f"{settings.ACS_BASE_URL}?{urlencode(params, quote_via=quote, safe=':,*')}"
+    try:
+        response = await retry_async(
+            lambda: _get_acs_once(url, timeout),
+            attempts=max(1, settings.ACS_RETRY_ATTEMPTS),
+            base_delay=settings.ACS_RETRY_BASE_DELAY,
+            max_delay=settings.ACS_RETRY_MAX_DELAY,
+            should_retry=_upstream_unavailable,
+        )
+    except HTTPException as e:
+        if _upstream_unavailable(e):
+            _BREAKER.record_failure()
+        else:
+            _BREAKER.release_trial()
+        raise
+    except asyncio.CancelledError:
+        # The caller went away before Census answered: no verdict either way
+        _BREAKER.release_trial()
+        raise
+    except BaseException:
+        _BREAKER.record_failure()
+        raise
+    _BREAKER.record_success()
+    return response
+
+
+def _local_row(zcta: str) -> dict | None:
+    """The bulk-loaded row for zcta, unless the bulk copy is past ACS_CACHE_MAX_STALE."""
+    if _LOCAL_REFRESHED_AT is None:
+        return None
+    age = datetime.now(timezone.utc) - _LOCAL_REFRESHED_AT
+    if age >= timedelta(seconds=get_settings().ACS_CACHE_MAX_STALE):
+        return None
+    return _LOCAL.get(zcta)
+
+
+# zip code to ACS ZCTA mapping API endpoint
+async def _fetch_acs_zcta_async(zcta: str) -> dict:
+    local = _local_row(zcta)
+    if local is not None:
+        return local
+
+    settings = get_settings()
+    api_key = getattr(settings, "ACS_API_KEY", None)
+
+    if not api_key:
+        raise HTTPException(status_code=500, detail="ACS API key not configured")
+
+    # Concurrent misses for the same ZCTA share a single lookup
+    return await _CACHE.get_or_load(
+        f"zcta: {zcta}",
+        lambda: _load_acs_zcta(zcta, api_key),
+        # Refreshing a stale entry must not re-serve an equally old stored row
+        refresh_loader=lambda: _load_acs_zcta(zcta, api_key, use_persisted=False),
+    )
+
+
+# ----------------------------------------------------------
+# Persistent second tier shared by all workers (acs_zcta_data table)
+# ----------------------------------------------------------
+_PERSISTENT_STATS = {
+    "hits": 0,
+    "misses": 0,
+    "writes": 0,
+    "errors": 0,
+    "stale_served": 0,
+}
+
+
+def _persisted_max_age() -> timedelta:
+    """
+    Oldest stored row served as current: ACS_PERSISTENT_TTL_HOURS, but never
+    more than ACS_CACHE_MAX_STALE, the hard limit on serving old data.
+    """
+    settings = get_settings()
+    return min(
+        timedelta(hours=settings.ACS_PERSISTENT_TTL_HOURS),
+        timedelta(seconds=settings.ACS_CACHE_MAX_STALE),
+    )
+
+
+def _aged_row(record: AcsZctaData, now: datetime) -> Aged:
+    # Cached with its real age, so its time in the table counts towards max_stale
+    age = (now - _as_utc(record.fetched_at)).total_seconds()
+    return Aged({c: getattr(record, c) for c in _ROW_COLUMNS}, age)
+
+
+def _read_persisted(zcta: str, max_age: timedelta) -> Aged | None:
+    db = SessionLocal()
+    try:
+        record = db.get(AcsZctaData, zcta)
+    finally:
+        db.close()
+
+    if record is None:
+        return None
+    now = datetime.now(timezone.utc)
+    if now - _as_utc(record.fetched_at) > max_age:
+        return None
+    return _aged_row(record, now)
+
+
+def _read_persisted_many(zctas: list[str], max_age: timedelta) -> dict[str, Aged]:
+    db = SessionLocal()
+    try:
+        records = db.query(AcsZctaData).filter(AcsZctaData.zcta.in_(zctas)).all()
+    finally:
+        db.close()
+
+    now = datetime.now(timezone.utc)
+    return {
+        r.zcta: _aged_row(r, now)
+        for r in records
+        if now - _as_utc(r.fetched_at) <= max_age
+    }
+
+
+async def _read_stale(zcta: str) -> Aged | None:
+    """Return the persisted row for zcta whatever its age, or None."""
+    try:
+        return await asyncio.to_thread(_read_persisted, zcta, timedelta.max)
+    except Exception as e:
+        _PERSISTENT_STATS["errors"] += 1
+        logger.warning(f"ACS persistent cache read failed: {e}")
+        return None
+
+
+def _persist(row: dict):
+    _write_local_table({row["zcta"]: row}, datetime.now(timezone.utc))
+
+
+async def _load_acs_zcta(
+    zcta: str, api_key: str, use_persisted: bool = True
+) -> dict | Aged:
+    """
+    L1 miss: try the shared table, then the Census API (writing the result
+    back). Refreshes pass use_persisted=False to go straight to the API.
+    Stored rows are returned as Aged so the cache keeps their real age.
+    """
+    settings = get_settings()
+    if not settings.ACS_PERSISTENT_CACHE:
+        return await _request_acs_zcta(zcta, api_key)
+
+    row = None
+    if use_persisted:
+        try:
+            row = await asyncio.to_thread(_read_persisted, zcta, _persisted_max_age())
+        except Exception as e:
+            # The database is an optimisation; fall through to the Census API
+            _PERSISTENT_STATS["errors"] += 1
+            logger.warning(f"ACS persistent cache read failed: {e}")
+
+        if row is not None:
+            _PERSISTENT_STATS["hits"] += 1
+            return row
+        _PERSISTENT_STATS["misses"] += 1
+
+    try:
+        row = await _request_acs_zcta(zcta, api_key)
+    except HTTPException as e:
+        if not _upstream_unavailable(e):
+            raise
+        # Census is down or the breaker is open: an expired row beats an error
+        row = await _read_stale(zcta)
+        if row is None:
+            raise
+        _PERSISTENT_STATS["stale_served"] += 1
+        return row
+
+    try:
+        await asyncio.to_thread(_persist, {**row, "zcta": zcta})
+        _PERSISTENT_STATS["writes"] += 1
+    except Exception as e:
+        _PERSISTENT_STATS["errors"] += 1
+        logger.warning(f"ACS persistent cache write failed: {e}")
+    return row
+
+
+async def _request_acs_zcta(zcta: str, api_key: str) -> dict:
+    response = await _get_acs(
+        {
+            "get": ",".join(ACS_VARS.keys()),
+            "for": f"zip code tabulation area:{zcta}",
+            "key": api_key,
+        }
+    )
+
+    # The Census API answers 204 No Content for unknown ZCTAs
+    if response.status_code == 204:
+        raise HTTPException(
+            status_code=404, detail="No data found for the provided ZCTA"
+        )
+    if response.status_code != 200:
+        raise HTTPException(status_code=502, detail="Failed to fetch data from ACS API")
+
+    data = response.json()
+    if len(data) < 2:
+        raise HTTPException(
+            status_code=404, detail="No data found for the provided ZCTA"
+        )
+
+    return _parse_acs_row(data[0], data[1])
+
+
+def _parse_acs_row(header: list, values: list) -> dict:
+    """Turn one Census API result row into our ACS dict."""
+    raw = dict(zip(header, values))
+
+    out = {
+        "zcta": raw.get("zip code tabulation area", ""),
+        "name": raw.get("NAME", ""),
+    }
+    for acs_var, acs_name in ACS_VARS.items():
+        val = raw.get(acs_var)
+
+        try:
+            out[acs_name] = None if val in (None, "", "NA") else float(val)
+        except Exception:
+            out[acs_name] = None
+
+    # compute poverty rate
+    if out.get("poverty_count") is not None and out.get("poverty_total") not in (
+        0,
+        None,
+    ):
+        out["poverty_rate"] = out["poverty_count"] / out["poverty_total"]
+    else:
+        out["poverty_rate"] = None
+
+    return out
+
+
+# ----------------------------------------------------------
+# Bulk preload of every NYC ZCTA
+# ----------------------------------------------------------
+_ROW_COLUMNS = ["zcta", "name", *ACS_VARS.values(), "poverty_rate"]
+
+
+def _as_utc(dt: datetime) -> datetime:
+    # SQLite hands back naive datetimes
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _set_local(rows: dict[str, dict], refreshed_at: datetime):
+    global _LOCAL, _LOCAL_REFRESHED_AT, ACS_DATA_VERSION
+    # Re-reading an unchanged table (a second load, another worker's refresh)
+    # keeps the version, so caches keyed on it stay valid
+    if rows != _LOCAL:
+        ACS_DATA_VERSION += 1
+    _LOCAL = rows
+    _LOCAL_REFRESHED_AT = refreshed_at
+
+
+def _read_local_table() -> tuple[dict[str, dict], datetime | None]:
+    """
+    The stored NYC rows and when the oldest of them was fetched.
+
+    Rows written through for other ZCTAs share the table but aren't part of
+    the bulk copy: they neither count towards its freshness nor get served
+    from _LOCAL, which would bypass their TTLs.
+    """
+    db = SessionLocal()
+    try:
+        records = db.query(AcsZctaData).filter(AcsZctaData.zcta.in_(NYC_ZCTAS)).all()
+    finally:
+        db.close()
+
+    rows = {r.zcta: {c: getattr(r, c) for c in _ROW_COLUMNS} for r in records}
+    oldest = min((_as_utc(r.fetched_at) for r in records), default=None)
+    return rows, oldest
+
+
+def _write_local_table(rows: dict[str, dict], fetched_at: datetime):
+    db = SessionLocal()
+    try:
+        for row in rows.values():
+            db.merge(AcsZctaData(**row, fetched_at=fetched_at))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def _bulk_fetch(zctas: list[str]) -> dict[str, dict]:
+    """Fetch many ZCTAs from the Census API in a single request."""
+    api_key = get_settings().ACS_API_KEY
+    if not api_key:
+        raise HTTPException(status_code=500, detail="ACS API key not configured")
+
+    response = await _get_acs(
+        {
+            "get": ",".join(ACS_VARS.keys()),
+            "for": f"zip code tabulation area:{','.join(zctas)}",
+            "key": api_key,
+        }
+    )
+    if response.status_code == 204:
+        return {}
+    if response.status_code != 200:
+        raise HTTPException(status_code=502, detail="Failed to fetch data from ACS API")
+
+    data = response.json()
+    header = data[0]
+    rows = {}
+    for values in data[1:]:
+        row = _parse_acs_row(header, values)
+        rows[row["zcta"]] = row
+    return rows
+
+
+async def bulk_load_acs() -> int:
+    """Download every NYC ZCTA in one Census call and store it locally."""
+
+    async def _load():
+        rows = await _bulk_fetch(NYC_ZCTAS)
+        fetched_at = datetime.now(timezone.utc)
+        await asyncio.to_thread(_write_local_table, rows, fetched_at)
+        _set_local(rows, fetched_at)
+        return len(rows)
+
+    count = await run_async(_load())
+    logger.info(f"Bulk loaded ACS data for {count} ZCTAs")
+    return count
+
+
+async def load_local_acs() -> datetime | None:
+    """Load the stored ACS table into memory; returns when it was last refreshed."""
+
+    async def _load():
+        rows, refreshed_at = await asyncio.to_thread(_read_local_table)
+        if rows:
+            _set_local(rows, refreshed_at)
+        return refreshed_at
+
+    return await run_async(_load())
+
+
+async def acs_refresh_loop():
+    """
+    Keep the local ACS copy current.
+
+    Loads what is already stored, then refreshes from the Census API whenever
+    the oldest stored NYC row is older than ACS_REFRESH_HOURS. Another worker may
+    have refreshed the table in the meantime, so it is re-read before fetching.
+    """
+    interval = timedelta(hours=get_settings().ACS_REFRESH_HOURS)
+    while True:
+        try:
+            refreshed_at = await load_local_acs()
+            now = datetime.now(timezone.utc)
+            if refreshed_at is None or now - refreshed_at >= interval:
+                await bulk_load_acs()
+                refreshed_at = now
+            wait = (refreshed_at + interval - now).total_seconds()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"ACS refresh failed, retrying in 5 minutes: {e}")
+            wait = 300
+        await asyncio.sleep(max(wait, 60))
+
+
+async def fetch_acs_zcta(zcta: str) -> dict:
+    """Fetch ACS data for a ZCTA without blocking the caller's event loop."""
+    return await run_async(_fetch_acs_zcta_async(zcta))
+
+
+def _fetch_acs_zcta(zcta: str) -> dict:
+    """Blocking variant for sync callers such as worker threads."""
+    return run_sync(_fetch_acs_zcta_async(zcta))
+
+
+# ----------------------------------------------------------
+# Batch lookup
+# ----------------------------------------------------------
+MAX_BATCH_ZCTAS = 250
+
+
+async def _fetch_acs_zctas_async(
+    zctas: list[str],
+) -> tuple[dict[str, dict], list[str], list[str]]:
+    """
+    Resolve many ZCTAs at once: local copy and L1 cache first, then one query
+    against the shared table, then a single multi-ZCTA Census call for the rest.
+
+    Returns (found, not_found, unavailable). ``unavailable`` holds the ZCTAs
+    that Census couldn't be asked about (it's down or the breaker is open) and
+    that have no stored row to fall back on; the rest of the batch is still
+    returned.
+    """
+    settings = get_settings()
+    found: dict[str, dict] = {}
+    not_found: list[str] = []
+    missing: list[str] = []
+
+    for zcta in zctas:
+        local = _local_row(zcta)
+        if local is not None:
+            found[zcta] = local
+            continue
+        try:
+            cached = _CACHE.get(f"zcta: {zcta}")
+        except HTTPException:
+            not_found.append(zcta)
+            continue
+        if cached is not None:
+            found[zcta] = cached
+        else:
+            missing.append(zcta)
+
+    if missing and settings.ACS_PERSISTENT_CACHE:
+        max_age = _persisted_max_age()
+        try:
+            persisted = await asyncio.to_thread(_read_persisted_many, missing, max_age)
+        except Exception as e:
+            _PERSISTENT_STATS["errors"] += 1
+            logger.warning(f"ACS persistent cache read failed: {e}")
+            persisted = {}
+        _PERSISTENT_STATS["hits"] += len(persisted)
+        _PERSISTENT_STATS["misses"] += len(missing) - len(persisted)
+        for zcta, (row, age) in persisted.items():
+            _CACHE.set(f"zcta: {zcta}", row, age=age)
+            found[zcta] = row
+        missing = [z for z in missing if z not in persisted]
+
+    if missing:
+        try:
+            fetched = await _bulk_fetch(missing)
+        except HTTPException as e:
+            if not _upstream_unavailable(e):
+                raise
+            # Census is down or the breaker is open: fall back to expired rows
+            stale = {}
+            if settings.ACS_PERSISTENT_CACHE:
+                try:
+                    stale = await asyncio.to_thread(
+                        _read_persisted_many, missing, timedelta.max
+                    )
+                except Exception as db_error:
+                    _PERSISTENT_STATS["errors"] += 1
+                    logger.warning(f"ACS persistent cache read failed: {db_error}")
+            _PERSISTENT_STATS["stale_served"] += len(stale)
+            found.update({zcta: aged.value for zcta, aged in stale.items()})
+            unavailable = [z for z in missing if z not in stale]
+            if unavailable:
+                logger.warning(
+                    f"ACS unavailable for {len(unavailable)} ZCTA(s): {e.detail}"
+                )
+            return found, not_found, unavailable
+        fetched_at = datetime.now(timezone.utc)
+        for zcta in missing:
+            row = fetched.get(zcta)
+            if row is None:
+                not_found.append(zcta)
+                _CACHE.set_negative(
+                    f"zcta: {zcta}",
+                    HTTPException(
+                        status_code=404, detail="No data found for the provided ZCTA"
+                    ),
+                )
+            else:
+                _CACHE.set(f"zcta: {zcta}", row)
+                found[zcta] = row
+        if fetched and settings.ACS_PERSISTENT_CACHE:
+            try:
+                await asyncio.to_thread(_write_local_table, fetched, fetched_at)
+                _PERSISTENT_STATS["writes"] += len(fetched)
+            except Exception as e:
+                _PERSISTENT_STATS["errors"] += 1
+                logger.warning(f"ACS persistent cache write failed: {e}")
+
+    return found, not_found, []
+
+
+async def fetch_acs_zctas(
+    zctas: list[str],
+) -> tuple[dict[str, dict], list[str], list[str]]:
+    """Batch variant of fetch_acs_zcta; returns (found, not_found, unavailable)."""
+    return await run_async(_fetch_acs_zctas_async(zctas))
+
+
+def _fetch_acs_zctas(
+    zctas: list[str],
+) -> tuple[dict[str, dict], list[str], list[str]]:
+    """Blocking batch variant for sync callers."""
+    return run_sync(_fetch_acs_zctas_async(zctas))
+
+
+def _clean_zips(zips: list[str]) -> list[str]:
+    cleaned = list(dict.fromkeys(z.strip() for z in zips if z.strip()))
+    invalid = [z for z in cleaned if len(z) != 5 or not z.isdigit()]
+    if invalid:
+        raise HTTPException(
+            status_code=422, detail=f"Invalid ZIP code(s): {', '.join(invalid[:10])}"
+        )
+    if not cleaned:
+        raise HTTPException(status_code=422, detail="At least one ZIP code is required")
+    if len(cleaned) > MAX_BATCH_ZCTAS:
+        raise HTTPException(
+            status_code=422, detail=f"At most {MAX_BATCH_ZCTAS} ZIP codes per request"
+        )
+    return cleaned
+
+
+async def _batch_response(zips: list[str]) -> dict:
+    zips = _clean_zips(zips)
+    try:
+        found, not_found, unavailable = await fetch_acs_zctas(zips)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if len(unavailable) == len(zips):
+        raise HTTPException(status_code=503, detail="ACS API temporarily unavailable")
+    return {
+        "results": {z: found[z] for z in zips if z in found},
+        "not_found": not_found,
+        "unavailable": unavailable,
+    }
+
+
+class NeighborhoodsRequest(BaseModel):
+    """Request body for batch ACS lookups"""
+
+    zips: list[str] = Field(
+        ..., description="5-digit ZIP codes to retrieve ACS data for"
+    )
+
+
+@router.get("/neighborhoods", summary="Get ACS data for many ZIP codes")
+async def neighborhoods_stats(
+    zips: str = Query(..., description="Comma-separated 5-digit ZIP codes"),
+):
+    """
+    example: /api/acs/neighborhoods?zips=10001,11211
+    """
+    return await _batch_response(zips.split(","))
+
+
+@router.post("/neighborhoods", summary="Get ACS data for many ZIP codes")
+async def neighborhoods_stats_post(request: NeighborhoodsRequest):
+    """
+    example body: {"zips": ["10001", "11211"]}
+    """
+    return await _batch_response(request.zips)
+
+
+@router.get("/neighborhood", summary="Get ACS data for a given neighborhood")
+async def neighborhood_stats(
+    zip: str = Query(
+        ...,
+        min_length=5,
+        max_length=5,
+        description="The ZIP code to retrieve ACS data for",
+    ),
+):
+    """
+    example: /api/acs/neighborhood?zip=90210
+    """
+    try:
+        return await fetch_acs_zcta(zip)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/status", summary="Local ACS copy status")
+def acs_status():
+    return {
+        "local_zctas": len(_LOCAL),
+        "refreshed_at": (
+            _LOCAL_REFRESHED_AT.isoformat() if _LOCAL_REFRESHED_AT else None
+        ),
+        "data_version": ACS_DATA_VERSION,
+    }
+
+
+@router.get("/metrics", summary="ACS cache and circuit breaker metrics")
+def acs_metrics():
+    return {
+        "cache": _CACHE.stats(),
+        "persistent_cache": dict(_PERSISTENT_STATS),
+        "breaker": _BREAKER.stats(),
+    }
@@ -1,13 +1,20 @@
-import json
+import asyncio
 import logging
 import uuid
-from typing import AsyncGenerator
-
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse
-from langchain.messages import AIMessage, AIMessageChunk, ToolMessage
-
-from app.agent.agent import get_agent
+from typing import AsyncGenerator, AsyncIterator, Callable, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Header
+from langchain.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+
+from app.agent.agent import get_agent, get_checkpointer, get_response_cache
+from app.agent.compaction import compaction_stats
+from app.agent.router import fast_path_stats, match_fast_path
+from app.agent.streams import StreamRegistry
+from app.agent.tool_cache import TOOL_CACHE, watch_turn_failures
+from app.agent.tools import AGENT_TOOLS
+from app.core.config import get_settings
+from app.core.concurrency import ConcurrencyLimiter, ConcurrencyLimitExceeded, Lease
+from app.core.sse import EventStreamResponse, encode_sse
 from app.schemas.agent import ChatRequest, ChatResponse
 from app.api.auth import get_current_user
 
@@ -15,14 +22,227 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/agent", tags=["Agent"])
 
+TOOLS_BY_NAME = {t.name: t for t in AGENT_TOOLS}
+
+_settings = get_settings()
+# Agent runs admitted at once in this worker, overall and per user
+AGENT_LIMITER = ConcurrencyLimiter(
+    max_active=_settings.AGENT_MAX_CONCURRENT_RUNS,
+    max_per_key=_settings.AGENT_MAX_RUNS_PER_USER,
+    max_waiting=_settings.AGENT_MAX_QUEUED_RUNS,
+    wait_timeout=_settings.AGENT_QUEUE_TIMEOUT,
+)
+
+# Streamed turns run in the background so a dropped client can resume them
+STREAMS = StreamRegistry(
+    resume_window=_settings.AGENT_STREAM_RESUME_SECONDS,
+    buffer_size=_settings.AGENT_STREAM_BUFFER_EVENTS,
+)
+
+
+async def _admit(user_id: str) -> Lease:
+    """Wait for an agent run slot, or fail with 429 and a Retry-After hint."""
+    try:
+        return await AGENT_LIMITER.acquire(user_id)
+    except ConcurrencyLimitExceeded as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"The assistant is busy ({e.reason}). Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+class ReplayedTurn:
+    """A turn answered without the LLM: the tool events and the final answer."""
+
+    def __init__(self, answer: str, trace: list[dict], node: str):
+        self.answer = answer
+        self.trace = trace
+        self.node = node
+
+    def tool_calls(self) -> list[dict]:
+        return [e for e in self.trace if e["event"] == "tool_call"]
+
+    def events(self, thread_id: str) -> list[dict]:
+        """The SSE events a live agent run would have sent."""
+        return [
+            *self.trace,
+            {"event": "token", "content": self.answer, "node": self.node},
+            {
+                "event": "done",
+                "thread_id": thread_id,
+                "final_message": self.answer,
+                "tokens_saved": 0,
+            },
+        ]
+
+    def messages(self, message: str) -> list:
+        """The turn as thread messages, so follow-up questions see it."""
+        messages = [HumanMessage(content=message)]
+        if self.tool_calls():
+            messages.append(
+                AIMessage(
+                    content="",
+                    tool_calls=[
+                        {
+                            "name": e["tool_name"],
+                            "args": e["tool_args"],
+                            "id": e["tool_call_id"],
+                        }
+                        for e in self.tool_calls()
+                    ],
+                )
+            )
+        messages += [
+            ToolMessage(
+                content=e["content"],
+                tool_call_id=e["tool_call_id"],
+                name=e["tool_name"],
+            )
+            for e in self.trace
+            if e["event"] == "tool_result"
+        ]
+        messages.append(AIMessage(content=self.answer))
+        return messages
+
+
+async def _record_turn(config: dict, message: str, turn: ReplayedTurn):
+    try:
+        await get_agent().aupdate_state(
+            config, {"messages": turn.messages(message)}, as_node="model"
+        )
+    except Exception as e:
+        logger.warning(f"Could not record {turn.node} answer in thread: {e}")
+
+
+async def _try_fast_path(message: str, config: dict) -> ReplayedTurn | None:
+    """
+    Answer simple lookups by calling the matching tool directly.
+
+    Returns None when the agent should handle the message.
+    """
+    if not get_settings().AGENT_FAST_PATH:
+        return None
+    match = match_fast_path(message)
+    fast_path_stats.record(match)
+    if match is None:
+        return None
+
+    # Tools report failures as error text, marked uncacheable, rather than raising
+    failures = watch_turn_failures()
+    try:
+        result = await TOOLS_BY_NAME[match.tool_name].ainvoke(match.args)
+    except Exception as e:
+        fast_path_stats.record_error()
+        logger.warning(f"Fast path failed, falling back to the agent: {e}")
+        return None
+    if failures:
+        fast_path_stats.record_error()
+        logger.warning(f"Fast path tool failed, falling back to the agent: {result}")
+        return None
+
+    tool_call_id = f"fast_{uuid.uuid4().hex[:12]}"
+    turn = ReplayedTurn(
+        f"{match.lead_in()}\n\n{result}",
+        [
+            {
+                "event": "tool_call",
+                "tool_name": match.tool_name,
+                "tool_args": match.args,
+                "tool_call_id": tool_call_id,
+            },
+            {
+                "event": "tool_result",
+                "tool_name": match.tool_name,
+                "tool_call_id": tool_call_id,
+                "content": result,
+            },
+        ],
+        node="fast_path",
+    )
+    await _record_turn(config, message, turn)
+    return turn
+
+
+async def _is_first_turn(agent, config: dict) -> bool:
+    state = await agent.aget_state(config)
+    return not state.values.get("messages")
+
+
+async def _try_response_cache(message: str, config: dict) -> ReplayedTurn | None:
+    """Replay a cached answer to the same first-turn question, if any."""
+    cached = await asyncio.to_thread(get_response_cache().lookup, message)
+    if cached is None:
+        return None
+
+    # Fresh IDs so the replayed calls don't collide with the original thread's
+    ids = {}
+    trace = [
+        {
+            **e,
+            "tool_call_id": ids.setdefault(
+                e["tool_call_id"], f"cache_{uuid.uuid4().hex[:12]}"
+            ),
+        }
+        for e in cached.trace
+    ]
+    turn = ReplayedTurn(cached.answer, trace, node="cache")
+    await _record_turn(config, message, turn)
+    return turn
+
+
+def _ensure_not_streaming(key: str):
+    """Fail with 409 while a turn is still running for this conversation."""
+    run = STREAMS.get(key)
+    if run is not None and not run.finished:
+        raise HTTPException(
+            status_code=409,
+            detail="A response is still streaming for this conversation",
+        )
+
+
+def _encode_events(events: AsyncIterator[dict]) -> AsyncGenerator[bytes, None]:
+    """
+    Encode events as a Server-Sent Events stream.
+
+    Token events are coalesced and heartbeats sent as configured by the
+    SSE_* settings.
+    """
+    settings = get_settings()
+    return encode_sse(
+        events,
+        flush_interval=settings.SSE_FLUSH_INTERVAL,
+        flush_bytes=settings.SSE_FLUSH_BYTES,
+        heartbeat_interval=settings.SSE_HEARTBEAT_SECONDS,
+    )
+
 
-async def _generate_stream_events(
+def _generate_stream_events(
     message: str,
     thread_id: str,
     user_id: str,
-) -> AsyncGenerator[str, None]:
+    on_finish: Optional[Callable[[], None]] = None,
+) -> AsyncGenerator[bytes, None]:
     """
-    Generate Server-Sent Events from the agent's streaming response.
+    Start one turn as a resumable background run and stream it as SSE.
+
+    Every event carries an ID; on_finish is called once the run ends.
+    """
+    run = STREAMS.start(
+        f"{user_id}:{thread_id}",
+        _agent_events(message, thread_id, user_id),
+        on_finish=on_finish,
+    )
+    return _encode_events(run.subscribe())
+
+
+async def _agent_events(
+    message: str,
+    thread_id: str,
+    user_id: str,
+) -> AsyncGenerator[dict, None]:
+    """
+    Generate stream events from the agent's streaming response.
 
     Uses LangChain's native streaming with multiple stream modes:
     - "messages": For token-by-token LLM output
@@ -35,17 +255,36 @@ async def _generate_stream_events(
         user_id: Current user's ID for thread isolation
 
     Yields:
-        JSON-formatted SSE events
+        Event dicts (token, tool_call, tool_result, custom, done, error)
     """
-    agent = get_agent()
-
     # Use user_id + thread_id for proper isolation
-    config = {"configurable": {"thread_id": 1}}
+    config = {"configurable": {"thread_id": f"{user_id}:{thread_id}"}}
+
+    # Simple lookups are answered without a model round trip
+    turn = await _try_fast_path(message, config)
+    if turn is not None:
+        for event in turn.events(thread_id):
+            yield event
+        return
+
+    agent = get_agent()
 
     input_message = {"role": "user", "content": message}
     final_content = []
+    # tool_call / tool_result events, kept for the response cache
+    trace = []
+    cache_turn = False
 
     try:
+        if get_settings().AGENT_RESPONSE_CACHE and await _is_first_turn(agent, config):
+            turn = await _try_response_cache(message, config)
+            if turn is not None:
+                for event in turn.events(thread_id):
+                    yield event
+                return
+            cache_turn = True
+        tool_failures = watch_turn_failures()
+
         # Stream with multiple modes for comprehensive updates
         async for stream_mode, data in agent.astream(
             {"messages": [input_message]},
@@ -84,7 +323,7 @@ async def _generate_stream_events(
                                 "content": text,
                                 "node": node,
                             }
-                            yield f"data: {json.dumps(event)}\n\n"
+                            yield event
 
                     # Handle tool call chunks
                     if hasattr(token, "tool_call_chunks") and token.tool_call_chunks:
@@ -95,7 +334,7 @@ async def _generate_stream_events(
                                     "tool_name": chunk.get("name"),
                                     "tool_call_id": chunk.get("id", ""),
                                 }
-                                yield f"data: {json.dumps(event)}\n\n"
+                                yield event
 
             elif stream_mode == "updates":
                 # Step completion events
@@ -114,7 +353,8 @@ async def _generate_stream_events(
                                         "tool_args": tc.get("args", {}),
                                         "tool_call_id": tc.get("id", ""),
                                     }
-                                    yield f"data: {json.dumps(event)}\n\n"
+                                    trace.append(event)
+                                    yield event
 
                     elif source == "tools":
                         # Tool execution completed
@@ -125,11 +365,14 @@ async def _generate_stream_events(
                                     "event": "tool_result",
                                     "tool_name": msg.name,
                                     "tool_call_id": msg.tool_call_id,
-                                    "content": msg.content
-                                    if isinstance(msg.content, str)
-                                    else str(msg.content),
+                                    "content": (
+                                        msg.content
+                                        if isinstance(msg.content, str)
+                                        else str(msg.content)
+                                    ),
                                 }
-                                yield f"data: {json.dumps(event)}\n\n"
+                                trace.append(event)
+                                yield event
 
             elif stream_mode == "custom":
                 # Custom progress updates from tools (via get_stream_writer)
@@ -137,15 +380,23 @@ async def _generate_stream_events(
                     "event": "custom",
                     "message": str(data),
                 }
-                yield f"data: {json.dumps(event)}\n\n"
+                yield event
+
+        if cache_turn and final_content and not tool_failures:
+            await asyncio.to_thread(
+                get_response_cache().store, message, "".join(final_content), trace
+            )
 
         # Send done event with final message
         done_event = {
             "event": "done",
             "thread_id": thread_id,
             "final_message": "".join(final_content),
+            "tokens_saved": compaction_stats.pop_turn(
+                config["configurable"]["thread_id"]
+            ),
         }
-        yield f"data: {json.dumps(done_event)}\n\n"
+        yield done_event
 
     except Exception as e:
         logger.exception(f"Error in agent stream: {e}")
@@ -154,13 +405,14 @@ async def _generate_stream_events(
             "error": str(e),
             "error_type": type(e).__name__,
         }
-        yield f"data: {json.dumps(error_event)}\n\n"
+        yield error_event
 
 
 @router.post("/chat/stream")
 async def chat_stream(
     request: ChatRequest,
     user: dict = Depends(get_current_user),
+    last_event_id: Optional[str] = Header(default=None),
 ):
     """
     Stream a chat response from the Neighborhood Navigator agent.
@@ -174,16 +426,46 @@ async def chat_stream(
     - error: If an error occurs
 
     Use the thread_id to maintain conversation context across requests.
+    Responds 429 with Retry-After when too many runs are active or queued.
+
+    Every event has an SSE id. After a dropped connection, repeat the request
+    with the same thread_id and a Last-Event-ID header to receive the missed
+    events and follow the still-running response.
     """
     # if user is None:
     #     raise HTTPException(status_code=401, detail="Authentication required")
 
     user_id = str(user.get("id", user.get("sub", "anonymous")))
     thread_id = request.thread_id or str(uuid.uuid4())
+    key = f"{user_id}:{thread_id}"
+
+    run = STREAMS.get(key)
+    if last_event_id:
+        # Reattach to the run the client lost, replaying what it missed
+        after = run.parse_event_id(last_event_id) if run is not None else None
+        if after is None:
+            raise HTTPException(
+                status_code=410,
+                detail="This response can no longer be resumed; send the message again",
+            )
+        STREAMS.resumed += 1
+        body = _encode_events(run.subscribe(after))
+    else:
+        _ensure_not_streaming(key)
+        lease = await _admit(user_id)
+        try:
+            # Admission may have waited, so check again once a slot is granted
+            _ensure_not_streaming(key)
+        except HTTPException:
+            lease.release()
+            raise
+        body = _generate_stream_events(
+            request.message, thread_id, user_id, on_finish=lease.release
+        )
 
-    return StreamingResponse(
-        _generate_stream_events(request.message, thread_id, user_id),
-        media_type="text/event-stream",
+    # A run left without a client is cancelled after AGENT_STREAM_RESUME_SECONDS
+    return EventStreamResponse(
+        body,
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
@@ -192,10 +474,22 @@ async def chat_stream(
     )
 
 
+async def _agent_slot(user: dict = Depends(get_current_user)):
+    """Hold an agent run slot for the duration of a non-streaming request."""
+    if user is None:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    lease = await _admit(str(user.get("id", user.get("sub", "anonymous"))))
+    try:
+        yield lease
+    finally:
+        lease.release()
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
     user: dict = Depends(get_current_user),
+    _slot: Lease = Depends(_agent_slot),
 ):
     """
     Non-streaming chat endpoint (fallback for clients that don't support SSE).
@@ -208,10 +502,18 @@ async def chat(
     user_id = str(user.get("id", user.get("sub", "anonymous")))
     thread_id = request.thread_id or str(uuid.uuid4())
 
-    agent = get_agent()
-
     config = {"configurable": {"thread_id": f"{user_id}:{thread_id}"}}
 
+    turn = await _try_fast_path(request.message, config)
+    if turn is not None:
+        return ChatResponse(
+            message=turn.answer,
+            thread_id=thread_id,
+            tool_calls=turn.tool_calls(),
+        )
+
+    agent = get_agent()
+
     input_message = {"role": "user", "content": request.message}
 
     try:
@@ -248,6 +550,7 @@ async def chat(
             message=final_message,
             thread_id=thread_id,
             tool_calls=tool_calls,
+            tokens_saved=compaction_stats.pop_turn(config["configurable"]["thread_id"]),
         )
 
     except Exception as e:
@@ -260,6 +563,25 @@ async def agent_health():
     """Check if the agent service is healthy."""
     try:
         agent = get_agent()
-        return {"status": "healthy", "agent_initialized": agent is not None}
+        return {
+            "status": "healthy",
+            "agent_initialized": agent is not None,
+            "checkpointer": get_checkpointer().stats(),
+            "compaction": compaction_stats.stats(),
+        }
     except Exception as e:
         return {"status": "unhealthy", "error": str(e)}
+
+
+@router.get("/metrics")
+async def agent_metrics():
+    """Run admission, fast path, caches, compaction and memory counters."""
+    return {
+        "concurrency": AGENT_LIMITER.stats(),
+        "streams": STREAMS.stats(),
+        "fast_path": fast_path_stats.stats(),
+        "response_cache": get_response_cache().stats(),
+        "tool_cache": TOOL_CACHE.stats(),
+        "compaction": compaction_stats.stats(),
+        "checkpointer": get_checkpointer().stats(),
+    }
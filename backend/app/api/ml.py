@@ -1,18 +1,107 @@
 #backend/app/api/ml.py
-from fastapi import APIRouter, HTTPException
-from app.model_loader import predict_nsqi_for_district
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from starlette import status
+from app.core.config import get_settings
+from app.model_loader import (
+    registry,
+    predict_nsqi_for_district,
+    find_similar_districts,
+    get_district_trends,
+)
 
 router = APIRouter(prefix="/ml", tags=["Machine Learning"])
 
+
+def model_version(
+    model_version: Optional[str] = Query(
+        None, description="Model version to use, e.g. 'tuned' for nsqi_model_tuned.pkl"
+    ),
+    x_model_version: Optional[str] = Header(None),
+) -> Optional[str]:
+    """Pick the model version from the query string, falling back to the X-Model-Version header."""
+    return model_version or x_model_version
+
+
 @router.get("/predict")
-def predict(community_district: str):
+def predict(community_district: str, version: Optional[str] = Depends(model_version)):
     """
     Example:
     /api/ml/predict?community_district=BK15
     """
     try:
-        return predict_nsqi_for_district(community_district)
+        return predict_nsqi_for_district(community_district, version=version)
+    except ValueError as ve:
+        raise HTTPException(status_code=404, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/similar")
+def similar(
+    community_district: str,
+    k: int = Query(5, ge=1, le=20, description="Number of similar districts to return"),
+    version: Optional[str] = Depends(model_version),
+):
+    """
+    Example:
+    /api/ml/similar?community_district=BK15&k=5
+    """
+    try:
+        return find_similar_districts(community_district, k=k, version=version)
+    except ValueError as ve:
+        raise HTTPException(status_code=404, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/trends")
+def trends(
+    community_district: str,
+    indicator: Optional[list[str]] = Query(
+        None, description="Limit the response to these indicators"
+    ),
+    version: Optional[str] = Depends(model_version),
+):
+    """
+    Example:
+    /api/ml/trends?community_district=BK15&indicator=quality_index_0_100
+    """
+    try:
+        return get_district_trends(
+            community_district, indicators=indicator, version=version
+        )
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/model")
+def model_info():
+    """Return the active model version, its load time, reload status and resident versions."""
+    return registry.status()
+
+
+@router.post("/reload", status_code=status.HTTP_202_ACCEPTED)
+def reload_model(
+    reload_dataset: bool = True,
+    x_reload_token: Optional[str] = Header(None),
+):
+    """
+    Load the model bundle (and optionally the dataset) again in the background
+    and swap it in once it passes the feature-column check.
+
+    Requires the X-Reload-Token header to match MODEL_RELOAD_TOKEN.
+    """
+    expected = get_settings().MODEL_RELOAD_TOKEN
+    if not expected or not x_reload_token or not secrets.compare_digest(
+        x_reload_token, expected
+    ):
+        raise HTTPException(status_code=403, detail="Model reload not permitted")
+
+    if not registry.reload(reload_dataset=reload_dataset):
+        raise HTTPException(status_code=409, detail="A reload is already in progress")
+
+    return {"status": "reloading", "active_version": registry.active_version}
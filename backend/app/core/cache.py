@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class Aged(NamedTuple):
+    """Loader result whose data is already ``age`` seconds old, e.g. a stored row."""
+
+    value: Any
+    age: float
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at", "produced_at", "error")
+
+    def __init__(
+        self,
+        value: Any,
+        stored_at: float,
+        error: Exception | None = None,
+        produced_at: float | None = None,
+    ):
+        self.value = value
+        self.stored_at = stored_at
+        self.produced_at = stored_at if produced_at is None else produced_at
+        self.error = error
+
+
+class TTLCache:
+    """
+    Bounded LRU cache with per-entry TTL.
+
+    - At most ``maxsize`` entries; the least recently used one is evicted first.
+    - ``negative_ttl`` caches "not found" errors (see ``is_negative``) so repeated
+      lookups for a missing key don't hit the origin again.
+    - ``get_or_load`` coalesces concurrent misses for the same key into a single
+      loader call (single-flight). It must always be awaited from the same event loop.
+    - With ``max_stale`` > ``ttl``, ``get_or_load`` serves entries between the two
+      ages immediately and refreshes them in the background (stale-while-revalidate);
+      past ``max_stale`` the caller waits for a fresh load. A ``refresh_loader``
+      can be given for the background refresh, e.g. one that skips a slower tier
+      holding the same stale data.
+    - ``max_stale`` counts from when the data was produced, not when it was
+      cached: values set with an ``age`` (or loaded as ``Aged``) are dropped
+      once that age plus their time in the cache reaches ``max_stale``.
+    - With ``cancel_abandoned``, a load is cancelled once every caller waiting
+      on it has been cancelled (background refreshes have no callers and run
+      to completion). Without it, the load finishes and fills the cache.
+
+    get/set are thread-safe; hit/miss/eviction counters are exposed via stats().
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        negative_ttl: float = 0,
+        is_negative: Callable[[Exception], bool] | None = None,
+        max_stale: float | None = None,
+        cancel_abandoned: bool = False,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_stale = max(max_stale or ttl, ttl)
+        self.negative_ttl = negative_ttl
+        self.is_negative = is_negative or (lambda e: False)
+        self.cancel_abandoned = cancel_abandoned
+
+        self._data: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.loads = 0
+        self.coalesced = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.abandoned = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _lookup(self, key: Hashable, allow_stale: bool = False) -> tuple[_Entry | None, bool]:
+        """
+        Return (entry, is_stale) for a usable entry and mark it recently used.
+        Caller holds _lock.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return None, False
+        now = time.monotonic()
+        age = now - entry.stored_at
+        if entry.error is not None:
+            dead = age >= self.negative_ttl
+            expired = dead
+        else:
+            dead = now - entry.produced_at >= self.max_stale
+            expired = dead or (not allow_stale and age >= self.ttl)
+        if expired:
+            # Keep entries that a later stale-allowed lookup could still serve
+            if dead:
+                del self._data[key]
+                self.expirations += 1
+            return None, False
+        self._data.move_to_end(key)
+        return entry, entry.error is None and age >= self.ttl
+
+    def _store(self, key: Hashable, entry: _Entry):
+        """Insert an entry and evict down to maxsize. Caller holds _lock."""
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, re-raise a cached negative result, or return default."""
+        with self._lock:
+            entry, _ = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry.error is not None:
+                self.negative_hits += 1
+                raise entry.error
+            self.hits += 1
+            return entry.value
+
+    def set(self, key: Hashable, value: Any, age: float = 0.0):
+        """Cache value; ``age`` is how old the data already is, in seconds."""
+        now = time.monotonic()
+        with self._lock:
+            self._store(key, _Entry(value, now, produced_at=now - max(age, 0.0)))
+
+    def set_negative(self, key: Hashable, error: Exception):
+        if self.negative_ttl <= 0:
+            return
+        with self._lock:
+            self._store(key, _Entry(None, time.monotonic(), error))
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        refresh_loader: Callable[[], Awaitable[Any]] | None = None,
+    ) -> Any:
+        """Return the cached value or load it, sharing one in-flight load per key."""
+        with self._lock:
+            entry, stale = self._lookup(key, allow_stale=True)
+            if entry is not None:
+                if entry.error is not None:
+                    self.negative_hits += 1
+                    raise entry.error
+                if stale:
+                    self.stale_hits += 1
+                else:
+                    self.hits += 1
+            else:
+                self.misses += 1
+
+        if entry is not None:
+            if stale and key not in self._inflight:
+                self._schedule_refresh(key, refresh_loader or loader)
+            return entry.value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await self._wait(key, inflight)
+
+        return await self._wait(key, self._start_load(key, loader))
+
+    def _schedule_refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        """Reload a stale entry in the background; the stale value stays on failure."""
+
+        def _done(task: asyncio.Task):
+            if task.cancelled():
+                return
+            error = task.exception()
+            if error is None:
+                self.refreshes += 1
+            else:
+                self.refresh_errors += 1
+                logger.warning(f"Background cache refresh failed for {key!r}: {error}")
+
+        self._start_load(key, loader).add_done_callback(_done)
+
+    def _start_load(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> asyncio.Task:
+        """
+        Run the loader as a detached task that callers await through a shield,
+        so a cancelled caller leaves the load running for the others.
+        """
+        task = asyncio.get_running_loop().create_task(self._run_loader(key, loader))
+        self._inflight[key] = task
+        # Mark retrieved so a failure with no waiters isn't logged as unhandled
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def _wait(self, key: Hashable, task: asyncio.Task) -> Any:
+        """Await a load through a shield, counting the callers still waiting on it."""
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if (
+                self.cancel_abandoned
+                and self._waiters[task] == 1
+                and not task.done()
+            ):
+                # Last caller gone: stop the load, and let the next caller start anew
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+                task.cancel()
+                self.abandoned += 1
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    async def _run_loader(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        try:
+            self.loads += 1
+            value = await loader()
+        except Exception as e:
+            # A failed refresh must not replace a still-servable stale value
+            if self.is_negative(e) and key not in self._data:
+                self.set_negative(key, e)
+            raise
+        else:
+            if isinstance(value, Aged):
+                value, age = value
+                self.set(key, value, age=age)
+            else:
+                self.set(key, value)
+            return value
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    def stats(self) -> dict:
+        served = self.hits + self.stale_hits + self.negative_hits
+        lookups = served + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "abandoned": self.abandoned,
+        }
@@ -0,0 +1,144 @@
+import asyncio
+import math
+import time
+from collections import deque
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """Raised when a run can't be admitted; retry_after is a hint in seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Lease:
+    """A slot held by one run; release() is idempotent."""
+
+    def __init__(self, limiter: "ConcurrencyLimiter", key: str):
+        self._limiter = limiter
+        self.key = key
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self._limiter._release(self)
+
+
+class ConcurrencyLimiter:
+    """
+    Caps concurrent runs per process (``max_active``) and per key
+    (``max_per_key``, e.g. a user ID).
+
+    Runs that can't start at once wait in a FIFO queue of at most
+    ``max_waiting`` entries for up to ``wait_timeout`` seconds; beyond that
+    acquire() raises ConcurrencyLimitExceeded. A waiter blocked only by its own
+    per-key limit doesn't hold up other keys. Meant for a single event loop.
+    """
+
+    def __init__(
+        self,
+        max_active: int = 32,
+        max_per_key: int = 2,
+        max_waiting: int = 64,
+        wait_timeout: float = 10.0,
+    ):
+        self.max_active = max_active
+        self.max_per_key = max_per_key
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._active: dict[str, int] = {}
+        self._total = 0
+        self._waiters: deque[tuple[str, asyncio.Future]] = deque()
+        # Smoothed run duration, used for Retry-After
+        self._avg_duration = 5.0
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _can_start(self, key: str) -> bool:
+        return (
+            self._total < self.max_active
+            and self._active.get(key, 0) < self.max_per_key
+        )
+
+    def _start(self, key: str) -> Lease:
+        self._total += 1
+        self._active[key] = self._active.get(key, 0) + 1
+        self.admitted += 1
+        return Lease(self, key)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up."""
+        backlog = (len(self._waiters) + 1) / max(1, self.max_active)
+        return max(1, math.ceil(self._avg_duration * backlog))
+
+    async def acquire(self, key: str) -> Lease:
+        """Wait for a slot for key; the caller must release() the returned lease."""
+        # Anyone still waiting while a slot is free is blocked by their own key
+        if self._can_start(key):
+            return self._start(key)
+        if len(self._waiters) >= self.max_waiting:
+            self.rejected += 1
+            raise ConcurrencyLimitExceeded("too many queued runs", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (key, future)
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            return await asyncio.wait_for(future, self.wait_timeout)
+        except TimeoutError:
+            # Granted in the same tick the wait timed out: hand the slot back
+            if future.done() and not future.cancelled():
+                future.result().release()
+            self.timeouts += 1
+            raise ConcurrencyLimitExceeded(
+                "timed out waiting for a free slot", self.retry_after()
+            ) from None
+        except asyncio.CancelledError:
+            # Granted just as the caller went away: hand the slot back
+            if future.done() and not future.cancelled():
+                future.result().release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _release(self, lease: Lease):
+        self._total -= 1
+        self._active[lease.key] -= 1
+        if not self._active[lease.key]:
+            del self._active[lease.key]
+        duration = time.monotonic() - lease.started
+        self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+
+        for waiter in list(self._waiters):
+            key, future = waiter
+            if self._total >= self.max_active:
+                break
+            if future.done():
+                self._waiters.remove(waiter)
+            elif self._can_start(key):
+                self._waiters.remove(waiter)
+                future.set_result(self._start(key))
+
+    def stats(self) -> dict:
+        return {
+            "active": self._total,
+            "max_active": self.max_active,
+            "max_per_key": self.max_per_key,
+            "waiting": len(self._waiters),
+            "max_waiting": self.max_waiting,
+            "keys_active": len(self._active),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "retry_after": self.retry_after(),
+        }
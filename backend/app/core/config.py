@@ -11,10 +11,108 @@ class Settings(BaseSettings):
     MICROSOFT_CLIENT_ID: str
     MICROSOFT_CLIENT_SECRET: str
     ACS_API_KEY: str
+    ACS_BASE_URL: str = "https://api.census.gov/data/2023/acs/acs5"
+    ACS_CONNECT_TIMEOUT: float = 3.0
+    ACS_READ_TIMEOUT: float = 10.0
+    # Retries for timeouts, connection errors and 5xx/429 answers, with jittered backoff
+    ACS_RETRY_ATTEMPTS: int = 3
+    ACS_RETRY_BASE_DELAY: float = 0.25
+    ACS_RETRY_MAX_DELAY: float = 2.0
+    # Consecutive failed calls before the Census API is skipped for a while
+    ACS_BREAKER_FAILURE_THRESHOLD: int = 5
+    ACS_BREAKER_RESET_SECONDS: float = 30.0
+    # Max in-flight Census API requests per worker
+    ACS_MAX_CONCURRENCY: int = 10
+    # In-process LRU of single-ZCTA lookups not covered by the bulk preload
+    ACS_CACHE_MAX_ENTRIES: int = 2048
+    ACS_CACHE_TTL: float = 3600.0
+    # Expired entries are served while refreshing in the background up to this age
+    ACS_CACHE_MAX_STALE: float = 7 * 24 * 3600.0
+    ACS_NEGATIVE_CACHE_TTL: float = 600.0
+    # Second cache tier in the acs_zcta_data table, shared by workers and restarts;
+    # rows are trusted for ACS_PERSISTENT_TTL_HOURS but never past ACS_CACHE_MAX_STALE
+    ACS_PERSISTENT_CACHE: bool = True
+    ACS_PERSISTENT_TTL_HOURS: float = 720.0
+    # Bulk-load every NYC ZCTA into the acs_zcta_data table at startup
+    ACS_PRELOAD: bool = True
+    ACS_REFRESH_HOURS: float = 24.0
+
+    # Load the model, ACS table, search index and agent at startup; /ready
+    # reports 503 until this is done (immediately ready when disabled)
+    WARMUP_ON_STARTUP: bool = True
+    # A failed required step (the model) is retried with exponential backoff
+    WARMUP_RETRY_DELAY: float = 5.0
+    WARMUP_RETRY_MAX_DELAY: float = 300.0
+
+    # Shared outbound HTTP client pool (app/core/http.py)
+    HTTP_MAX_CONNECTIONS: int = 50
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_READ_TIMEOUT: float = 15.0
 
     # Agent configuration
     OPENAI_API_KEY: str = ""
     AGENT_MODEL: str = "openai:gpt-5-nano"
+    # AGENT_MODEL="fake" streams scripted answers (see app/agent/fake_model.py)
+    AGENT_FAKE_TOKEN_DELAY: float = 0.02
+    AGENT_FAKE_RESPONSE_TOKENS: int = 60
+    # Threads for model inference and pandas work inside agent tools
+    AGENT_TOOL_WORKERS: int = 4
+    # Conversation memory: resident threads, idle TTL and checkpoints kept per thread
+    AGENT_CHECKPOINT_PERSIST: bool = True
+    AGENT_MAX_THREADS: int = 1000
+    AGENT_THREAD_TTL_HOURS: float = 72.0
+    AGENT_MAX_CHECKPOINTS_PER_THREAD: int = 5
+    # History compaction: trim old tool results, then summarize older turns
+    AGENT_COMPACTION: bool = True
+    AGENT_TOOL_RESULT_TRIGGER_TOKENS: int = 3000
+    AGENT_KEEP_TOOL_RESULTS: int = 3
+    AGENT_SUMMARY_TRIGGER_TOKENS: int = 8000
+    AGENT_SUMMARY_KEEP_MESSAGES: int = 12
+    # Model used for summaries; empty means AGENT_MODEL
+    AGENT_SUMMARY_MODEL: str = ""
+    # Tool results shared across conversations, keyed by args and data versions
+    AGENT_TOOL_CACHE: bool = True
+    AGENT_TOOL_CACHE_MAX_ENTRIES: int = 4096
+    AGENT_TOOL_CACHE_TTL: float = 3600.0
+    # Answer plain "NSQI for 11211" / "compare A and B" messages without the LLM
+    AGENT_FAST_PATH: bool = True
+    # Replay answers to repeated first-turn questions (opt-in)
+    AGENT_RESPONSE_CACHE: bool = False
+    AGENT_RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    AGENT_RESPONSE_CACHE_TTL: float = 3600.0
+    # Local sentence-transformers model, e.g. "all-MiniLM-L6-v2"; empty means
+    # questions match on normalized text only
+    AGENT_RESPONSE_CACHE_EMBEDDING_MODEL: str = ""
+    AGENT_RESPONSE_CACHE_SIMILARITY: float = 0.92
+    # Agent runs per worker: active overall and per user, then a bounded wait
+    # queue; beyond that chat requests get 429 with Retry-After
+    AGENT_MAX_CONCURRENT_RUNS: int = 32
+    AGENT_MAX_RUNS_PER_USER: int = 2
+    AGENT_MAX_QUEUED_RUNS: int = 64
+    AGENT_QUEUE_TIMEOUT: float = 10.0
+    # Streamed runs stay resumable (Last-Event-ID) this long after the client
+    # disconnects or the run finishes; events kept per run. Runs live in the
+    # worker process that started them, so resuming needs a single worker or
+    # sticky sessions (by user) in front of several; a reconnect that lands on
+    # another worker gets 410 and the client has to send the message again
+    AGENT_STREAM_RESUME_SECONDS: float = 30.0
+    AGENT_STREAM_BUFFER_EVENTS: int = 4096
+    # Chat stream: token frames are coalesced for up to SSE_FLUSH_INTERVAL seconds
+    # or SSE_FLUSH_BYTES bytes (0 interval = one frame per token); idle
+    # streams get a keep-alive comment every SSE_HEARTBEAT_SECONDS
+    SSE_FLUSH_INTERVAL: float = 0.05
+    SSE_FLUSH_BYTES: int = 4096
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+
+    # Furman dataset source: excel (full build), snapshot (pickled build) or synthetic
+    DATA_PROVIDER: str = "excel"
+    DATA_SNAPSHOT_PATH: str = ""
+
+    # Token required by POST /api/ml/reload; reloads are disabled when empty
+    MODEL_RELOAD_TOKEN: str = ""
+    # Memory budget for non-default model versions kept resident (LRU)
+    MODEL_CACHE_MAX_MB: int = 256
 
     # document further
     SECRET_KEY: str = secrets.token_hex(32)
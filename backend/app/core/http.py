@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from typing import Awaitable, TypeVar
+
+import httpx
+
+from app.core.config import get_settings
+
+T = TypeVar("T")
+
+# One event loop on a daemon thread owns the shared client, so async routes,
+# sync routes and worker threads (e.g. sync agent tools) all reuse the same
+# keep-alive connection pool instead of opening a connection per call.
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+_client: httpx.AsyncClient | None = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="http-client-loop", daemon=True
+                ).start()
+                _loop = loop
+    return _loop
+
+
+def in_client_loop() -> bool:
+    """True when called from the loop that owns the shared client."""
+    try:
+        return asyncio.get_running_loop() is _loop
+    except RuntimeError:
+        return False
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared pooled client.
+
+    Must be called from the client loop, i.e. inside a coroutine started
+    with run_async() or run_sync().
+    """
+    global _client
+    if not in_client_loop():
+        raise RuntimeError("get_http_client() must be used via run_async/run_sync")
+    if _client is None:
+        settings = get_settings()
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=30.0,
+            ),
+            timeout=httpx.Timeout(
+                settings.HTTP_READ_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT
+            ),
+        )
+    return _client
+
+
+async def run_async(coro: Awaitable[T]) -> T:
+    """Await a coroutine on the client loop from any event loop."""
+    if in_client_loop():
+        return await coro
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    return await asyncio.wrap_future(future)
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """Run a coroutine on the client loop and block the calling thread for the result."""
+    if in_client_loop():
+        raise RuntimeError("run_sync() would deadlock on the client loop; use await")
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+async def aclose_http_client():
+    """Close the shared client; called on application shutdown."""
+    global _client
+
+    async def _close():
+        global _client
+        if _client is not None:
+            await _client.aclose()
+            _client = None
+
+    if _loop is not None:
+        await run_async(_close())
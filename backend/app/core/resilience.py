@@ -0,0 +1,144 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Classic three-state circuit breaker.
+
+    - closed:    calls go through; ``failure_threshold`` consecutive failures open it
+    - open:      calls fail fast for ``reset_timeout`` seconds
+    - half_open: one trial call is let through; success closes, failure re-opens
+
+    A trial that never reports back (cancelled, or release_trial() called)
+    frees its slot; one still outstanding after ``reset_timeout`` is given up on.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+
+        self.opened_count = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if (
+            self._state == "open"
+            and time.monotonic() - self._opened_at >= self.reset_timeout
+        ):
+            self._state = "half_open"
+            self._trial_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Return True if a call may go through now."""
+        with self._lock:
+            state = self._current_state()
+            if state == "closed":
+                return True
+            if state == "half_open" and (
+                not self._trial_in_flight
+                or time.monotonic() - self._trial_started >= self.reset_timeout
+            ):
+                self._trial_in_flight = True
+                self._trial_started = time.monotonic()
+                return True
+            self.rejected += 1
+            return False
+
+    def check(self):
+        """Like allow(), but raise CircuitOpenError when the call must not go through."""
+        if not self.allow():
+            raise CircuitOpenError(
+                f"circuit open, retry in {self.stats()['retry_in']}s"
+            )
+
+    def record_success(self):
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """End a call without an outcome, so the next call can be the trial."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if (
+                self._current_state() == "half_open"
+                or self._failures >= self.failure_threshold
+            ):
+                if self._state != "open":
+                    self.opened_count += 1
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def reset(self):
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            retry_in = (
+                max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+                if state == "open"
+                else 0.0
+            )
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "retry_in": round(retry_in, 2),
+                "opened_count": self.opened_count,
+                "rejected": self.rejected,
+            }
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for the given 0-based retry attempt."""
+    return random.uniform(0, min(cap, base * (2**attempt)))
+
+
+async def retry_async(
+    call: Callable[[], Awaitable[T]],
+    attempts: int,
+    base_delay: float,
+    max_delay: float,
+    should_retry: Callable[[Exception], bool],
+) -> T:
+    """Run ``call`` up to ``attempts`` times, sleeping with jittered backoff between tries."""
+    for attempt in range(attempts):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt == attempts - 1 or not should_retry(e):
+                raise
+            await asyncio.sleep(backoff_delay(attempt, base_delay, max_delay))
@@ -0,0 +1,221 @@
+"""
+Server-Sent Events encoding for streamed agent responses.
+
+encode_sse() turns an async iterator of event dicts into SSE bytes:
+
+- events are serialized with orjson
+- consecutive token events from the same node are merged, and frames are
+  written at most once per ``flush_interval`` seconds unless ``flush_bytes``
+  is reached first; the first token and every non-token event go out at once
+- a ``: keep-alive`` comment is sent after ``heartbeat_interval`` seconds of
+  silence so proxies don't buffer or time out the stream
+- an event's ``id`` key is sent as the SSE ``id:`` field (for Last-Event-ID)
+"""
+
+import asyncio
+import time
+from collections import deque
+from functools import partial
+from typing import Any, AsyncIterator
+
+import anyio
+import orjson
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+HEARTBEAT = b": keep-alive\n\n"
+
+
+def dumps(event: dict[str, Any]) -> bytes:
+    """Serialize one event to compact UTF-8 JSON."""
+    return orjson.dumps(event)
+
+
+def frame(event: dict[str, Any]) -> bytes:
+    """One SSE frame; an ``id`` key becomes the frame's event ID."""
+    event_id = event.get("id")
+    if event_id is None:
+        return b"data: " + dumps(event) + b"\n\n"
+    data = {k: v for k, v in event.items() if k != "id"}
+    return b"id: " + str(event_id).encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+class _Batch:
+    """Frames waiting to be written, with a trailing token event still open for merging."""
+
+    def __init__(self, merge: bool = True):
+        self.merge = merge
+        self.frames: list[bytes] = []
+        self.size = 0
+        self.token: dict | None = None
+
+    def add(self, event: dict):
+        if event.get("event") == "token" and self.merge:
+            if self.token is not None and self.token["node"] == event.get("node"):
+                self.token["content"] += event["content"]
+                if "id" in event:
+                    # A merged frame resumes after its last token
+                    self.token["id"] = event["id"]
+                self.size += len(event["content"])
+                return
+            self._close_token()
+            self.token = {**event}
+            self.size += len(event["content"])
+        else:
+            self._close_token()
+            self._append(frame(event))
+
+    def _close_token(self):
+        if self.token is not None:
+            token, self.token = self.token, None
+            self.size -= len(token["content"])
+            self._append(frame(token))
+
+    def _append(self, data: bytes):
+        self.frames.append(data)
+        self.size += len(data)
+
+    def __bool__(self) -> bool:
+        return bool(self.frames) or self.token is not None
+
+    def drain(self) -> bytes:
+        self._close_token()
+        data = b"".join(self.frames)
+        self.frames, self.size = [], 0
+        return data
+
+
+_END = object()
+
+
+async def encode_sse(
+    events: AsyncIterator[dict[str, Any]],
+    flush_interval: float = 0.05,
+    flush_bytes: int = 4096,
+    heartbeat_interval: float = 15.0,
+) -> AsyncIterator[bytes]:
+    """
+    Encode events as SSE, coalescing token events. A flush_interval of 0
+    writes every event as its own frame.
+
+    The source is consumed by one background task, so it keeps a single
+    context (context variables set inside it persist) and is cancelled when
+    the consumer stops early. The consumer wakes once per flush rather than
+    once per token.
+    """
+    pending: deque = deque()
+    wake = asyncio.Event()
+    # Token bytes queued since the consumer last woke, and whether it is idle
+    state = {"token_bytes": 0, "idle": True}
+
+    async def pump():
+        try:
+            async for event in events:
+                pending.append(event)
+                if event.get("event") == "token":
+                    state["token_bytes"] += len(event["content"])
+                    if state["idle"] or state["token_bytes"] >= flush_bytes:
+                        wake.set()
+                else:
+                    wake.set()
+        except Exception as e:
+            pending.append(e)
+        finally:
+            pending.append(_END)
+            wake.set()
+
+    producer = asyncio.create_task(pump())
+    batch = _Batch(merge=flush_interval > 0)
+    last_flush = float("-inf")
+    last_write = time.monotonic()
+    first_token = True
+    finished = False
+
+    try:
+        while not finished:
+            urgent = False
+            while pending:
+                item = pending.popleft()
+                if item is _END:
+                    finished = True
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                batch.add(item)
+                if item.get("event") == "token":
+                    urgent = urgent or first_token
+                    first_token = False
+                else:
+                    urgent = True
+            state["token_bytes"] = 0
+
+            now = time.monotonic()
+            if batch and (
+                urgent
+                or finished
+                or now - last_flush >= flush_interval
+                or batch.size >= flush_bytes
+            ):
+                last_flush = last_write = now
+                yield batch.drain()
+            if finished:
+                break
+
+            wake.clear()
+            if pending:
+                continue
+            state["idle"] = not batch
+            if batch:
+                timeout = last_flush + flush_interval - time.monotonic()
+            else:
+                timeout = last_write + heartbeat_interval - time.monotonic()
+            try:
+                await asyncio.wait_for(wake.wait(), max(0.0, timeout))
+            except TimeoutError:
+                if not batch and not pending:
+                    # Nothing to send for a while: keep the connection alive
+                    last_write = time.monotonic()
+                    yield HEARTBEAT
+    finally:
+        if not producer.done():
+            producer.cancel()
+            await asyncio.wait({producer})
+
+
+class EventStreamResponse(StreamingResponse):
+    """
+    StreamingResponse for SSE that closes its body as soon as the client
+    disconnects.
+
+    It always listens for http.disconnect, even when the server's ASGI spec
+    version would otherwise only notice on the next failed write. When the
+    response ends for any reason, it closes the body iterator, so whatever
+    feeds it stops promptly.
+    """
+
+    media_type = "text/event-stream"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        async def stream():
+            try:
+                await self.stream_response(send)
+            except OSError:
+                pass  # the client went away mid-write
+
+        try:
+            async with anyio.create_task_group() as task_group:
+
+                async def wrap(func):
+                    await func()
+                    task_group.cancel_scope.cancel()
+
+                task_group.start_soon(wrap, stream)
+                await wrap(partial(self.listen_for_disconnect, receive))
+        finally:
+            with anyio.CancelScope(shield=True):
+                aclose = getattr(self.body_iterator, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+
+        if self.background is not None:
+            await self.background()
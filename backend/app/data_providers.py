@@ -0,0 +1,188 @@
+# backend/app/data_providers.py
+"""
+Sources for the Furman dataset used at inference time.
+
+- excel:     parse every workbook in ml/data/raw (slow, the source of truth)
+- snapshot:  read a pickled copy of the Excel build, rebuilding it whenever a
+             workbook is newer than the snapshot
+- synthetic: generate a tiny deterministic dataset for tests and local dev
+
+Pick one with the DATA_PROVIDER setting. Build a snapshot ahead of a deploy with:
+
+    python -m app.data_providers snapshot
+"""
+import os
+import sys
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Add project root to Python path
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from app.core.config import get_settings
+
+DATA_FOLDER = ROOT_DIR / "ml" / "data" / "raw"
+SNAPSHOT_PATH = ROOT_DIR / "ml" / "artifacts" / "furman_snapshot.pkl"
+
+
+def _clean(df: pd.DataFrame) -> pd.DataFrame:
+    df["community_district"] = (
+        df["community_district"].astype(str).str.replace(" ", "").str.strip()
+    )
+    return df
+
+
+class DataProvider(ABC):
+    """Base class: load() returns the monthly Furman dataframe."""
+
+    name = "base"
+
+    @abstractmethod
+    def load(self, feature_columns: list[str]) -> pd.DataFrame: ...
+
+
+class ExcelDataProvider(DataProvider):
+    """Full build from the raw Furman workbooks."""
+
+    name = "excel"
+
+    def __init__(self, folder: Path = DATA_FOLDER):
+        self.folder = folder
+
+    def load(self, feature_columns: list[str]) -> pd.DataFrame:
+        from ml.pipeline.preprocess import build_furman_dataset
+
+        print("🔹 Building Furman dataset for inference...")
+        df = build_furman_dataset(folder=self.folder)
+        print(f"Dataset loaded: {df.shape}")
+        return _clean(df)
+
+
+class SnapshotDataProvider(DataProvider):
+    """Prebuilt pickle of the Excel build; rebuilt when the workbooks change."""
+
+    name = "snapshot"
+
+    def __init__(self, path: Path = SNAPSHOT_PATH, folder: Path = DATA_FOLDER):
+        self.path = path
+        self.folder = folder
+
+    def is_fresh(self) -> bool:
+        """True if the snapshot exists and no workbook was touched after it."""
+        if not self.path.exists():
+            return False
+        if not self.folder.exists():
+            return True
+        # The folder's own mtime changes when a workbook is added or removed
+        sources = [self.folder, *self.folder.glob("*.xls"), *self.folder.glob("*.xlsx")]
+        newest = max(p.stat().st_mtime for p in sources)
+        return newest <= self.path.stat().st_mtime
+
+    def load(self, feature_columns: list[str]) -> pd.DataFrame:
+        if self.is_fresh():
+            print(f"🔹 Loading Furman snapshot from {self.path.name}...")
+            df = pd.read_pickle(self.path)
+            print(f"Dataset loaded: {df.shape}")
+            return df
+
+        df = ExcelDataProvider(self.folder).load(feature_columns)
+        self.write(df)
+        return df
+
+    def write(self, df: pd.DataFrame):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a private temp file then rename, so concurrent workers never
+        # read a partial file or clobber each other's temp file
+        with tempfile.NamedTemporaryFile(
+            dir=self.path.parent, prefix=self.path.name, suffix=".tmp", delete=False
+        ) as tmp:
+            try:
+                df.to_pickle(tmp)
+            except BaseException:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+        os.replace(tmp.name, self.path)
+        print(f"Snapshot written to {self.path}")
+
+
+class SyntheticDataProvider(DataProvider):
+    """A few districts of random-but-deterministic data with the model's columns."""
+
+    name = "synthetic"
+
+    DISTRICTS = {
+        "BK01": "Greenpoint/Williamsburg",
+        "BK06": "Park Slope/Carroll Gardens",
+        "BK15": "Sheepshead Bay",
+        "BX01": "Mott Haven/Melrose",
+        "MN05": "Midtown",
+        "MN07": "Upper West Side",
+        "QN01": "Astoria",
+        "SI01": "St. George",
+    }
+
+    def __init__(self, months: int = 25, seed: int = 0):
+        self.months = months
+        self.seed = seed
+
+    def load(self, feature_columns: list[str]) -> pd.DataFrame:
+        rng = np.random.default_rng(self.seed)
+        months = pd.date_range("2020-01-01", periods=self.months, freq="MS")
+
+        frames = []
+        for cd, name in self.DISTRICTS.items():
+            base = rng.normal(50, 20, size=len(feature_columns))
+            drift = rng.normal(0, 0.5, size=len(feature_columns))
+            values = base + np.outer(np.arange(self.months), drift)
+            frame = pd.DataFrame(values, columns=feature_columns)
+            frame["community_district"] = cd
+            frame["name"] = name
+            frame["month"] = months
+            frames.append(frame)
+
+        df = pd.concat(frames, ignore_index=True)
+        if "year" in feature_columns:
+            df["year"] = df["month"].dt.year.astype(float)
+
+        df["quality_score"] = (
+            df[feature_columns[:10]].mean(axis=1) - 50
+        ) / 20 + rng.normal(0, 0.05, size=len(df))
+        qmin, qmax = df["quality_score"].min(), df["quality_score"].max()
+        df["quality_index_0_100"] = 100 * (df["quality_score"] - qmin) / (qmax - qmin)
+        df["quality_percentile_month"] = (
+            df.groupby("month")["quality_score"].rank(pct=True) * 100
+        )
+        df["quality_score_t_plus_6m"] = df.groupby("community_district")[
+            "quality_score"
+        ].shift(-6)
+        return df
+
+
+def get_data_provider(name: str | None = None) -> DataProvider:
+    """Build the provider named by DATA_PROVIDER (excel, snapshot or synthetic)."""
+    settings = get_settings()
+    name = (name or settings.DATA_PROVIDER).lower()
+
+    if name == "excel":
+        return ExcelDataProvider()
+    if name == "snapshot":
+        path = Path(settings.DATA_SNAPSHOT_PATH) if settings.DATA_SNAPSHOT_PATH else SNAPSHOT_PATH
+        return SnapshotDataProvider(path)
+    if name == "synthetic":
+        return SyntheticDataProvider()
+    raise ValueError(f"Unknown DATA_PROVIDER: {name}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["snapshot"]:
+        print("usage: python -m app.data_providers snapshot")
+        sys.exit(1)
+
+    settings = get_settings()
+    path = Path(settings.DATA_SNAPSHOT_PATH) if settings.DATA_SNAPSHOT_PATH else SNAPSHOT_PATH
+    SnapshotDataProvider(path).write(ExcelDataProvider().load([]))
@@ -1,7 +1,9 @@
 # FastAPI core imports
+import asyncio
 import json
 import os
-from fastapi import FastAPI, Depends, HTTPException, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request, Response
 from starlette import status
 from typing import Annotated
 
@@ -12,6 +14,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from app.models.models import Base
 from app.core.db import engine, get_db
+from app.core.http import aclose_http_client
+from app.core.config import get_settings
+from app.warmup import default_steps, warmup
 
 # API routers
 from app.api import auth, ml, acs, survey, agent
@@ -29,11 +34,36 @@ setup_logging()
 # Get logger
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keep the local ACS table current so ACS lookups never wait on the Census API
+    refresh_task = None
+    if get_settings().ACS_PRELOAD:
+        refresh_task = asyncio.create_task(acs.acs_refresh_loop())
+
+    # Warm up in the background so liveness checks answer while /ready is 503
+    warmup_task = None
+    if get_settings().WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(warmup.run(default_steps()))
+    else:
+        warmup.ready = True
+
+    yield
+
+    for task in (refresh_task, warmup_task):
+        if task is not None:
+            task.cancel()
+    # Close pooled outbound connections (Census API, etc.)
+    await aclose_http_client()
+
+
 # initialize FastAPI App
 app = FastAPI(
     title="CityCompass API",
     description="Backend API for CityCompass neighborhood survey and analytics",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 
@@ -99,6 +129,14 @@ async def homepage(request: Request):
     )
 
 
+@app.get("/ready")
+async def ready(response: Response):
+    """Readiness probe: 200 once startup warmup is done, 503 until then."""
+    if not warmup.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return warmup.status()
+
+
 @app.get("/user", status_code=status.HTTP_200_OK)
 async def user(user: user_dependency, db: db_dependency):
     if user is None:
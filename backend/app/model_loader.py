@@ -1,74 +1,530 @@
 # backend/app/model_loader.py
-import sys
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
 from pathlib import Path
 import pandas as pd
 import numpy as np
 import joblib
+from sklearn.neighbors import BallTree
+from sklearn.preprocessing import StandardScaler
 
-# Add project root to Python path
-ROOT_DIR = Path(__file__).resolve().parent.parent.parent
-sys.path.insert(0, str(ROOT_DIR))
+from app.core.config import get_settings
+from app.data_providers import ROOT_DIR, DataProvider, get_data_provider
+
+logger = logging.getLogger(__name__)
+
+ARTIFACTS_DIR = ROOT_DIR / "ml" / "artifacts"
+MODEL_PATH = ARTIFACTS_DIR / "nsqi_model.pkl"
+DEFAULT_VERSION = "default"
 
-from ml.pipeline.preprocess import build_furman_dataset
 
 # ----------------------------------------------------------
-# Load model bundle
+# Similar-district index
 # ----------------------------------------------------------
-MODEL_PATH = ROOT_DIR / "ml" / "artifacts" / "nsqi_model.pkl"
-print("🔹 Loading trained NSQI model...")
-model_bundle = joblib.load(MODEL_PATH)
-print("Model loaded successfully.")
+def _build_similarity_index(df: pd.DataFrame, feature_columns: list[str]):
+    """
+    Build a BallTree over the standardized latest feature vector of every district.
+
+    Neighbour rankings for every district are resolved once here, so lookups
+    at request time are plain list slicing.
+    """
+    latest = (
+        df.sort_values("month")
+        .groupby("community_district", as_index=False)
+        .tail(1)
+        .reset_index(drop=True)
+    )
+
+    # "year" is identical for every latest row and carries no signal
+    cols = [c for c in feature_columns if c != "year"]
+    X = latest[cols].apply(pd.to_numeric, errors="coerce")
+    X = X.fillna(X.median()).fillna(0)
+    Xz = StandardScaler().fit_transform(X.to_numpy(dtype=float))
+
+    tree = BallTree(Xz)
+    dist, idx = tree.query(Xz, k=len(latest))
+
+    codes = latest["community_district"].tolist()
+    names = latest["name"].tolist()
+    neighbours = {}
+    for pos, cd in enumerate(codes):
+        neighbours[cd] = [
+            {
+                "community_district": codes[i],
+                "name": names[i],
+                "distance": round(float(d), 4),
+            }
+            for d, i in zip(dist[pos], idx[pos])
+            if i != pos
+        ]
+
+    return tree, neighbours
 
-model = model_bundle["pipeline"]
-feature_columns = model_bundle["feature_columns"]
-train_pred_min = model_bundle.get("train_pred_min", 0)
-train_pred_max = model_bundle.get("train_pred_max", 1)
-grade_thresholds = model_bundle.get("grade_thresholds", {})
 
 # ----------------------------------------------------------
-# Load dataset once and clean
+# District trend analytics
 # ----------------------------------------------------------
-print("🔹 Building Furman dataset for inference...")
-DATA_FOLDER = ROOT_DIR / "ml" / "data" / "raw"
-furman_df = build_furman_dataset(folder=DATA_FOLDER)
-print(f"Dataset loaded: {furman_df.shape}")
+TREND_WINDOW_MONTHS = 36
+TREND_STABLE_SLOPE = 0.01  # quality_score units per year treated as "no change"
+
+
+def _build_trend_table(df: pd.DataFrame, feature_columns: list[str]) -> pd.DataFrame:
+    """
+    Compute year-over-year change, slope and volatility for every
+    (community_district, indicator) pair in one vectorized pass.
+
+    - latest: the value in the district's most recent month (NaN if that
+      month has no value, rather than an older month's)
+    - yoy_change: latest value minus the value in the same month a year earlier
+    - slope_per_year: least-squares slope over the last TREND_WINDOW_MONTHS
+    - volatility: std of month-over-month changes over the same window
+    """
+    cols = [c for c in feature_columns if c != "year"] + [
+        "quality_score",
+        "quality_index_0_100",
+    ]
+    cd = "community_district"
+
+    ordered = df.sort_values([cd, "month"])
+    values = ordered[cols].apply(pd.to_numeric, errors="coerce")
+    values[cd] = ordered[cd].to_numpy()
+    grouped = values.groupby(cd)
+
+    # Read both ends of the comparison from whole rows, so they are always
+    # exactly twelve months apart
+    by_month = values.set_index([cd, ordered["month"]])
+    by_month = by_month[~by_month.index.duplicated(keep="last")][cols]
+    last_month = ordered.groupby(cd)["month"].max()
+    latest = by_month.loc[list(zip(last_month.index, last_month))]
+    latest.index = last_month.index
+    year_ago = by_month.reindex(
+        list(zip(last_month.index, last_month - pd.DateOffset(months=12)))
+    )
+    year_ago.index = last_month.index
+    yoy_change = latest - year_ago
+    yoy_pct = yoy_change / year_ago.abs().replace(0, np.nan)
+
+    window = grouped.tail(TREND_WINDOW_MONTHS)
+    years = (
+        ordered.loc[window.index, "month"].dt.year
+        + (ordered.loc[window.index, "month"].dt.month - 1) / 12
+    )
+    y = window[cols]
+    mask = y.notna()
+    t = mask.mul(years, axis=0).where(mask)
+    t_centered = t - t.groupby(window[cd]).transform("mean")
+    y_centered = y - y.groupby(window[cd]).transform("mean")
+    slope = (t_centered * y_centered).groupby(window[cd]).sum(min_count=2) / (
+        (t_centered**2).groupby(window[cd]).sum(min_count=2).replace(0, np.nan)
+    )
+    volatility = y.groupby(window[cd]).diff().groupby(window[cd]).std()
+
+    table = pd.concat(
+        {
+            "latest": latest.stack(),
+            "yoy_change": yoy_change.stack(),
+            "yoy_pct_change": yoy_pct.stack(),
+            "slope_per_year": slope.stack(),
+            "volatility": volatility.stack(),
+        },
+        axis=1,
+    )
+    table.index.names = [cd, "indicator"]
+    return table.sort_index()
+
+
+# ----------------------------------------------------------
+# Model registry
+# ----------------------------------------------------------
+def _file_version(path: Path) -> str:
+    """Short content hash used as the version of a model bundle."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return f"{path.stem}-{digest.hexdigest()[:12]}"
+
+
+class LoadedModel:
+    """
+    A model bundle together with the dataset and the indexes derived from it.
+
+    Instances are never mutated after construction, so a request that grabbed
+    one keeps a consistent view even if the registry swaps in a new version.
+    """
+
+    def __init__(
+        self,
+        bundle: dict,
+        furman_df: pd.DataFrame,
+        model_path: Path,
+        name: str = DEFAULT_VERSION,
+    ):
+        self.name = name
+        self.model_path = model_path
+        self.version = bundle.get("version") or _file_version(model_path)
+        self.loaded_at = datetime.now(timezone.utc)
+
+        self.model = bundle["pipeline"]
+        self.feature_columns = bundle["feature_columns"]
+        self.train_pred_min = bundle.get("train_pred_min", 0)
+        self.train_pred_max = bundle.get("train_pred_max", 1)
+        self.grade_thresholds = bundle.get("grade_thresholds", {})
+
+        missing = [c for c in self.feature_columns if c not in furman_df.columns]
+        if missing:
+            raise ValueError(
+                f"Model {self.version} expects {len(missing)} column(s) missing "
+                f"from the dataset: {', '.join(missing[:5])}"
+            )
+        self.furman_df = furman_df
+
+        print("🔹 Building similar-district index...")
+        self.similarity_tree, self.similar_districts = _build_similarity_index(
+            furman_df, self.feature_columns
+        )
+        print(f"Similarity index built: {len(self.similar_districts)} districts")
+
+        print("🔹 Precomputing district trends...")
+        self.district_trends = _build_trend_table(furman_df, self.feature_columns)
+        print(f"Trends computed: {len(self.district_trends)} district/indicator pairs")
+
+        # The dataset is shared between versions, so only count what this one owns
+        self.size_bytes = model_path.stat().st_size + int(
+            self.district_trends.memory_usage(deep=True).sum()
+        )
+
+    def info(self) -> dict:
+        return {
+            "name": self.name,
+            "version": self.version,
+            "model_path": str(self.model_path),
+            "loaded_at": self.loaded_at.isoformat(),
+            "feature_count": len(self.feature_columns),
+            "dataset_shape": list(self.furman_df.shape),
+        }
+
+
+def version_path(name: str) -> Path:
+    """Map a version name to its bundle: "default" -> nsqi_model.pkl, "tuned" -> nsqi_model_tuned.pkl."""
+    if name == DEFAULT_VERSION:
+        return MODEL_PATH
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", name):
+        raise ValueError(f"Invalid model version: {name}")
+    return ARTIFACTS_DIR / f"nsqi_model_{name}.pkl"
+
+
+def available_versions() -> list[str]:
+    """List the model versions that have a bundle in ml/artifacts."""
+    names = [
+        p.stem[len("nsqi_model_") :] for p in ARTIFACTS_DIR.glob("nsqi_model_*.pkl")
+    ]
+    if MODEL_PATH.exists():
+        names.insert(0, DEFAULT_VERSION)
+    return names
+
+
+class ModelRegistry:
+    """
+    Holds the active LoadedModel and swaps in new versions without a restart.
+
+    Reloads run on a background thread; the swap itself is a single reference
+    assignment, so in-flight requests finish on the version they started with.
+
+    Alternative versions (e.g. nsqi_model_tuned.pkl) are loaded on first use
+    and kept in an LRU bounded by ``max_bytes``; the default version is always
+    resident and never counts against the budget.
+
+    Nothing is loaded until the first prediction (or an explicit warmup), and
+    the dataset comes from the configured DataProvider.
+    """
+
+    def __init__(
+        self,
+        model_path: Path = MODEL_PATH,
+        provider: DataProvider | None = None,
+        max_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.model_path = model_path
+        self._provider = provider
+        self.max_bytes = max_bytes
+        self._active: LoadedModel | None = None
+        self._reload_lock = threading.Lock()
+        self.reloading = False
+        self.last_error: str | None = None
+
+        self._versions: OrderedDict[str, LoadedModel] = OrderedDict()
+        self._versions_lock = threading.Lock()
+        self._version_load_locks: dict[str, threading.Lock] = {}
+        self.evictions = 0
+
+    @property
+    def provider(self) -> DataProvider:
+        if self._provider is None:
+            self._provider = get_data_provider()
+        return self._provider
+
+    @property
+    def active(self) -> LoadedModel:
+        if self._active is None:
+            with self._reload_lock:
+                if self._active is None:
+                    self._active = self._load(self.model_path, reload_dataset=True)
+        return self._active
+
+    @property
+    def active_version(self) -> str | None:
+        """Version of the active model, or None before the first load (never loads)."""
+        active = self._active
+        return active.version if active is not None else None
+
+    def get(self, name: str | None = None) -> LoadedModel:
+        """Return the requested version, loading it on first use."""
+        if not name or name == DEFAULT_VERSION:
+            return self.active
+
+        with self._versions_lock:
+            loaded = self._versions.get(name)
+            if loaded is not None:
+                self._versions.move_to_end(name)
+                return loaded
+            load_lock = self._version_load_locks.setdefault(name, threading.Lock())
+
+        # Only one thread loads a given version; others wait for it
+        with load_lock:
+            with self._versions_lock:
+                loaded = self._versions.get(name)
+                if loaded is not None:
+                    self._versions.move_to_end(name)
+                    return loaded
+
+            path = version_path(name)
+            if not path.exists():
+                raise ValueError(f"Unknown model version: {name}")
 
-furman_df["community_district"] = (
-    furman_df["community_district"].astype(str).str.replace(" ", "").str.strip()
+            active = self.active
+            print(f"🔹 Loading NSQI model version '{name}'...")
+            loaded = LoadedModel(joblib.load(path), active.furman_df, path, name=name)
+
+            with self._versions_lock:
+                self._versions[name] = loaded
+                self._evict()
+            return loaded
+
+    def _evict(self):
+        """Drop least recently used versions until the budget is met. Caller holds _versions_lock."""
+        total = sum(v.size_bytes for v in self._versions.values())
+        while total > self.max_bytes and len(self._versions) > 1:
+            name, evicted = self._versions.popitem(last=False)
+            total -= evicted.size_bytes
+            self.evictions += 1
+            logger.info(f"Evicted NSQI model version '{name}' from memory")
+
+    def _load(self, model_path: Path, reload_dataset: bool) -> LoadedModel:
+        print("🔹 Loading trained NSQI model...")
+        bundle = joblib.load(model_path)
+        print("Model loaded successfully.")
+
+        if reload_dataset or self._active is None:
+            df = self.provider.load(bundle["feature_columns"])
+        else:
+            df = self._active.furman_df
+
+        if self._active is not None:
+            added = set(bundle["feature_columns"]) - set(self._active.feature_columns)
+            removed = set(self._active.feature_columns) - set(bundle["feature_columns"])
+            if added or removed:
+                logger.warning(
+                    f"Model feature columns changed: +{len(added)} / -{len(removed)}"
+                )
+
+        return LoadedModel(bundle, df, model_path)
+
+    def reload(self, model_path: Path | None = None, reload_dataset: bool = True) -> bool:
+        """
+        Start loading a new version in the background.
+
+        Returns False if a reload is already running. The new version only
+        becomes active if it loads and passes the feature-column check.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        self.reloading = True
+
+        def _run():
+            try:
+                new = self._load(model_path or self.model_path, reload_dataset)
+                self._active = new
+                # Cached alternative versions are rebuilt lazily so they
+                # pick up new bundles and the new dataset
+                with self._versions_lock:
+                    self._versions.clear()
+                self.last_error = None
+                logger.info(f"Activated NSQI model {new.version}")
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.exception(f"Model reload failed: {e}")
+            finally:
+                self.reloading = False
+                self._reload_lock.release()
+
+        threading.Thread(target=_run, name="model-reload", daemon=True).start()
+        return True
+
+    def status(self) -> dict:
+        with self._versions_lock:
+            resident = [v.info() for v in self._versions.values()]
+            resident_bytes = sum(v.size_bytes for v in self._versions.values())
+        return {
+            **self.active.info(),
+            "data_provider": self.provider.name,
+            "reloading": self.reloading,
+            "last_error": self.last_error,
+            "available_versions": available_versions(),
+            "resident_versions": resident,
+            "resident_bytes": resident_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+registry = ModelRegistry(
+    max_bytes=get_settings().MODEL_CACHE_MAX_MB * 1024 * 1024,
 )
 
 
+def __getattr__(name: str):
+    # Keep `model_loader.model`, `model_loader.furman_df`, ... pointing at the
+    # active version for callers that read them as module attributes.
+    if name in (
+        "model",
+        "feature_columns",
+        "train_pred_min",
+        "train_pred_max",
+        "grade_thresholds",
+        "furman_df",
+        "similar_districts",
+        "district_trends",
+    ):
+        return getattr(registry.active, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # ----------------------------------------------------------
 # Predict function
 # ----------------------------------------------------------
-def predict_nsqi_for_district(community_district: str):
+def _grade(m: LoadedModel, pred: float) -> str:
+    for g, thr in m.grade_thresholds.items():
+        if pred >= thr:
+            return g
+    return "F"
+
+
+def predict_nsqi_for_districts(
+    community_districts: list[str], version: str | None = None
+) -> dict[str, dict]:
+    """
+    Predict NSQI for the latest record of many community districts with one
+    model call. Districts with no records are left out of the result.
+    """
+    m = registry.get(version)
+    wanted = {cd.replace(" ", "").strip().upper() for cd in community_districts}
+
+    subset = m.furman_df[m.furman_df["community_district"].isin(wanted)]
+    if subset.empty:
+        return {}
+
+    latest = subset.sort_values("month").groupby("community_district").tail(1)
+
+    # Ensure all features are numeric
+    X = latest[m.feature_columns].apply(pd.to_numeric, errors="coerce").fillna(0)
+
+    preds = m.model.predict(X)
+    scaled = (preds - m.train_pred_min) / (m.train_pred_max - m.train_pred_min)
+    percentiles = np.clip(scaled * 100, 0, 100)
+
+    return {
+        cd: {
+            "community_district": cd,
+            "predicted_score": float(pred),
+            "percentile": round(float(percentile), 2),
+            "grade": _grade(m, pred),
+            "model_version": m.name,
+        }
+        for cd, pred, percentile in zip(
+            latest["community_district"], preds, percentiles
+        )
+    }
+
+
+def predict_nsqi_for_district(community_district: str, version: str | None = None):
     """Predict NSQI for the latest record of a given community_district."""
     community_district = community_district.replace(" ", "").strip().upper()
 
-    subset = furman_df[furman_df["community_district"] == community_district]
-    if subset.empty:
+    result = predict_nsqi_for_districts([community_district], version).get(
+        community_district
+    )
+    if result is None:
         raise ValueError(f"No records found for {community_district}")
+    return result
 
-    latest = subset.sort_values("month", ascending=False).head(1)
 
-    # Ensure all features are numeric
-    X = latest[feature_columns].apply(pd.to_numeric, errors="coerce").fillna(0)
+def find_similar_districts(
+    community_district: str, k: int = 5, version: str | None = None
+):
+    """Return the k districts whose latest feature vectors are closest to the given one."""
+    community_district = community_district.replace(" ", "").strip().upper()
 
-    pred = model.predict(X)[0]
-    scaled = (pred - train_pred_min) / (train_pred_max - train_pred_min)
-    percentile = np.clip(scaled * 100, 0, 100)
+    neighbours = registry.get(version).similar_districts.get(community_district)
+    if neighbours is None:
+        raise ValueError(f"No records found for {community_district}")
 
-    # Convert to grade
-    grade = None
-    for g, thr in grade_thresholds.items():
-        if pred >= thr:
-            grade = g
-            break
-    grade = grade or "F"
+    return {
+        "community_district": community_district,
+        "similar": neighbours[: max(k, 1)],
+    }
+
+
+def _trend_record(indicator: str, row) -> dict:
+    """Convert one trend table row to a JSON-friendly dict."""
+    out = {"indicator": indicator}
+    for col, val in row.items():
+        out[col] = None if pd.isna(val) else round(float(val), 6)
+    return out
+
+
+def get_district_trends(
+    community_district: str, indicators=None, version: str | None = None
+):
+    """Return precomputed trend analytics for a community district."""
+    district_trends = registry.get(version).district_trends
+    community_district = community_district.replace(" ", "").strip().upper()
+
+    try:
+        rows = district_trends.loc[community_district]
+    except KeyError:
+        raise ValueError(f"No records found for {community_district}")
+
+    if indicators:
+        missing = [i for i in indicators if i not in rows.index]
+        if missing:
+            raise ValueError(f"Unknown indicator(s): {', '.join(missing)}")
+        rows = rows.loc[indicators]
+
+    quality = district_trends.loc[(community_district, "quality_score")]
+    slope = quality["slope_per_year"]
+    if pd.isna(slope) or abs(slope) < TREND_STABLE_SLOPE:
+        direction = "stable"
+    else:
+        direction = "improving" if slope > 0 else "declining"
 
     return {
         "community_district": community_district,
-        "predicted_score": float(pred),
-        "percentile": round(float(percentile), 2),
-        "grade": grade,
+        "direction": direction,
+        "quality": _trend_record("quality_score", quality),
+        "indicators": [_trend_record(ind, row) for ind, row in rows.iterrows()],
     }
@@ -1,5 +1,15 @@
 # Fastapi Imports
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, Text, DateTime
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Integer,
+    String,
+    ForeignKey,
+    Text,
+    DateTime,
+    Float,
+    LargeBinary,
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 
@@ -70,3 +80,49 @@ class SurveyResponse(Base):
     biggest_strength = Column(Text, nullable=False)
     area_for_improvement = Column(Text, nullable=False)
     additional_comments = Column(Text, nullable=True)
+
+
+class AcsZctaData(Base):
+    """Local copy of ACS 5-year estimates per NYC ZCTA, refreshed in bulk"""
+
+    __tablename__ = "acs_zcta_data"
+
+    zcta = Column(String(5), primary_key=True)
+    name = Column(String, nullable=True)
+    total_population = Column(Float, nullable=True)
+    median_household_income = Column(Float, nullable=True)
+    median_age = Column(Float, nullable=True)
+    poverty_count = Column(Float, nullable=True)
+    poverty_total = Column(Float, nullable=True)
+    poverty_rate = Column(Float, nullable=True)
+    fetched_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class AgentCheckpoint(Base):
+    """One LangGraph checkpoint of an agent conversation (user_id:thread_id)"""
+
+    __tablename__ = "agent_checkpoints"
+
+    thread_id = Column(String(255), primary_key=True)
+    checkpoint_ns = Column(String(255), primary_key=True)
+    checkpoint_id = Column(String(64), primary_key=True)
+    parent_checkpoint_id = Column(String(64), nullable=True)
+    # (type, bytes) pairs from the checkpointer's serializer
+    checkpoint_type = Column(String(32), nullable=False)
+    checkpoint = Column(LargeBinary, nullable=False)
+    metadata_type = Column(String(32), nullable=False)
+    checkpoint_metadata = Column("metadata", LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class AgentCheckpointBlob(Base):
+    """One channel value of an agent conversation, shared by the checkpoints using it"""
+
+    __tablename__ = "agent_checkpoint_blobs"
+
+    thread_id = Column(String(255), primary_key=True)
+    checkpoint_ns = Column(String(255), primary_key=True)
+    channel = Column(String(255), primary_key=True)
+    version = Column(String(64), primary_key=True)
+    type = Column(String(32), nullable=False)
+    data = Column(LargeBinary, nullable=False)
@@ -82,6 +82,9 @@ class DoneEvent(BaseModel):
     final_message: Optional[str] = Field(
         default=None, description="The complete final response text"
     )
+    tokens_saved: int = Field(
+        default=0, description="Prompt tokens removed by history compaction this turn"
+    )
 
 
 class ErrorEvent(BaseModel):
@@ -104,3 +107,6 @@ class ChatResponse(BaseModel):
     tool_calls: list[ToolCallEvent] = Field(
         default_factory=list, description="Tools that were called during this response"
     )
+    tokens_saved: int = Field(
+        default=0, description="Prompt tokens removed by history compaction this turn"
+    )
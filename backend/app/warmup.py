@@ -0,0 +1,157 @@
+# backend/app/warmup.py
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Callable
+
+from app import model_loader
+from app.agent.agent import get_agent, get_checkpointer, get_response_cache
+from app.agent.tools import BOROUGH_CODES, SEARCH_INDEX, search_neighborhoods
+from app.api import acs
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """
+    Startup warmup: runs each component's load once, in order, and records how
+    long it took.
+
+    The worker is ready once every step has run and no required step failed;
+    optional steps (caches, the agent) only log their errors, since the
+    request that needs them would load them anyway. Failed required steps are
+    retried with exponential backoff (forever unless ``max_attempts`` is set),
+    so a transient failure at startup doesn't leave the worker unready.
+    """
+
+    def __init__(
+        self,
+        retry_delay: float = 5.0,
+        max_retry_delay: float = 300.0,
+        max_attempts: int | None = None,
+    ):
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+        self.ready = False
+        self.running = False
+        self.seconds: float | None = None
+        self.components: dict[str, dict[str, Any]] = {}
+
+    async def _run_step(
+        self, name: str, func: Callable[[], Any], required: bool
+    ) -> bool:
+        step_started = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(func):
+                await func()
+            else:
+                await asyncio.to_thread(func)
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            logger.warning(f"Warmup of {name} failed: {error}")
+        attempts = self.components.get(name, {}).get("attempts", 0) + 1
+        self.components[name] = {
+            "seconds": round(time.perf_counter() - step_started, 3),
+            "required": required,
+            "error": error,
+            "attempts": attempts,
+        }
+        return error is None
+
+    async def run(self, steps: list[tuple[str, Callable[[], Any], bool]]):
+        """Run (name, func, required) steps; sync funcs run in a worker thread."""
+        self.running = True
+        started = time.perf_counter()
+        try:
+            failed = []
+            for name, func, required in steps:
+                if not await self._run_step(name, func, required) and required:
+                    failed.append((name, func, required))
+
+            attempt, delay = 1, self.retry_delay
+            while failed and (self.max_attempts is None or attempt < self.max_attempts):
+                logger.warning(
+                    f"Retrying required warmup step(s) {[f[0] for f in failed]} "
+                    f"in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                failed = [step for step in failed if not await self._run_step(*step)]
+                attempt += 1
+                delay = min(delay * 2, self.max_retry_delay)
+        finally:
+            self.running = False
+            self.seconds = round(time.perf_counter() - started, 3)
+        self.ready = not failed
+        logger.info(f"Warmup finished in {self.seconds}s: {self.components}")
+
+    def status(self) -> dict:
+        if self.ready:
+            state = "ready"
+        elif self.running or self.seconds is None:
+            state = "warming_up"
+        else:
+            state = "failed"
+        return {
+            "status": state,
+            "seconds": self.seconds,
+            "components": self.components,
+        }
+
+
+warmup = Warmup(
+    retry_delay=get_settings().WARMUP_RETRY_DELAY,
+    max_retry_delay=get_settings().WARMUP_RETRY_MAX_DELAY,
+)
+
+
+def _warm_model():
+    # Load the model and dataset, then run one prediction end to end
+    active = model_loader.registry.active
+    district = active.furman_df["community_district"].iloc[0]
+    model_loader.predict_nsqi_for_district(district)
+
+
+def _warm_search_index():
+    SEARCH_INDEX.table()
+
+
+def _warm_agent():
+    get_checkpointer()
+    get_agent()
+
+
+def _warm_response_cache():
+    get_response_cache()
+
+
+# Tool calls the agent makes most often with the same arguments; answering them
+# once here means the first users don't pay for them
+_COMMON_TOOL_CALLS = [
+    (search_neighborhoods, {}),
+    *((search_neighborhoods, {"borough": b}) for b in BOROUGH_CODES.values()),
+]
+
+
+async def _warm_tool_cache():
+    for tool, args in _COMMON_TOOL_CALLS:
+        await tool.ainvoke(args)
+
+
+def default_steps() -> list[tuple[str, Callable[[], Any], bool]]:
+    """The app's warmup steps; only the model is required for readiness."""
+    steps = [("model", _warm_model, True)]
+    if get_settings().ACS_PRELOAD:
+        steps.append(("acs", acs.load_local_acs, False))
+    steps += [
+        ("search_index", _warm_search_index, False),
+        ("agent", _warm_agent, False),
+    ]
+    if get_settings().AGENT_TOOL_CACHE:
+        steps.append(("tool_cache", _warm_tool_cache, False))
+    if get_settings().AGENT_RESPONSE_CACHE:
+        steps.append(("response_cache", _warm_response_cache, False))
+    return steps
@@ -0,0 +1,206 @@
+"""
+Load test for the agent SSE stream (_generate_stream_events).
+
+Runs N concurrent sessions against the scripted fake model (AGENT_MODEL=fake)
+so no API key is needed, and reports per concurrency level:
+
+- time to first token (p50 / p95)
+- tokens per second per stream
+- SSE events per second across all streams
+- Python heap allocated per concurrent stream (tracemalloc peak)
+
+Usage (from backend/):
+
+    python -m scripts.agent_load_test --concurrency 10 100 1000
+    python -m scripts.agent_load_test --token-delay 0 --no-memory
+
+Conversation memory is kept in-process only unless --persist is given, so
+the numbers reflect the streaming path rather than database writes.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="concurrent sessions per level (default: 10 100 1000)",
+    )
+    parser.add_argument(
+        "--token-delay",
+        type=float,
+        default=0.02,
+        help="seconds between streamed tokens (default: 0.02)",
+    )
+    parser.add_argument(
+        "--response-tokens",
+        type=int,
+        default=60,
+        help="words in each scripted answer (default: 60)",
+    )
+    parser.add_argument(
+        "--message",
+        default="Is 11211 a good place to live?",
+        help="question sent by every session; a ZIP code triggers one tool call",
+    )
+    parser.add_argument(
+        "--persist",
+        action="store_true",
+        help="write conversation checkpoints to the database",
+    )
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="skip tracemalloc (it slows streams down noticeably)",
+    )
+    return parser.parse_args()
+
+
+def configure(args: argparse.Namespace):
+    # Settings are read once, so this must happen before app imports
+    os.environ["AGENT_MODEL"] = "fake"
+    os.environ["AGENT_FAKE_TOKEN_DELAY"] = str(args.token_delay)
+    os.environ["AGENT_FAKE_RESPONSE_TOKENS"] = str(args.response_tokens)
+    os.environ["AGENT_CHECKPOINT_PERSIST"] = str(args.persist)
+    os.environ["AGENT_MAX_THREADS"] = str(max(args.concurrency) * 2)
+    os.environ["AGENT_FAST_PATH"] = "False"
+    os.environ["AGENT_RESPONSE_CACHE"] = "False"
+
+
+class SessionResult:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token: float | None = None
+        self.finished: float | None = None
+        self.events = 0
+        self.tokens = 0
+        self.error: str | None = None
+
+    @property
+    def ttft(self) -> float | None:
+        return self.first_token - self.started if self.first_token else None
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        if not self.first_token or self.tokens < 2:
+            return None
+        return (self.tokens - 1) / (self.finished - self.first_token)
+
+
+async def run_session(stream_events, message: str, session: int) -> SessionResult:
+    result = SessionResult()
+    async for chunk in stream_events(message, f"load-{session}", "load-test"):
+        # One write can carry several frames once tokens are coalesced
+        for frame in chunk.split(b"\n\n"):
+            # Frames may start with an id: line
+            _, found, data = frame.partition(b"data: ")
+            if not found:
+                continue
+            result.events += 1
+            event = json.loads(data)
+            if event["event"] == "token":
+                # The fake model streams one word per token
+                result.tokens += len(event["content"].split())
+                if result.first_token is None:
+                    result.first_token = time.perf_counter()
+            elif event["event"] == "error":
+                result.error = event["error"]
+    result.finished = time.perf_counter()
+    return result
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+async def run_level(stream_events, args, concurrency: int, offset: int) -> dict:
+    gc.collect()
+    if not args.no_memory:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            run_session(stream_events, args.message, offset + i)
+            for i in range(concurrency)
+        )
+    )
+    wall = time.perf_counter() - started
+
+    ok = [r for r in results if r.error is None]
+    ttfts = [r.ttft for r in ok if r.ttft is not None]
+    rates = [r.tokens_per_second for r in ok if r.tokens_per_second is not None]
+    row = {
+        "sessions": concurrency,
+        "errors": len(results) - len(ok),
+        "ttft_p50_ms": percentile(ttfts, 50) * 1000,
+        "ttft_p95_ms": percentile(ttfts, 95) * 1000,
+        "tokens_per_s": statistics.fmean(rates) if rates else float("nan"),
+        "events_per_s": sum(r.events for r in results) / wall,
+        "kib_per_stream": float("nan"),
+        "wall_s": wall,
+    }
+    if not args.no_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        row["kib_per_stream"] = (peak - baseline) / 1024 / concurrency
+    errors = {r.error for r in results if r.error}
+    if errors:
+        print(f"  errors at {concurrency} sessions: {sorted(errors)[:3]}")
+    return row
+
+
+def print_table(rows: list[dict]):
+    columns = [
+        ("sessions", "{:>8}"),
+        ("errors", "{:>6}"),
+        ("ttft_p50_ms", "{:>11.1f}"),
+        ("ttft_p95_ms", "{:>11.1f}"),
+        ("tokens_per_s", "{:>12.1f}"),
+        ("events_per_s", "{:>12.1f}"),
+        ("kib_per_stream", "{:>14.1f}"),
+        ("wall_s", "{:>7.2f}"),
+    ]
+    print(" ".join(f"{name:>{len(fmt.format(0))}}" for name, fmt in columns))
+    for row in rows:
+        print(" ".join(fmt.format(row[name]) for name, fmt in columns))
+
+
+async def main(args: argparse.Namespace):
+    from app.api.agent import _generate_stream_events
+    from app.core.db import engine
+    from app.models.models import Base
+
+    Base.metadata.create_all(bind=engine)
+
+    # Warm up: build the agent, load the model and fill the tool cache
+    await run_session(_generate_stream_events, args.message, -1)
+
+    if not args.no_memory:
+        tracemalloc.start()
+    rows = []
+    offset = 0
+    for concurrency in args.concurrency:
+        rows.append(await run_level(_generate_stream_events, args, concurrency, offset))
+        offset += concurrency
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    configure(arguments)
+    asyncio.run(main(arguments))
@@ -0,0 +1,163 @@
+"""
+Benchmark for the chat stream's SSE encoding.
+
+Streams the same synthetic turn (tool call, tool result, N tokens, done)
+through each encoder in turn, across many concurrent streams:
+
+- before: json.dumps and one write per event, as the stream used to do
+- after:  app.core.sse.encode_sse (orjson, coalesced tokens)
+
+Each chunk is written to a local socket, so the per-write syscall cost is
+included. Reports writes and frames per stream, source events delivered per
+second, and CPU milliseconds per stream.
+
+Usage (from backend/):
+
+    python -m scripts.sse_benchmark --streams 500 --tokens 300
+    python -m scripts.sse_benchmark --token-delay 0.005 --flush-interval 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import time
+
+from app.core.sse import encode_sse
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--streams", type=int, default=500, help="concurrent streams (default: 500)"
+    )
+    parser.add_argument(
+        "--tokens", type=int, default=300, help="tokens per stream (default: 300)"
+    )
+    parser.add_argument(
+        "--token-delay",
+        type=float,
+        default=0.0,
+        help="seconds between tokens; 0 measures raw encoding cost (default: 0)",
+    )
+    parser.add_argument(
+        "--flush-interval",
+        type=float,
+        default=0.05,
+        help="encode_sse flush interval in seconds (default: 0.05)",
+    )
+    parser.add_argument(
+        "--flush-bytes",
+        type=int,
+        default=4096,
+        help="encode_sse flush threshold in bytes (default: 4096)",
+    )
+    return parser.parse_args()
+
+
+async def synthetic_turn(tokens: int, token_delay: float):
+    yield {
+        "event": "tool_call",
+        "tool_name": "get_nsqi_prediction",
+        "tool_args": {"zip_code": "11211"},
+        "tool_call_id": "call_1",
+    }
+    yield {
+        "event": "tool_result",
+        "tool_name": "get_nsqi_prediction",
+        "tool_call_id": "call_1",
+        "content": "NSQI for ZIP 11211 (Brooklyn, BK01)\n" + "Grade: B\n" * 10,
+    }
+    for i in range(tokens):
+        if token_delay:
+            await asyncio.sleep(token_delay)
+        elif i % 32 == 0:
+            # Let other streams run, as a real model's network reads would
+            await asyncio.sleep(0)
+        yield {"event": "token", "content": f" word{i}", "node": "model"}
+    yield {"event": "done", "thread_id": "t", "final_message": "", "tokens_saved": 0}
+
+
+async def before(tokens: int, token_delay: float):
+    async for event in synthetic_turn(tokens, token_delay):
+        yield f"data: {json.dumps(event)}\n\n"
+
+
+def after(args: argparse.Namespace):
+    return encode_sse(
+        synthetic_turn(args.tokens, args.token_delay),
+        flush_interval=args.flush_interval,
+        flush_bytes=args.flush_bytes,
+    )
+
+
+async def consume(stream) -> tuple[int, int]:
+    """
+    Write one stream to a local socket, one send per chunk as the ASGI server
+    would; returns (writes, frames).
+    """
+    ours, theirs = socket.socketpair()
+    _, writer = await asyncio.open_connection(sock=ours)
+    reader, peer = await asyncio.open_connection(sock=theirs)
+    received = asyncio.create_task(reader.read())
+
+    writes = frames = 0
+    async for chunk in stream:
+        writes += 1
+        data = chunk if isinstance(chunk, bytes) else chunk.encode()
+        frames += data.count(b"data: ")
+        writer.write(data)
+        await writer.drain()
+    writer.close()
+    await received
+    peer.close()
+    return writes, frames
+
+
+async def measure(name: str, make_stream, streams: int, tokens: int) -> dict:
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    results = await asyncio.gather(*(consume(make_stream()) for _ in range(streams)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    writes = sum(w for w, _ in results)
+    frames = sum(f for _, f in results)
+    # Every stream delivers the same source events, however they are framed
+    events = streams * (tokens + 3)
+    return {
+        "encoder": name,
+        "writes_per_stream": writes / streams,
+        "frames_per_stream": frames / streams,
+        "events_per_s": events / wall,
+        "cpu_ms_per_stream": cpu * 1000 / streams,
+        "wall_s": wall,
+    }
+
+
+async def main(args: argparse.Namespace):
+    rows = [
+        await measure(
+            "before",
+            lambda: before(args.tokens, args.token_delay),
+            args.streams,
+            args.tokens,
+        ),
+        await measure("after", lambda: after(args), args.streams, args.tokens),
+    ]
+    print(
+        f"{args.streams} streams x {args.tokens} tokens, "
+        f"token delay {args.token_delay}s, flush interval {args.flush_interval}s"
+    )
+    print(
+        f"{'encoder':>8} {'writes/stream':>13} {'frames/stream':>13} "
+        f"{'events/s':>10} {'cpu ms/stream':>13} {'wall_s':>7}"
+    )
+    for row in rows:
+        print(
+            f"{row['encoder']:>8} {row['writes_per_stream']:>13.1f} "
+            f"{row['frames_per_stream']:>13.1f} {row['events_per_s']:>10.0f} "
+            f"{row['cpu_ms_per_stream']:>13.2f} {row['wall_s']:>7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -7,6 +7,10 @@ from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
+
+# Use the tiny synthetic dataset instead of parsing every Furman workbook
+os.environ.setdefault("DATA_PROVIDER", "synthetic")
+
 from app.core.config import get_settings
 
 # Add project root to path
@@ -0,0 +1,574 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.api import acs
+from app.core.cache import Aged, TTLCache
+from app.core.db import SessionLocal
+from app.core.resilience import CircuitBreaker, CircuitOpenError
+from app.models.models import AcsZctaData
+
+
+def census_payload(zctas):
+    """Build a Census API style response body for the given ZCTAs"""
+    header = [*acs.ACS_VARS.keys(), "zip code tabulation area"]
+    rows = [["1000", "85000", "35.5", "100", "1000", z] for z in zctas]
+    return [header, *rows]
+
+
+class TestBulkPreload:
+
+    def test_bulk_load_serves_locally(self, client, monkeypatch):
+        """Test that bulk-loaded ZCTAs are served without another Census call"""
+        calls = []
+
+        async def fake_get_acs(params):
+            calls.append(params)
+            return httpx.Response(200, json=census_payload(acs.NYC_ZCTAS))
+
+        monkeypatch.setattr(acs, "_get_acs", fake_get_acs)
+
+        version = acs.ACS_DATA_VERSION
+        count = asyncio.run(acs.bulk_load_acs())
+        assert count == len(acs.NYC_ZCTAS)
+        assert len(calls) == 1
+        assert acs.ACS_DATA_VERSION == version + 1
+
+        response = client.get("/api/acs/neighborhood", params={"zip": "11211"})
+        assert response.status_code == 200
+        assert response.json()["poverty_rate"] == 0.1
+        assert len(calls) == 1
+
+    def test_local_table_reloaded(self, monkeypatch):
+        """Test that a fresh worker can load the stored table without the network"""
+
+        async def fake_get_acs(params):
+            return httpx.Response(200, json=census_payload(["10001"]))
+
+        monkeypatch.setattr(acs, "_get_acs", fake_get_acs)
+        asyncio.run(acs.bulk_load_acs())
+
+        monkeypatch.setattr(acs, "_LOCAL", {})
+        refreshed_at = asyncio.run(acs.load_local_acs())
+
+        assert refreshed_at is not None
+        assert acs._fetch_acs_zcta("10001")["median_household_income"] == 85000
+
+    def test_write_through_rows_kept_out_of_bulk_copy(self, monkeypatch):
+        """Test that a fresh non-NYC row neither refreshes nor joins the NYC copy"""
+        header, *values = census_payload([*acs.NYC_ZCTAS, "60601"])
+        rows = {v[-1]: acs._parse_acs_row(header, v) for v in values}
+        old = datetime.now(timezone.utc) - timedelta(days=30)
+        acs._write_local_table({z: rows[z] for z in acs.NYC_ZCTAS}, old)
+        acs._persist(rows["60601"])
+
+        monkeypatch.setattr(acs, "_LOCAL", {})
+        version = acs.ACS_DATA_VERSION
+        refreshed_at = asyncio.run(acs.load_local_acs())
+
+        assert refreshed_at < datetime.now(timezone.utc) - timedelta(days=29)
+        assert "60601" not in acs._LOCAL
+        assert "10001" in acs._LOCAL
+        assert acs.ACS_DATA_VERSION == version + 1
+
+
+class TestAcsCache:
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted at capacity"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.stats()["evictions"] == 1
+
+    def test_single_flight(self):
+        """Test that concurrent misses for one key trigger a single load"""
+        cache = TTLCache(maxsize=10, ttl=60)
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"zcta": "11211"}
+
+        async def run():
+            return await asyncio.gather(
+                *[cache.get_or_load("11211", loader) for _ in range(20)]
+            )
+
+        results = asyncio.run(run())
+        assert len(calls) == 1
+        assert all(r == {"zcta": "11211"} for r in results)
+        assert cache.stats()["coalesced"] == 19
+
+    def test_cancelled_leader_does_not_fail_waiters(self):
+        """Test that cancelling the caller that started a load leaves it running for the others"""
+        cache = TTLCache(maxsize=10, ttl=60)
+
+        async def loader():
+            await asyncio.sleep(0.05)
+            return {"zcta": "11211"}
+
+        async def run():
+            leader = asyncio.ensure_future(cache.get_or_load("11211", loader))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(cache.get_or_load("11211", loader))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await waiter
+
+        assert asyncio.run(run()) == {"zcta": "11211"}
+        assert cache.get("11211") == {"zcta": "11211"}
+        assert cache.stats()["loads"] == 1
+
+    def test_abandoned_load_cancelled(self):
+        """Test that a load is cancelled only once every caller waiting on it is"""
+        cache = TTLCache(maxsize=10, ttl=60, cancel_abandoned=True)
+        started, cancelled = [], []
+
+        async def loader():
+            started.append(1)
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+            return "value"
+
+        async def run():
+            first = asyncio.ensure_future(cache.get_or_load("k", loader))
+            second = asyncio.ensure_future(cache.get_or_load("k", loader))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            await asyncio.sleep(0.01)
+            assert not cancelled
+            second.cancel()
+            await asyncio.sleep(0.01)
+            assert cancelled
+            # The next caller starts a new load instead of joining the dead one
+            third = asyncio.ensure_future(cache.get_or_load("k", loader))
+            await asyncio.sleep(0.01)
+            third.cancel()
+            await asyncio.gather(first, second, third, return_exceptions=True)
+
+        asyncio.run(run())
+        assert len(started) == 2
+        assert cache.stats()["abandoned"] == 2
+        assert cache.get("k") is None
+
+    def test_negative_caching(self, monkeypatch):
+        """Test that a not-found ZCTA is remembered instead of re-fetched"""
+        calls = []
+
+        async def fake_get_acs(params):
+            calls.append(params)
+            return httpx.Response(204)
+
+        monkeypatch.setattr(acs, "_get_acs", fake_get_acs)
+
+        for _ in range(3):
+            try:
+                acs._fetch_acs_zcta("00000")
+                assert False
+            except HTTPException as e:
+                assert e.status_code == 404
+
+        assert len(calls) == 1
+        assert acs._CACHE.stats()["negative_hits"] >= 2
+
+
+class TestStaleWhileRevalidate:
+
+    def test_stale_served_then_refreshed(self, monkeypatch):
+        """Test that an expired entry is returned at once and refreshed in the background"""
+        clock = [1000.0]
+        monkeypatch.setattr("app.core.cache.time.monotonic", lambda: clock[0])
+        cache = TTLCache(maxsize=10, ttl=60, max_stale=600)
+        versions = iter([1, 2])
+
+        async def loader():
+            return next(versions)
+
+        async def run():
+            first = await cache.get_or_load("k", loader)
+            clock[0] += 120
+            stale = await cache.get_or_load("k", loader)
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            fresh = await cache.get_or_load("k", loader)
+            return first, stale, fresh
+
+        assert asyncio.run(run()) == (1, 1, 2)
+        assert cache.stats()["stale_hits"] == 1
+        assert cache.stats()["refreshes"] == 1
+
+    def test_past_max_stale_blocks(self, monkeypatch):
+        """Test that an entry older than max_stale forces a synchronous load"""
+        clock = [1000.0]
+        monkeypatch.setattr("app.core.cache.time.monotonic", lambda: clock[0])
+        cache = TTLCache(maxsize=10, ttl=60, max_stale=600)
+        versions = iter([1, 2])
+
+        async def loader():
+            return next(versions)
+
+        async def run():
+            await cache.get_or_load("k", loader)
+            clock[0] += 601
+            return await cache.get_or_load("k", loader)
+
+        assert asyncio.run(run()) == 2
+        assert cache.stats()["stale_hits"] == 0
+
+    def test_max_stale_counts_from_data_age(self, monkeypatch):
+        """Test that data cached with an age is dropped once that age reaches max_stale"""
+        clock = [1000.0]
+        monkeypatch.setattr("app.core.cache.time.monotonic", lambda: clock[0])
+        cache = TTLCache(maxsize=10, ttl=60, max_stale=600)
+        versions = iter([Aged("stored", 590), "fresh"])
+
+        async def loader():
+            return next(versions)
+
+        async def run():
+            first = await cache.get_or_load("k", loader)
+            clock[0] += 11
+            return first, await cache.get_or_load("k", loader)
+
+        assert asyncio.run(run()) == ("stored", "fresh")
+        assert cache.stats()["stale_hits"] == 0
+
+
+class TestPersistentCache:
+
+    def test_shared_across_workers(self, monkeypatch):
+        """Test that a ZCTA fetched by one worker is reused after an L1 wipe"""
+        calls = []
+
+        async def fake_get_acs(params):
+            calls.append(params)
+            return httpx.Response(200, json=census_payload(["90210"]))
+
+        monkeypatch.setattr(acs, "_get_acs", fake_get_acs)
+
+        db = SessionLocal()
+        db.query(AcsZctaData).filter(AcsZctaData.zcta == "90210").delete()
+        db.commit()
+        db.close()
+        acs._CACHE.clear()
+
+        assert acs._fetch_acs_zcta("90210")["zcta"] == "90210"
+        assert len(calls) == 1
+
+        # Simulate another worker / a restart: empty in-process tiers
+        acs._CACHE.clear()
+        monkeypatch.setattr(acs, "_LOCAL", {})
+
+        assert acs._fetch_acs_zcta("90210")["median_household_income"] == 85000
+        assert len(calls) == 1
+
+    def test_stored_rows_never_older_than_max_stale(self, monkeypatch):
+        """Test that refreshes skip the stored row and rows past max_stale aren't served"""
+        calls = []
+
+        async def fake_get_acs(params):
+            calls.append(params)
+            return httpx.Response(200, json=census_payload(["90211"]))
+
+        monkeypatch.setattr(acs, "_get_acs", fake_get_acs)
+        monkeypatch.setattr(acs, "_LOCAL", {})
+        clock = [1000.0]
+        monkeypatch.setattr("app.core.cache.time.monotonic", lambda: clock[0])
+        header, values = census_payload(["90211"])
+        row = acs._parse_acs_row(header, values)
+        now = datetime.now(timezone.utc)
+        acs._CACHE.clear()
+
+        # Within both limits: served from the table
+        acs._write_local_table({"90211": row}, now - timedelta(days=2))
+        acs._fetch_acs_zcta("90211")
+        assert calls == []
+
+        # A stale L1 entry is refreshed from the Census API, not the same old row
+        clock[0] += acs._CACHE.ttl + 1
+        refreshes = acs._CACHE.stats()["refreshes"]
+        acs._fetch_acs_zcta("90211")
+        for _ in range(100):
+            if acs._CACHE.stats()["refreshes"] > refreshes:
+                break
+            time.sleep(0.01)
+        assert len(calls) == 1
+
+        # Older than max_stale, though inside ACS_PERSISTENT_TTL_HOURS: refetched
+        acs._CACHE.clear()
+        acs._write_local_table({"90211": row}, now - timedelta(days=10))
+        acs._fetch_acs_zcta("90211")
+        assert len(calls) == 2
+
+        # Just inside max_stale when read: its age carries into the cache
+        acs._CACHE.clear()
+        max_stale = timedelta(seconds=acs._CACHE.max_stale)
+        acs._write_local_table({"90211": row}, now - max_stale + timedelta(minutes=1))
+        acs._fetch_acs_zcta("90211")
+        assert len(calls) == 2
+        # Two minutes later it is past max_stale in the cache and in the table
+        clock[0] += 120
+        acs._write_local_table({"90211": row}, now - max_stale - timedelta(minutes=1))
+        acs._fetch_acs_zcta("90211")
+        assert len(calls) == 3
+
+    def test_old_bulk_copy_not_served(self, monkeypatch):
+        """Test that the bulk copy is bypassed once it is older than max_stale"""
+        calls = []
+
+        async def fake_get_acs(params):
+            calls.append(params)
+            return httpx.Response(200, json=census_payload(["10001"]))
+
+        monkeypatch.setattr(acs, "_get_acs", fake_get_acs)
+        monkeypatch.setattr(acs.get_settings(), "ACS_PERSISTENT_CACHE", False)
+        monkeypatch.setattr(acs, "_LOCAL", {"10001": {"zcta": "10001", "name": "old"}})
+        acs._CACHE.clear()
+        max_stale = timedelta(seconds=acs.get_settings().ACS_CACHE_MAX_STALE)
+        refreshed_at = datetime.now(timezone.utc) - max_stale + timedelta(hours=1)
+        monkeypatch.setattr(acs, "_LOCAL_REFRESHED_AT", refreshed_at)
+
+        assert acs._fetch_acs_zcta("10001")["name"] == "old"
+        assert calls == []
+
+        monkeypatch.setattr(
+            acs, "_LOCAL_REFRESHED_AT", refreshed_at - timedelta(hours=2)
+        )
+        assert acs._fetch_acs_zcta("10001")["median_household_income"] == 85000
+        found, _, _ = acs._fetch_acs_zctas(["10001"])
+        assert found["10001"]["median_household_income"] == 85000
+        assert len(calls) == 1
+
+
+class TestBatchLookup:
+
+    def test_misses_fetched_in_one_call(self, client, monkeypatch):
+        """Test that cached ZIPs are answered locally and misses share one Census call"""
+        calls = []
+
+        async def fake_get_acs(params):
+            calls.append(params)
+            zctas = params["for"].split(":")[1].split(",")
+            return httpx.Response(
+                200, json=census_payload([z for z in zctas if z != "99999"])
+            )
+
+        monkeypatch.setattr(acs, "_get_acs", fake_get_acs)
+        monkeypatch.setattr(acs.get_settings(), "ACS_PERSISTENT_CACHE", False)
+        monkeypatch.setattr(acs, "_LOCAL", {"10001": {"zcta": "10001"}})
+        monkeypatch.setattr(acs, "_LOCAL_REFRESHED_AT", datetime.now(timezone.utc))
+        acs._CACHE.clear()
+        acs._CACHE.set("zcta: 11211", {"zcta": "11211"})
+
+        response = client.get(
+            "/api/acs/neighborhoods", params={"zips": "10001,11211,10451,10452,99999"}
+        )
+
+        assert response.status_code == 200
+        body = response.json()
+        assert sorted(body["results"]) == ["10001", "10451", "10452", "11211"]
+        assert body["not_found"] == ["99999"]
+        assert len(calls) == 1
+        assert calls[0]["for"] == "zip code tabulation area:10451,10452,99999"
+
+    def test_invalid_zip_rejected(self, client):
+        """Test that malformed ZIP codes are rejected"""
+        response = client.post("/api/acs/neighborhoods", json={"zips": ["1234"]})
+        assert response.status_code == 422
+
+
+class FakeCensus(BaseHTTPRequestHandler):
+    """Census API stand-in: answers queued statuses first, then real payloads"""
+
+    statuses: list = []
+    delay = 0.0
+    hits = 0
+
+    def do_GET(self):
+        FakeCensus.hits += 1
+        time.sleep(FakeCensus.delay)
+        status = FakeCensus.statuses.pop(0) if FakeCensus.statuses else 200
+        body = b""
+        if status == 200:
+            query = parse_qs(urlparse(self.path).query)
+            zctas = query["for"][0].split(":")[1].split(",")
+            body = json.dumps(census_payload(zctas)).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_census(monkeypatch):
+    FakeCensus.statuses, FakeCensus.delay, FakeCensus.hits = [], 0.0, 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeCensus)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    settings = acs.get_settings()
+    monkeypatch.setattr(
+        settings, "ACS_BASE_URL", f"http://127.0.0.1:{server.server_port}/acs5"
+    )
+    monkeypatch.setattr(settings, "ACS_RETRY_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "ACS_RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(settings, "ACS_PERSISTENT_CACHE", False)
+    monkeypatch.setattr(acs, "_BREAKER", CircuitBreaker(2, reset_timeout=60))
+    monkeypatch.setattr(acs, "_LOCAL", {})
+    acs._CACHE.clear()
+    yield FakeCensus
+    server.shutdown()
+    server.server_close()
+    acs._CACHE.clear()
+
+
+class TestResilience:
+
+    def test_retries_transient_errors(self, fake_census):
+        """Test that 5xx answers are retried until the Census API recovers"""
+        fake_census.statuses = [503, 500]
+
+        assert acs._fetch_acs_zcta("10451")["zcta"] == "10451"
+        assert fake_census.hits == 3
+        assert acs._BREAKER.state == "closed"
+
+    def test_timeout(self, fake_census, monkeypatch):
+        """Test that a hung Census connection times out instead of blocking"""
+        monkeypatch.setattr(acs.get_settings(), "ACS_READ_TIMEOUT", 0.1)
+        monkeypatch.setattr(acs.get_settings(), "ACS_RETRY_ATTEMPTS", 1)
+        fake_census.delay = 0.5
+
+        started = time.monotonic()
+        with pytest.raises(HTTPException) as exc:
+            acs._fetch_acs_zcta("10452")
+        assert exc.value.status_code == 504
+        assert time.monotonic() - started < 0.5
+
+    def test_breaker_opens_and_serves_stale(self, client, fake_census, monkeypatch):
+        """Test that an open breaker fails fast and expired persisted rows are served"""
+        monkeypatch.setattr(acs.get_settings(), "ACS_PERSISTENT_CACHE", True)
+        monkeypatch.setattr(acs.get_settings(), "ACS_RETRY_ATTEMPTS", 1)
+        header, values = census_payload(["10453"])
+        row = acs._parse_acs_row(header, values)
+        old = datetime.now(timezone.utc) - timedelta(days=365)
+        acs._write_local_table({"10453": row}, old)
+        fake_census.statuses = [500] * 10
+
+        for _ in range(3):
+            acs._CACHE.clear()
+            assert acs._fetch_acs_zcta("10453")["median_household_income"] == 85000
+
+        # The third lookup never reached the Census API
+        assert fake_census.hits == 2
+        breaker = client.get("/api/acs/metrics").json()["breaker"]
+        assert breaker["state"] == "open"
+        assert breaker["rejected"] == 1
+
+        # Nothing stored to fall back on: fail fast with 503
+        db = SessionLocal()
+        db.query(AcsZctaData).filter(AcsZctaData.zcta == "60601").delete()
+        db.commit()
+        db.close()
+        with pytest.raises(HTTPException) as exc:
+            acs._fetch_acs_zcta("60601")
+        assert exc.value.status_code == 503
+
+    def test_batch_returns_partial_results_when_down(
+        self, client, fake_census, monkeypatch
+    ):
+        """Test that a batch during an outage keeps what resolved and lists the rest"""
+        monkeypatch.setattr(acs.get_settings(), "ACS_PERSISTENT_CACHE", True)
+        monkeypatch.setattr(acs.get_settings(), "ACS_RETRY_ATTEMPTS", 1)
+        header, values = census_payload(["10454"])
+        row = acs._parse_acs_row(header, values)
+        old = datetime.now(timezone.utc) - timedelta(days=365)
+        acs._write_local_table({"10454": row}, old)
+        db = SessionLocal()
+        db.query(AcsZctaData).filter(AcsZctaData.zcta == "60602").delete()
+        db.commit()
+        db.close()
+        acs._CACHE.set("zcta: 11211", {"zcta": "11211"})
+        fake_census.statuses = [500] * 10
+
+        response = client.get(
+            "/api/acs/neighborhoods", params={"zips": "11211,10454,60602"}
+        )
+
+        assert response.status_code == 200
+        body = response.json()
+        assert sorted(body["results"]) == ["10454", "11211"]
+        assert body["not_found"] == []
+        assert body["unavailable"] == ["60602"]
+
+        # Nothing at all resolved: the outage is the answer
+        response = client.get("/api/acs/neighborhoods", params={"zips": "60602"})
+        assert response.status_code == 503
+
+        # A database error in the fallback is reported the same way, not as a 500
+        def broken_read(zctas, max_age):
+            raise RuntimeError("database is down")
+
+        monkeypatch.setattr(acs, "_read_persisted_many", broken_read)
+        response = client.get("/api/acs/neighborhoods", params={"zips": "11211,60602"})
+        assert response.status_code == 200
+        assert response.json()["unavailable"] == ["60602"]
+
+    def test_cancelled_trial_frees_half_open_breaker(self, fake_census, monkeypatch):
+        """Test that a cancelled half-open trial call doesn't wedge the breaker"""
+        monkeypatch.setattr(acs, "_BREAKER", CircuitBreaker(1, reset_timeout=0.05))
+        monkeypatch.setattr(acs.get_settings(), "ACS_RETRY_ATTEMPTS", 1)
+        acs._BREAKER.record_failure()
+        time.sleep(0.06)
+        assert acs._BREAKER.state == "half_open"
+        fake_census.delay = 0.5
+
+        async def cancel_trial():
+            trial = asyncio.ensure_future(
+                acs.run_async(acs._get_acs({"for": "zcta:10454"}))
+            )
+            await asyncio.sleep(0.05)
+            trial.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await trial
+            # Let the cancellation reach the call on the client loop
+            await asyncio.sleep(0.05)
+
+        asyncio.run(cancel_trial())
+        assert acs._BREAKER.state == "half_open"
+
+        fake_census.delay = 0.0
+        assert acs._fetch_acs_zcta("10454")["zcta"] == "10454"
+        assert acs._BREAKER.state == "closed"
+
+    def test_stuck_trial_expires(self):
+        """Test that a trial that never reports back is given up on after the reset timeout"""
+        breaker = CircuitBreaker(1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        assert breaker.allow()
+        with pytest.raises(CircuitOpenError):
+            breaker.check()
+        time.sleep(0.06)
+        breaker.check()
@@ -0,0 +1,1044 @@
+import asyncio
+import itertools
+import json
+import time
+import uuid
+
+from langchain.messages import AIMessage, AIMessageChunk
+from langchain.tools import tool
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.outputs import ChatGenerationChunk
+
+import pytest
+
+from app.agent import tool_cache, tools
+from app.agent.checkpointer import BoundedCheckpointSaver
+from app.agent.compaction import compaction_middleware, compaction_stats
+from app.agent.response_cache import ResponseCache
+from app.agent.router import match_fast_path
+from app.agent.search_index import NeighborhoodIndex
+from app.agent.streams import StreamRegistry
+from app.agent.tools import BOROUGH_CODES, ZIP_TO_DISTRICT
+from app.api import acs
+from app.api import agent as agent_api
+from app.api.auth import get_current_user
+from app.core.concurrency import ConcurrencyLimiter, ConcurrencyLimitExceeded
+from app.core.config import get_settings
+from app.core.db import SessionLocal
+from app.core.sse import HEARTBEAT, EventStreamResponse, encode_sse
+from app.models.models import AgentCheckpoint, AgentCheckpointBlob
+
+
+@pytest.fixture(autouse=True)
+def empty_tool_cache():
+    tool_cache.TOOL_CACHE.clear()
+
+
+def fake_acs_rows(zctas):
+    """ACS rows whose income rises and poverty falls with the ZIP code"""
+    return (
+        {
+            z: {"median_household_income": float(z) * 2, "poverty_rate": 0.5 - i / 500}
+            for i, z in enumerate(sorted(zctas))
+        },
+        [],
+        [],
+    )
+
+
+class TestSearchIndex:
+
+    def test_true_top_k(self, monkeypatch):
+        """Test that search returns the highest-scoring matches in order"""
+        monkeypatch.setattr(acs, "_fetch_acs_zctas", fake_acs_rows)
+        index = NeighborhoodIndex(ZIP_TO_DISTRICT, BOROUGH_CODES)
+
+        results = index.search(limit=5)
+        best = index.table()["nsqi_score"].sort_values(ascending=False).head(5)
+
+        assert results["nsqi_score"].tolist() == best.tolist()
+
+    def test_filters(self, monkeypatch):
+        """Test that borough, score and income filters are all applied"""
+        monkeypatch.setattr(acs, "_fetch_acs_zctas", fake_acs_rows)
+        index = NeighborhoodIndex(ZIP_TO_DISTRICT, BOROUGH_CODES)
+
+        results = index.search(borough="brooklyn", min_nsqi_score=10, min_income=22000)
+
+        assert not results.empty
+        assert (results["borough"] == "Brooklyn").all()
+        assert (results["nsqi_score"] >= 10).all()
+        assert (results["income"] >= 22000).all()
+
+    def test_rebuilt_when_acs_changes(self, monkeypatch):
+        """Test that the table is reused until the ACS data version changes"""
+        calls = []
+
+        def fetch(zctas):
+            calls.append(zctas)
+            return fake_acs_rows(zctas)
+
+        monkeypatch.setattr(acs, "_fetch_acs_zctas", fetch)
+        index = NeighborhoodIndex(ZIP_TO_DISTRICT, BOROUGH_CODES)
+
+        index.search()
+        index.search(borough="Queens")
+        assert index.builds == 1
+        assert len(calls) == 1
+
+        monkeypatch.setattr(acs, "ACS_DATA_VERSION", acs.ACS_DATA_VERSION + 1)
+        index.search()
+        assert index.builds == 2
+
+
+class TestCompare:
+
+    def test_one_batched_call_each(self, monkeypatch):
+        """Test that an N-way comparison makes one prediction and one ACS call, concurrently"""
+        predict_calls, acs_calls = [], []
+
+        def predict(districts):
+            predict_calls.append(districts)
+            time.sleep(0.2)
+            return {
+                d: {"percentile": 50.0 + i, "grade": "B"}
+                for i, d in enumerate(districts)
+            }
+
+        async def fetch(zctas):
+            acs_calls.append(zctas)
+            await asyncio.sleep(0.2)
+            return fake_acs_rows(zctas)
+
+        monkeypatch.setattr(tools, "predict_nsqi_for_districts", predict)
+        monkeypatch.setattr(tools, "fetch_acs_zctas", fetch)
+        zips = ["11211", "11215", "10451", "10024", "99999"]
+
+        started = time.monotonic()
+        results = asyncio.run(tools._gather_comparison(zips))
+
+        assert time.monotonic() - started < 0.35
+        assert len(predict_calls) == 1 and len(acs_calls) == 1
+        assert results["99999"]["nsqi"] is None
+        assert results["11211"]["acs"]["median_household_income"] == 22422
+
+        output = tools._format_comparison(zips, results)
+        assert "Comparison: 11211 vs 11215 vs 10451 vs 10024 vs 99999" in output
+        assert "has the highest quality score" in output
+        assert "99999: Data unavailable" in output
+
+    def test_invalid_zips_reported_separately(self, monkeypatch):
+        """Test that malformed ZIPs are skipped and listed instead of sent to the Census API"""
+        acs_calls = []
+
+        async def fetch(zctas):
+            acs_calls.append(zctas)
+            return fake_acs_rows(zctas)
+
+        monkeypatch.setattr(tools, "fetch_acs_zctas", fetch)
+        monkeypatch.setattr(
+            tools,
+            "predict_nsqi_for_districts",
+            lambda districts: {d: {"percentile": 50.0, "grade": "C"} for d in districts},
+        )
+
+        output = asyncio.run(
+            tools.compare_many_neighborhoods.ainvoke(
+                {"zip_codes": ["11211", "1121", "10451", "abcde"]}
+            )
+        )
+
+        assert acs_calls == [["11211", "10451"]]
+        assert "Comparison: 11211 vs 10451" in output
+        assert "Invalid ZIP code(s) skipped: 1121, abcde" in output
+
+        output = asyncio.run(
+            tools.compare_many_neighborhoods.ainvoke({"zip_codes": ["11211", "1121"]})
+        )
+        assert output.startswith("Please provide between 2 and")
+        assert "skipped: 1121" in output
+
+
+class TestAsyncTools:
+
+    def test_tools_do_not_block_streaming(self, monkeypatch):
+        """Test that other sessions keep streaming while slow tool calls run"""
+
+        def slow_predict(district):
+            time.sleep(0.3)
+            return {
+                "community_district": district,
+                "percentile": 50.0,
+                "grade": "C",
+                "predicted_score": 0.0,
+            }
+
+        monkeypatch.setattr(tools, "predict_nsqi_for_district", slow_predict)
+        monkeypatch.setattr(tools, "get_stream_writer", lambda: lambda message: None)
+
+        async def other_session(stop: asyncio.Event) -> float:
+            """Emit a token every 10ms and return the longest gap between two"""
+            worst, last = 0.0, time.monotonic()
+            while not stop.is_set():
+                await asyncio.sleep(0.01)
+                now = time.monotonic()
+                worst, last = max(worst, now - last), now
+            return worst
+
+        async def run():
+            stop = asyncio.Event()
+            stream = asyncio.create_task(other_session(stop))
+            results = await asyncio.gather(
+                *(
+                    tools.get_nsqi_prediction.ainvoke({"zip_code": z})
+                    for z in ["11211", "11215", "10451", "10024"]
+                )
+            )
+            stop.set()
+            return results, await stream
+
+        started = time.monotonic()
+        results, worst_gap = asyncio.run(run())
+
+        assert all("Grade: C" in r for r in results)
+        # Four 300ms calls overlapped on the executor instead of running in turn
+        assert time.monotonic() - started < 1.0
+        assert worst_gap < 0.1
+
+
+def echo_graph(checkpointer):
+    """A one-node graph that answers every message, checkpointed like the agent"""
+    from langgraph.graph import START, MessagesState, StateGraph
+
+    def reply(state):
+        return {"messages": [AIMessage(content=f"echo {len(state['messages'])}")]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("reply", reply)
+    builder.add_edge(START, "reply")
+    return builder.compile(checkpointer=checkpointer)
+
+
+def say(graph, thread_id, text="hi"):
+    config = {"configurable": {"thread_id": thread_id}}
+    return graph.invoke({"messages": [{"role": "user", "content": text}]}, config)
+
+
+class TestCheckpointer:
+
+    def test_lru_eviction(self):
+        """Test that only max_threads conversations stay in memory"""
+        saver = BoundedCheckpointSaver(max_threads=2, persist=False)
+        graph = echo_graph(saver)
+
+        for user in ["u1", "u2", "u3"]:
+            say(graph, f"{user}:t")
+
+        assert saver.stats()["threads"] == 2
+        assert saver.evictions == 1
+        assert "u1:t" not in saver.storage
+
+    def test_old_checkpoints_pruned(self):
+        """Test that long threads keep their history but not every checkpoint"""
+        saver = BoundedCheckpointSaver(max_checkpoints=3, persist=False)
+        graph = echo_graph(saver)
+
+        for _ in range(10):
+            result = say(graph, "u1:long")
+
+        assert len(result["messages"]) == 20
+        assert len(saver.storage["u1:long"][""]) == 3
+        assert len([k for k in saver.blobs if k[2] == "messages"]) <= 3
+
+    def test_threads_isolated_and_restored(self):
+        """Test that threads are per user and survive eviction via the database"""
+        thread = f"u-{uuid.uuid4()}:t1"
+        saver = BoundedCheckpointSaver(max_threads=1)
+        graph = echo_graph(saver)
+        say(graph, thread, "first")
+        say(graph, f"other-{uuid.uuid4()}:t1", "unrelated")
+
+        assert thread not in saver.storage
+        result = say(graph, thread, "second")
+        contents = [m.content for m in result["messages"]]
+        assert contents == ["first", "echo 1", "second", "echo 3"]
+        assert saver.restores == 1
+
+        # A fresh worker sees the same conversation
+        fresh = echo_graph(BoundedCheckpointSaver())
+        config = {"configurable": {"thread_id": thread}}
+        assert len(fresh.get_state(config).values["messages"]) == 4
+
+    def test_only_new_checkpoints_written(self):
+        """Test that each put stores one serde-encoded checkpoint and pruned rows are deleted"""
+        thread = f"u-{uuid.uuid4()}:long"
+        saver = BoundedCheckpointSaver(max_checkpoints=3)
+        graph = echo_graph(saver)
+        written = []
+        write = saver._write_checkpoint
+
+        def record(thread_id, delta):
+            written.append(delta)
+            write(thread_id, delta)
+
+        saver._write_checkpoint = record
+
+        for _ in range(5):
+            say(graph, thread)
+
+        # Nothing stored by an earlier put is written again
+        blob_keys = [key for d in written for key in d["blobs"]]
+        assert len(set(blob_keys)) == len(blob_keys)
+        assert len({d["checkpoint_id"] for d in written}) == len(written)
+        db = SessionLocal()
+        rows = db.query(AgentCheckpoint).filter_by(thread_id=thread).all()
+        blobs = db.query(AgentCheckpointBlob).filter_by(thread_id=thread).all()
+        db.close()
+        assert len(rows) == 3
+        types = {r.checkpoint_type for r in rows} | {b.type for b in blobs}
+        assert "pickle" not in types
+
+        fresh = echo_graph(BoundedCheckpointSaver())
+        config = {"configurable": {"thread_id": thread}}
+        assert len(fresh.get_state(config).values["messages"]) == 10
+
+
+class ToolCallingFakeModel(GenericFakeChatModel):
+    """Scripted chat model that accepts tools like a real provider model"""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        # The base fake model drops tool calls when streaming
+        message = self._generate(messages).generations[0].message
+        for word in filter(None, message.content.split(" ")):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=f"{word} "))
+        for i, tc in enumerate(message.tool_calls):
+            chunk = {**tc, "args": json.dumps(tc["args"]), "index": i}
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(content="", tool_call_chunks=[chunk])
+            )
+
+
+def scripted_turns(turns):
+    """Each turn: one lookup tool call, then a short answer"""
+    for i in range(turns):
+        yield AIMessage(
+            content="",
+            tool_calls=[{"name": "lookup", "args": {"n": i}, "id": f"call-{i}"}],
+        )
+        yield AIMessage(content=f"answer {i}")
+
+
+@tool
+def lookup(n: int) -> str:
+    """Return a long, verbose tool result"""
+    return f"result {n} " + "detail " * 400
+
+
+class TestCompaction:
+
+    def test_old_tool_results_trimmed(self):
+        """Test that older tool outputs are cleared and the savings are reported"""
+        from langchain.agents import create_agent
+
+        agent = create_agent(
+            model=ToolCallingFakeModel(messages=scripted_turns(4)),
+            tools=[lookup],
+            checkpointer=BoundedCheckpointSaver(persist=False),
+            middleware=compaction_middleware(
+                ToolCallingFakeModel(messages=iter([])),
+                tool_result_trigger_tokens=500,
+                keep_tool_results=1,
+                summary_trigger_tokens=100_000,
+                keep_messages=10,
+            ),
+        )
+        config = {"configurable": {"thread_id": f"u:{uuid.uuid4()}"}}
+
+        saved = []
+        for i in range(4):
+            agent.invoke({"messages": [{"role": "user", "content": f"q{i}"}]}, config)
+            saved.append(compaction_stats.pop_turn(config["configurable"]["thread_id"]))
+
+        assert saved[0] == 0
+        assert saved[1] > 0
+        assert saved[3] > saved[1]
+
+    def test_summary_replaces_older_turns(self):
+        """Test that a thread over the token budget keeps only a summary and recent turns"""
+        from langchain.agents import create_agent
+
+        summarizer = ToolCallingFakeModel(
+            messages=itertools.repeat(AIMessage(content="User asked about lookups."))
+        )
+        agent = create_agent(
+            model=ToolCallingFakeModel(messages=scripted_turns(4)),
+            tools=[lookup],
+            checkpointer=BoundedCheckpointSaver(persist=False),
+            middleware=compaction_middleware(
+                summarizer,
+                tool_result_trigger_tokens=100_000,
+                keep_tool_results=1,
+                summary_trigger_tokens=1500,
+                keep_messages=4,
+            ),
+        )
+        config = {"configurable": {"thread_id": f"u:{uuid.uuid4()}"}}
+
+        for i in range(4):
+            result = agent.invoke(
+                {"messages": [{"role": "user", "content": f"q{i}"}]}, config
+            )
+
+        assert len(result["messages"]) < 16
+        assert "User asked about lookups." in result["messages"][0].content
+        assert result["messages"][-1].content == "answer 3"
+        assert compaction_stats.pop_turn(config["configurable"]["thread_id"]) > 0
+
+    def test_summary_not_streamed(self, monkeypatch):
+        """Test that the summarizer's tokens never reach the client or the final message"""
+        from langchain.agents import create_agent
+
+        summarizer = ToolCallingFakeModel(
+            messages=itertools.repeat(AIMessage(content="SUMMARY of earlier turns"))
+        )
+        graph = create_agent(
+            model=ToolCallingFakeModel(messages=scripted_turns(3)),
+            tools=[lookup],
+            checkpointer=BoundedCheckpointSaver(persist=False),
+            middleware=compaction_middleware(
+                summarizer,
+                tool_result_trigger_tokens=100_000,
+                keep_tool_results=1,
+                summary_trigger_tokens=150,
+                keep_messages=2,
+            ),
+        )
+        monkeypatch.setattr(agent_api, "get_agent", lambda: graph)
+        thread_id = str(uuid.uuid4())
+
+        for i in range(3):
+            events = stream_events(f"q{i}", thread_id)
+            tokens = [e for e in events if e["event"] == "token"]
+            assert all(e["node"] == "model" for e in tokens)
+            assert "SUMMARY" not in "".join(e["content"] for e in tokens)
+            assert events[-1]["final_message"].strip() == f"answer {i}"
+
+        config = {"configurable": {"thread_id": f"u1:{thread_id}"}}
+        messages = graph.get_state(config).values["messages"]
+        assert "SUMMARY of earlier turns" in messages[0].content
+
+
+class TestToolCache:
+
+    def test_repeated_calls_served_from_cache(self, client, monkeypatch):
+        """Test that identical tool calls across conversations run the tool once"""
+        calls = []
+
+        def predict(district):
+            calls.append(district)
+            return {
+                "community_district": district,
+                "percentile": 61.0,
+                "grade": "B",
+                "predicted_score": 0.4,
+            }
+
+        monkeypatch.setattr(tools, "predict_nsqi_for_district", predict)
+        monkeypatch.setattr(tools, "get_stream_writer", lambda: lambda message: None)
+
+        async def run():
+            first = await tools.get_nsqi_prediction.ainvoke({"zip_code": "11211"})
+            again = await asyncio.gather(
+                *(
+                    tools.get_nsqi_prediction.ainvoke({"zip_code": " 11211 "})
+                    for _ in range(5)
+                )
+            )
+            return first, again
+
+        first, again = asyncio.run(run())
+
+        assert "Grade: B" in first
+        assert all(result == first for result in again)
+        assert len(calls) == 1
+        metrics = client.get("/api/agent/metrics").json()["tool_cache"]
+        assert metrics["hits"] == 5
+
+    def test_keyed_by_data_version(self, monkeypatch):
+        """Test that a new ACS data version invalidates cached results"""
+        first = tool_cache.cache_key("get_acs_demographics", {"zip_code": "11211"})
+        monkeypatch.setattr(acs, "ACS_DATA_VERSION", acs.ACS_DATA_VERSION + 1)
+        second = tool_cache.cache_key("get_acs_demographics", {"zip_code": "11211"})
+
+        assert first != second
+
+    def test_disconnect_cancels_tool(self, monkeypatch):
+        """Test that a tool call is cancelled when the turn waiting on it goes away"""
+        cancelled = []
+
+        async def slow_fetch(zcta):
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(zcta)
+                raise
+
+        monkeypatch.setattr(tools, "fetch_acs_zcta", slow_fetch)
+        monkeypatch.setattr(tools, "get_stream_writer", lambda: lambda message: None)
+
+        async def run():
+            call = asyncio.ensure_future(
+                tools.get_acs_demographics.ainvoke({"zip_code": "10001"})
+            )
+            await asyncio.sleep(0.05)
+            call.cancel()
+            await asyncio.gather(call, return_exceptions=True)
+            await asyncio.sleep(0.01)
+            # Checked before asyncio.run() cancels whatever is left at exit
+            return list(cancelled)
+
+        assert asyncio.run(run()) == ["10001"]
+
+    def test_transient_errors_not_cached(self, monkeypatch):
+        """Test that an error answer is retried on the next call"""
+        calls = []
+
+        async def failing_fetch(zcta):
+            calls.append(zcta)
+            raise RuntimeError("Census unavailable")
+
+        monkeypatch.setattr(tools, "fetch_acs_zcta", failing_fetch)
+        monkeypatch.setattr(tools, "get_stream_writer", lambda: lambda message: None)
+
+        for _ in range(2):
+            result = asyncio.run(
+                tools.get_acs_demographics.ainvoke({"zip_code": "10001"})
+            )
+            assert result.startswith("Error retrieving ACS data")
+        assert len(calls) == 2
+
+    def test_shared_failure_marks_every_turn(self, monkeypatch):
+        """Test that turns joining an in-flight failing call each see the failure"""
+        calls = []
+
+        async def failing_fetch(zcta):
+            calls.append(zcta)
+            await asyncio.sleep(0.05)
+            raise RuntimeError("Census unavailable")
+
+        monkeypatch.setattr(tools, "fetch_acs_zcta", failing_fetch)
+        monkeypatch.setattr(tools, "get_stream_writer", lambda: lambda message: None)
+
+        async def turn():
+            failures = tool_cache.watch_turn_failures()
+            await tools.get_acs_demographics.ainvoke({"zip_code": "10001"})
+            return failures
+
+        async def run():
+            return await asyncio.gather(turn(), turn())
+
+        first, second = asyncio.run(run())
+
+        assert len(calls) == 1
+        assert first == [True]
+        assert second == [True]
+
+
+def sse_frames(data):
+    """Split an SSE byte stream into (id, data) pairs, skipping comments"""
+    frames = []
+    for frame in data.split(b"\n\n"):
+        fields = dict(line.split(b": ", 1) for line in frame.split(b"\n") if line)
+        if b"data" in fields:
+            event_id = fields.get(b"id")
+            frames.append((event_id and event_id.decode(), json.loads(fields[b"data"])))
+    return frames
+
+
+def parse_sse(data):
+    """Decode the data frames in an SSE byte stream, skipping comments"""
+    return [event for _, event in sse_frames(data)]
+
+
+def stream_events(message, thread_id, user_id="u1"):
+    """Run one streamed turn and return its decoded SSE events"""
+
+    async def run():
+        chunks = [
+            chunk
+            async for chunk in agent_api._generate_stream_events(
+                message, thread_id, user_id
+            )
+        ]
+        return parse_sse(b"".join(chunks))
+
+    return asyncio.run(run())
+
+
+class TestFastPath:
+
+    def test_matches_single_tool_lookups(self):
+        """Test that simple lookups resolve to exactly one tool call"""
+        nsqi = match_fast_path("What's the NSQI score for 11211?")
+        pair = match_fast_path("compare 10001 vs 11211")
+        many = match_fast_path("Compare 10001, 11211 and 10454")
+
+        assert (nsqi.tool_name, nsqi.args) == (
+            "get_nsqi_prediction",
+            {"zip_code": "11211"},
+        )
+        assert pair.tool_name == "compare_neighborhoods"
+        assert many.args == {"zip_codes": ["10001", "11211", "10454"]}
+
+    def test_ambiguous_messages_fall_through(self):
+        """Test that open-ended or unknown-ZIP messages are left to the agent"""
+        assert match_fast_path("Is 11211 a good place to raise kids?") is None
+        assert match_fast_path("Income and trends for 11211") is None
+        assert match_fast_path("NSQI score for 99999") is None
+        assert match_fast_path("Which neighborhoods have the best score?") is None
+
+    def test_questions_about_a_lookup_fall_through(self):
+        """Test that explanatory, advisory or extra free-text messages reach the agent"""
+        for message in [
+            "why is 11211's score so low?",
+            "how is the grade for 11211 computed?",
+            "should I move to 11211 for the income?",
+            "explain the NSQI for 11211",
+            "NSQI for 11211 and is it safe at night?",
+            "my rent in 11211 is high, what's the income there?",
+        ]:
+            assert match_fast_path(message) is None, message
+
+        assert match_fast_path("11211's median income").tool_name == (
+            "get_acs_demographics"
+        )
+        assert match_fast_path("neighborhoods similar to 11211").tool_name == (
+            "find_similar_neighborhoods"
+        )
+        assert match_fast_path("Trends for ZIP 11211").tool_name == (
+            "get_neighborhood_trends"
+        )
+
+    def test_streams_templated_answer(self, monkeypatch):
+        """Test that a fast-path answer streams tool and done events without the LLM"""
+        recorded = []
+
+        class FakeAgent:
+            async def aupdate_state(self, config, values, as_node=None):
+                recorded.append((config, values["messages"]))
+
+            def astream(self, *args, **kwargs):
+                raise AssertionError("the LLM should not run")
+
+        monkeypatch.setattr(agent_api, "get_agent", lambda: FakeAgent())
+        monkeypatch.setattr(
+            tools,
+            "predict_nsqi_for_district",
+            lambda district: {
+                "community_district": district,
+                "percentile": 61.0,
+                "grade": "B",
+                "predicted_score": 0.4,
+            },
+        )
+
+        events = stream_events("NSQI for 11211", "t1")
+
+        assert [e["event"] for e in events] == [
+            "tool_call",
+            "tool_result",
+            "token",
+            "done",
+        ]
+        assert events[0]["tool_name"] == "get_nsqi_prediction"
+        assert "Grade: B" in events[-1]["final_message"]
+        config, messages = recorded[0]
+        assert config["configurable"]["thread_id"] == "u1:t1"
+        assert messages[-1].content == events[-1]["final_message"]
+
+    def test_tool_failure_falls_back_to_agent(self, monkeypatch):
+        """Test that a tool's transient error is handed to the agent, not streamed as the answer"""
+
+        def broken_prediction(district):
+            raise RuntimeError("model unavailable")
+
+        monkeypatch.setattr(tools, "predict_nsqi_for_district", broken_prediction)
+        recorded = []
+
+        async def record_turn(config, message, turn):
+            recorded.append(turn)
+
+        monkeypatch.setattr(agent_api, "_record_turn", record_turn)
+
+        turn = asyncio.run(agent_api._try_fast_path("NSQI for 11211", {}))
+
+        assert match_fast_path("NSQI for 11211") is not None
+        assert turn is None
+        assert recorded == []
+
+
+def bag_of_words(text):
+    """Tiny deterministic stand-in for a sentence embedding model"""
+    import numpy as np
+
+    vocab = ["nsqi", "score", "quality", "safe", "income", "brooklyn", "best"]
+    words = text.lower().replace("?", "").split()
+    vec = np.array([float(w in words) for w in vocab])
+    return vec / (np.linalg.norm(vec) or 1.0)
+
+
+class TestResponseCache:
+
+    def test_rewordings_share_an_entry(self, monkeypatch):
+        """Test that punctuation, case and filler words don't change the key but numbers do"""
+        cache = ResponseCache()
+        cache.store("Show me the best areas in Brooklyn under 2000?", "Park Slope", [])
+
+        assert cache.lookup("best areas in brooklyn under 2000").answer == "Park Slope"
+        assert cache.lookup("Best areas in Brooklyn under 3000?") is None
+
+        monkeypatch.setattr(acs, "ACS_DATA_VERSION", acs.ACS_DATA_VERSION + 1)
+        assert cache.lookup("best areas in brooklyn under 2000") is None
+        assert cache.stats()["invalidations"] == 1
+
+    def test_different_questions_do_not_collide(self):
+        """Test that question words and modals stay part of the key"""
+        cache = ResponseCache()
+        cache.store("What is 11211?", "A ZIP code in Williamsburg", [])
+
+        assert cache.lookup("What can I do in 11211?") is None
+        assert cache.lookup("Which is 11211?") is None
+        assert cache.lookup("what is 11211").answer == "A ZIP code in Williamsburg"
+
+    def test_semantic_match_requires_same_numbers(self):
+        """Test that similar embeddings hit only when the ZIP codes match"""
+        cache = ResponseCache(similarity=0.8, embedder=bag_of_words)
+        cache.store("NSQI score for 11211", "Grade B", [])
+
+        assert cache.lookup("quality score nsqi 11211?").answer == "Grade B"
+        assert cache.lookup("quality score nsqi 11222?") is None
+        assert cache.stats()["semantic_hits"] == 1
+
+    def test_hit_replays_sse_sequence(self, monkeypatch):
+        """Test that a repeated first-turn question is replayed without running the agent"""
+        from langchain.agents import create_agent
+
+        graph = create_agent(
+            model=ToolCallingFakeModel(messages=scripted_turns(1)),
+            tools=[lookup],
+            checkpointer=BoundedCheckpointSaver(persist=False),
+        )
+        cache = ResponseCache()
+        monkeypatch.setattr(agent_api, "get_agent", lambda: graph)
+        monkeypatch.setattr(agent_api, "get_response_cache", lambda: cache)
+        monkeypatch.setattr(get_settings(), "AGENT_RESPONSE_CACHE", True)
+
+        first = stream_events("Tell me about lookups", "t1")
+        replay = stream_events("tell me about lookups, please!", "t2")
+
+        def kinds(events):
+            return [
+                e["event"]
+                for e in events
+                if e["event"] not in ("token", "tool_call_start")
+            ]
+
+        assert kinds(first) == ["tool_call", "tool_result", "done"]
+        assert kinds(replay) == kinds(first)
+        assert replay[-1]["final_message"] == first[-1]["final_message"]
+        assert first[-1]["final_message"].strip() == "answer 0"
+        call_ids = [
+            next(e["tool_call_id"] for e in events if e["event"] == "tool_call")
+            for events in (first, replay)
+        ]
+        assert call_ids[0] != call_ids[1]
+        assert cache.stats()["hits"] == 1
+
+        config = {"configurable": {"thread_id": "u1:t2"}}
+        messages = graph.get_state(config).values["messages"]
+        assert [m.type for m in messages] == ["human", "ai", "tool", "ai"]
+
+
+class TestFakeModel:
+
+    def test_streams_tool_call_and_answer(self, monkeypatch):
+        """Test that AGENT_MODEL=fake runs a full tool-calling turn without an API key"""
+        from app.agent.agent import create_neighborhood_agent
+
+        settings = get_settings()
+        monkeypatch.setattr(settings, "AGENT_MODEL", "fake")
+        monkeypatch.setattr(settings, "AGENT_FAKE_TOKEN_DELAY", 0.0)
+        monkeypatch.setattr(settings, "AGENT_FAKE_RESPONSE_TOKENS", 12)
+        monkeypatch.setattr(settings, "AGENT_FAST_PATH", False)
+        monkeypatch.setattr(
+            tools,
+            "predict_nsqi_for_district",
+            lambda district: {
+                "community_district": district,
+                "percentile": 61.0,
+                "grade": "B",
+                "predicted_score": 0.4,
+            },
+        )
+        graph = create_neighborhood_agent()
+        monkeypatch.setattr(agent_api, "get_agent", lambda: graph)
+
+        events = stream_events("Is 11211 a good place to live?", str(uuid.uuid4()))
+
+        kinds = [e["event"] for e in events]
+        assert (
+            kinds.index("tool_call") < kinds.index("tool_result") < kinds.index("token")
+        )
+        tokens = "".join(e["content"] for e in events if e["event"] == "token")
+        assert tokens == events[-1]["final_message"]
+        assert events[kinds.index("tool_call")]["tool_args"] == {"zip_code": "11211"}
+        assert "Grade: B" in events[kinds.index("tool_result")]["content"]
+        assert len(events[-1]["final_message"].split()) == 12
+
+
+async def scripted_events(*events, delay=0.0):
+    for event in events:
+        await asyncio.sleep(delay)
+        yield event
+
+
+class TestStreamEncoding:
+
+    def test_tokens_coalesced_into_frames(self):
+        """Test that back-to-back tokens share a frame while other events flush at once"""
+        tokens = [
+            {"event": "token", "content": f"w{i} ", "node": "model"} for i in range(50)
+        ]
+        events = scripted_events(
+            {
+                "event": "tool_call",
+                "tool_name": "t",
+                "tool_args": {},
+                "tool_call_id": "1",
+            },
+            *tokens,
+            {"event": "done", "final_message": "ünïcode"},
+        )
+
+        async def run():
+            return [chunk async for chunk in encode_sse(events, flush_interval=10.0)]
+
+        chunks = asyncio.run(run())
+        decoded = parse_sse(b"".join(chunks))
+
+        assert len(chunks) == 3
+        assert [e["event"] for e in decoded] == ["tool_call", "token", "token", "done"]
+        assert decoded[1]["content"] + decoded[2]["content"] == "".join(
+            t["content"] for t in tokens
+        )
+        assert decoded[-1]["final_message"] == "ünïcode"
+
+    def test_heartbeat_and_byte_threshold(self):
+        """Test that idle streams get keep-alive comments and large batches flush early"""
+        big = [{"event": "token", "content": "x" * 300, "node": "model"}] * 3
+
+        async def run(events, **kwargs):
+            return [chunk async for chunk in encode_sse(events, **kwargs)]
+
+        idle = asyncio.run(
+            run(
+                scripted_events({"event": "done"}, delay=0.05),
+                heartbeat_interval=0.01,
+            )
+        )
+        flushed = asyncio.run(
+            run(scripted_events(*big), flush_interval=10.0, flush_bytes=500)
+        )
+
+        assert idle[0] == HEARTBEAT
+        assert parse_sse(idle[-1]) == [{"event": "done"}]
+        assert len(flushed) == 2
+
+
+class TestConcurrency:
+
+    def test_per_user_limit_queues_and_rejects(self):
+        """Test that a busy user waits, other users still start, and a full queue is rejected"""
+
+        async def run():
+            limiter = ConcurrencyLimiter(max_active=2, max_per_key=1, max_waiting=1)
+            first = await limiter.acquire("alice")
+            waiting = asyncio.ensure_future(limiter.acquire("alice"))
+            await asyncio.sleep(0)
+            other = await limiter.acquire("bob")
+            with pytest.raises(ConcurrencyLimitExceeded) as rejected:
+                await limiter.acquire("carol")
+
+            assert not waiting.done()
+            first.release()
+            second = await waiting
+            assert second.key == "alice"
+            for lease in (second, other):
+                lease.release()
+            return limiter.stats(), rejected.value
+
+        stats, rejected = asyncio.run(run())
+
+        assert rejected.retry_after >= 1
+        assert stats["active"] == 0
+        assert stats["rejected"] == 1
+        assert stats["queued"] == 1
+
+    def test_slot_granted_as_wait_times_out_is_returned(self, monkeypatch):
+        """Test that a slot granted in the same tick as the timeout isn't leaked"""
+
+        async def run():
+            limiter = ConcurrencyLimiter(max_active=1, max_per_key=1)
+            first = await limiter.acquire("alice")
+
+            async def grant_then_time_out(future, timeout):
+                first.release()
+                assert future.done()
+                raise TimeoutError
+
+            monkeypatch.setattr(asyncio, "wait_for", grant_then_time_out)
+            with pytest.raises(ConcurrencyLimitExceeded):
+                await limiter.acquire("bob")
+            return limiter.stats()
+
+        stats = asyncio.run(run())
+
+        assert stats["active"] == 0
+        assert stats["timeouts"] == 1
+
+    def test_busy_stream_returns_429(self, client, monkeypatch):
+        """Test that a chat stream over the limit gets 429 with Retry-After"""
+        full = ConcurrencyLimiter(max_active=0, max_waiting=0)
+        monkeypatch.setattr(agent_api, "AGENT_LIMITER", full)
+        client.app.dependency_overrides[get_current_user] = lambda: {"id": 1}
+        try:
+            response = client.post("/api/agent/chat/stream", json={"message": "hi"})
+        finally:
+            client.app.dependency_overrides.pop(get_current_user)
+
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+
+    def test_disconnect_cancels_run(self):
+        """Test that a client disconnect cancels the producer"""
+        progress = []
+
+        async def endless_run():
+            try:
+                while True:
+                    progress.append("token")
+                    yield {"event": "token", "content": "x", "node": "model"}
+                    await asyncio.sleep(0.01)
+            finally:
+                progress.append("cancelled")
+
+        async def run():
+            response = EventStreamResponse(encode_sse(endless_run(), flush_interval=0))
+
+            async def receive():
+                await asyncio.sleep(0.05)
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                pass
+
+            scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+            await asyncio.wait_for(response(scope, receive, send), 1)
+
+        asyncio.run(run())
+
+        assert progress[-1] == "cancelled"
+        assert 0 < progress.count("token") < 20
+
+
+class TestResume:
+
+    def test_reconnect_replays_missed_events(self):
+        """Test that resuming from the last seen ID replays the rest of the same run"""
+        produced = []
+
+        async def slow_run():
+            for i in range(10):
+                produced.append(i)
+                yield {"event": "token", "content": str(i), "node": "model"}
+                await asyncio.sleep(0.005)
+            yield {"event": "done"}
+
+        async def read(stream, limit=None):
+            frames = []
+            async for chunk in stream:
+                frames.extend(sse_frames(chunk))
+                if limit and len(frames) >= limit:
+                    await stream.aclose()
+                    break
+            return frames
+
+        async def run():
+            streams = StreamRegistry(resume_window=1)
+            run = streams.start("u1:t1", slow_run())
+            first = await read(encode_sse(run.subscribe(), flush_interval=0), limit=3)
+            # The run keeps going while the client is away
+            await asyncio.sleep(0.02)
+            after = run.parse_event_id(first[-1][0])
+            rest = await read(encode_sse(run.subscribe(after), flush_interval=0))
+            return streams.stats(), first, rest
+
+        stats, first, rest = asyncio.run(run())
+
+        contents = [event.get("content") for _, event in first + rest]
+        assert contents == [str(i) for i in range(10)] + [None]
+        assert len({event_id for event_id, _ in first + rest}) == 11
+        assert produced == list(range(10))
+        assert stats["started"] == 1
+        assert stats["cancelled"] == 0
+
+    def test_abandoned_run_cancelled_after_window(self):
+        """Test that a run with no client is cancelled once the resume window passes"""
+        progress = []
+        released = []
+
+        async def endless_run():
+            try:
+                while True:
+                    progress.append("token")
+                    yield {"event": "token", "content": "x", "node": "model"}
+                    await asyncio.sleep(0.005)
+            finally:
+                progress.append("cancelled")
+
+        async def run():
+            streams = StreamRegistry(resume_window=0.05)
+            run = streams.start(
+                "u1:t1", endless_run(), on_finish=lambda: released.append(1)
+            )
+            stream = run.subscribe()
+            await anext(stream)
+            await stream.aclose()
+            await asyncio.sleep(0.02)
+            assert not run.finished
+            await asyncio.sleep(0.1)
+            return run.finished, streams.stats()
+
+        finished, stats = asyncio.run(run())
+
+        assert finished
+        assert progress[-1] == "cancelled"
+        assert released == [1]
+        assert stats["cancelled"] == 1
+
+    def test_unknown_event_id_returns_410(self, client):
+        """Test that resuming a run that no longer exists gets 410"""
+        client.app.dependency_overrides[get_current_user] = lambda: {"id": 1}
+        try:
+            response = client.post(
+                "/api/agent/chat/stream",
+                json={"message": "hi", "thread_id": "gone"},
+                headers={"Last-Event-ID": "abc-3"},
+            )
+        finally:
+            client.app.dependency_overrides.pop(get_current_user)
+
+        assert response.status_code == 410
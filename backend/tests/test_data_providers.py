@@ -0,0 +1,80 @@
+import os
+
+import pandas as pd
+import pytest
+
+from app import data_providers
+from app.core.config import get_settings
+from app.data_providers import (
+    DataProvider,
+    ExcelDataProvider,
+    SnapshotDataProvider,
+    SyntheticDataProvider,
+    get_data_provider,
+)
+
+FEATURES = ["year", "median_rent", "crime_rate", "transit_score"]
+
+
+class TestDataProviders:
+
+    def test_get_data_provider(self, monkeypatch, tmp_path):
+        """Test that get_data_provider picks the provider by name and rejects unknown ones"""
+        assert isinstance(get_data_provider("excel"), ExcelDataProvider)
+        assert isinstance(get_data_provider("Synthetic"), SyntheticDataProvider)
+
+        monkeypatch.setattr(
+            get_settings(), "DATA_SNAPSHOT_PATH", str(tmp_path / "s.pkl")
+        )
+        provider = get_data_provider("snapshot")
+        assert isinstance(provider, SnapshotDataProvider)
+        assert provider.path == tmp_path / "s.pkl"
+
+        monkeypatch.setattr(get_settings(), "DATA_PROVIDER", "synthetic")
+        assert isinstance(get_data_provider(), SyntheticDataProvider)
+
+        with pytest.raises(ValueError, match="parquet"):
+            get_data_provider("parquet")
+        with pytest.raises(TypeError):
+            DataProvider()
+
+    def test_synthetic_columns_and_determinism(self):
+        """Test that the synthetic provider has the model's columns and repeats itself"""
+        df = SyntheticDataProvider().load(FEATURES)
+
+        for col in FEATURES + [
+            "community_district",
+            "name",
+            "month",
+            "quality_score",
+            "quality_index_0_100",
+            "quality_percentile_month",
+            "quality_score_t_plus_6m",
+        ]:
+            assert col in df.columns
+        assert len(df) == len(SyntheticDataProvider.DISTRICTS) * 25
+        assert df["quality_index_0_100"].between(0, 100).all()
+        pd.testing.assert_frame_equal(df, SyntheticDataProvider().load(FEATURES))
+        assert not df.equals(SyntheticDataProvider(seed=1).load(FEATURES))
+
+    def test_snapshot_round_trip(self, monkeypatch, tmp_path):
+        """Test that a written snapshot is read back and rebuilt once a workbook changes"""
+        folder = tmp_path / "raw"
+        folder.mkdir()
+        workbook = folder / "BK01.xlsx"
+        workbook.touch()
+        df = SyntheticDataProvider().load(FEATURES)
+        provider = SnapshotDataProvider(tmp_path / "snap" / "furman.pkl", folder)
+
+        provider.write(df)
+        assert os.listdir(tmp_path / "snap") == ["furman.pkl"]
+        pd.testing.assert_frame_equal(provider.load(FEATURES), df)
+
+        # A workbook edited after the snapshot forces a rebuild from Excel
+        mtime = workbook.stat().st_mtime - 10
+        os.utime(provider.path, (mtime, mtime))
+        rebuilt = df.head(3)
+        monkeypatch.setattr(ExcelDataProvider, "load", lambda self, cols: rebuilt)
+        pd.testing.assert_frame_equal(provider.load(FEATURES), rebuilt)
+        assert provider.is_fresh()
+        pd.testing.assert_frame_equal(pd.read_pickle(provider.path), rebuilt)
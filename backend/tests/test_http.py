@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core import http
+
+
+async def _client():
+    return http.get_http_client()
+
+
+class TestHttpClient:
+
+    def test_run_sync_result_and_errors(self):
+        """Test that run_sync returns the coroutine's result and re-raises its errors"""
+
+        async def where():
+            return threading.current_thread().name
+
+        async def fail():
+            raise ValueError("boom")
+
+        assert http.run_sync(where()) == "http-client-loop"
+        with pytest.raises(ValueError, match="boom"):
+            http.run_sync(fail())
+        # The loop thread survives the error
+        assert http.run_sync(where()) == "http-client-loop"
+
+        async def nested():
+            coro = where()
+            try:
+                http.run_sync(coro)
+            finally:
+                coro.close()
+
+        with pytest.raises(RuntimeError, match="deadlock"):
+            http.run_sync(nested())
+
+    def test_client_only_on_its_loop(self):
+        """Test that the client can't be used from another event loop"""
+        with pytest.raises(RuntimeError):
+            asyncio.run(_client())
+        assert asyncio.run(http.run_async(_client())) is http.run_sync(_client())
+
+    def test_close_and_recreate(self):
+        """Test that aclose_http_client closes the pool and the next use opens a new one"""
+        client = http.run_sync(_client())
+
+        asyncio.run(http.aclose_http_client())
+
+        assert client.is_closed
+        assert http._client is None
+        fresh = http.run_sync(_client())
+        assert fresh is not client
+        assert not fresh.is_closed
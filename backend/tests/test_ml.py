@@ -0,0 +1,193 @@
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import model_loader
+
+
+class TestSimilarDistricts:
+
+    def test_similar_excludes_self(self):
+        """Test that a district is never returned as similar to itself"""
+        result = model_loader.find_similar_districts("BK15", k=5)
+
+        codes = [s["community_district"] for s in result["similar"]]
+        assert "BK15" not in codes
+        assert len(codes) == 5
+
+    def test_similar_sorted_by_distance(self):
+        """Test that similar districts are ranked closest first"""
+        result = model_loader.find_similar_districts("bk 15", k=10)
+
+        distances = [s["distance"] for s in result["similar"]]
+        assert distances == sorted(distances)
+
+    def test_similar_unknown_district(self, client):
+        """Test that an unknown district returns 404"""
+        response = client.get("/api/ml/similar", params={"community_district": "XX99"})
+        assert response.status_code == 404
+
+
+class TestDistrictTrends:
+
+    def test_trends_direction(self):
+        """Test that the trend direction matches the quality score slope"""
+        result = model_loader.get_district_trends("BK15")
+        slope = result["quality"]["slope_per_year"]
+
+        if result["direction"] == "improving":
+            assert slope > 0
+        elif result["direction"] == "declining":
+            assert slope < 0
+
+    def test_trend_table_values(self):
+        """Test yoy, slope and volatility on a hand-built frame with missing months"""
+        months = pd.date_range("2020-01-01", "2022-01-01", freq="MS")
+        step = np.arange(len(months), dtype=float)
+        df = pd.DataFrame(
+            {
+                "community_district": "BK01",
+                "month": months,
+                "a": step,
+                # No value in the latest month
+                "b": np.where(step == 24, np.nan, step),
+                # No value a year before the latest month
+                "c": np.where(step == 12, np.nan, step),
+                "quality_score": step / 10,
+                "quality_index_0_100": step,
+            }
+        )
+
+        table = model_loader._build_trend_table(df, ["year", "a", "b", "c"])
+        a, b, c = (table.loc[("BK01", name)] for name in "abc")
+
+        assert a["latest"] == 24
+        assert a["yoy_change"] == 12
+        assert a["yoy_pct_change"] == 1
+        assert a["slope_per_year"] == pytest.approx(12)
+        assert a["volatility"] == pytest.approx(0)
+        assert np.isnan(b["latest"]) and np.isnan(b["yoy_change"])
+        assert c["latest"] == 24 and np.isnan(c["yoy_change"])
+        assert table.loc[("BK01", "quality_score"), "yoy_change"] == pytest.approx(1.2)
+
+    def test_trends_filter_indicator(self, client):
+        """Test that trends can be limited to specific indicators"""
+        response = client.get(
+            "/api/ml/trends",
+            params={"community_district": "BK15", "indicator": "quality_index_0_100"},
+        )
+        assert response.status_code == 200
+        assert [i["indicator"] for i in response.json()["indicators"]] == [
+            "quality_index_0_100"
+        ]
+
+    def test_trends_unknown_indicator(self, client):
+        """Test that an unknown indicator returns 404"""
+        response = client.get(
+            "/api/ml/trends",
+            params={"community_district": "BK15", "indicator": "not_a_column"},
+        )
+        assert response.status_code == 404
+
+
+class TestModelRegistry:
+
+    def test_model_info(self, client):
+        """Test that the active model version and load time are exposed"""
+        response = client.get("/api/ml/model")
+        assert response.status_code == 200
+        assert response.json()["version"] == model_loader.registry.active.version
+        assert response.json()["loaded_at"]
+
+    def test_reload_requires_token(self, client):
+        """Test that a reload without the admin token is rejected"""
+        response = client.post("/api/ml/reload")
+        assert response.status_code == 403
+
+    def test_incompatible_bundle_rejected(self):
+        """Test that a bundle expecting unknown columns is not activated"""
+        active = model_loader.registry.active
+        bundle = {"pipeline": active.model, "feature_columns": ["not_a_column"]}
+
+        try:
+            model_loader.LoadedModel(bundle, active.furman_df, active.model_path)
+            assert False
+        except ValueError:
+            pass
+
+        assert model_loader.registry.active is active
+
+    def test_reload_keeps_old_version_on_failure(self, tmp_path):
+        """Test that a failed reload keeps the active version and a good one is swapped in"""
+        active = model_loader.registry.active
+        registry = model_loader.ModelRegistry(model_path=active.model_path)
+        registry._active = active
+
+        def reload(name, feature_columns):
+            path = tmp_path / f"{name}.pkl"
+            bundle = {
+                "pipeline": active.model,
+                "feature_columns": feature_columns,
+                "version": name,
+            }
+            joblib.dump(bundle, path)
+            assert registry.reload(path, reload_dataset=False)
+            while registry.reloading:
+                time.sleep(0.01)
+
+        reload("incompatible", ["not_a_column"])
+        assert registry.active is active
+        assert "not_a_column" in registry.last_error
+
+        reload("compatible", active.feature_columns)
+        assert registry.active_version == "compatible"
+        assert registry.active.furman_df is active.furman_df
+        assert registry.last_error is None
+
+
+class TestModelVersions:
+
+    def _registry(self, tmp_path, monkeypatch, max_bytes):
+        active = model_loader.registry.active
+        for name in ("tuned", "compact"):
+            (tmp_path / f"nsqi_model_{name}.pkl").write_bytes(
+                active.model_path.read_bytes()
+            )
+        monkeypatch.setattr(model_loader, "ARTIFACTS_DIR", tmp_path)
+
+        registry = model_loader.ModelRegistry(max_bytes=max_bytes)
+        registry._active = active
+        return registry
+
+    def test_version_loaded_on_first_use(self, tmp_path, monkeypatch):
+        """Test that a version is loaded lazily and then reused"""
+        registry = self._registry(tmp_path, monkeypatch, max_bytes=1 << 30)
+
+        assert registry.status()["resident_versions"] == []
+        tuned = registry.get("tuned")
+        assert tuned.name == "tuned"
+        assert registry.get("tuned") is tuned
+        assert registry.get(None) is registry.active
+
+    def test_lru_eviction(self, tmp_path, monkeypatch):
+        """Test that the least recently used version is evicted over budget"""
+        registry = self._registry(tmp_path, monkeypatch, max_bytes=1)
+
+        registry.get("tuned")
+        registry.get("compact")
+
+        resident = [v["name"] for v in registry.status()["resident_versions"]]
+        assert resident == ["compact"]
+        assert registry.evictions == 1
+
+    def test_unknown_version(self, client):
+        """Test that an unknown model version returns 404"""
+        response = client.get(
+            "/api/ml/predict",
+            params={"community_district": "BK15"},
+            headers={"X-Model-Version": "does-not-exist"},
+        )
+        assert response.status_code == 404
@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import pandas as pd
+
+from app import main
+from app import warmup as warmup_module
+from app.agent import tool_cache, tools
+from app.warmup import Warmup
+
+
+class TestWarmup:
+
+    def test_optional_failures_still_ready(self):
+        """Test that every step is timed and only a required failure blocks readiness"""
+        ran = []
+
+        async def load_table():
+            ran.append("acs")
+
+        def broken_agent():
+            raise RuntimeError("no API key")
+
+        warmup = Warmup()
+        asyncio.run(
+            warmup.run(
+                [
+                    ("model", lambda: ran.append("model"), True),
+                    ("acs", load_table, False),
+                    ("agent", broken_agent, False),
+                ]
+            )
+        )
+
+        assert warmup.ready
+        assert ran == ["model", "acs"]
+        components = warmup.status()["components"]
+        assert components["agent"]["error"] == "RuntimeError: no API key"
+        assert components["model"]["error"] is None
+        assert all(c["seconds"] >= 0 for c in components.values())
+
+        failed = Warmup(max_attempts=1)
+        asyncio.run(failed.run([("model", broken_agent, True)]))
+        assert not failed.ready
+        assert failed.status()["status"] == "failed"
+
+    def test_required_step_retried(self):
+        """Test that a failed required step is retried with backoff until it loads"""
+        attempts = []
+
+        def flaky_model():
+            attempts.append(time.monotonic())
+            if len(attempts) < 3:
+                raise OSError("model file not there yet")
+
+        warmup = Warmup(retry_delay=0.05, max_retry_delay=0.1, max_attempts=5)
+        asyncio.run(
+            warmup.run([("model", flaky_model, True), ("agent", lambda: 1 / 0, False)])
+        )
+
+        assert warmup.ready
+        assert len(attempts) == 3
+        assert attempts[1] - attempts[0] >= 0.05
+        assert attempts[2] - attempts[1] >= 0.1
+        components = warmup.status()["components"]
+        assert components["model"]["attempts"] == 3
+        assert components["model"]["error"] is None
+        # Optional steps aren't retried
+        assert components["agent"]["attempts"] == 1
+
+    def test_tool_cache_warmed(self, monkeypatch):
+        """Test that the common searches are cached before the first user asks"""
+        calls = []
+
+        def search(**kwargs):
+            calls.append(kwargs)
+            return pd.DataFrame()
+
+        monkeypatch.setattr(tools.SEARCH_INDEX, "search", search)
+        monkeypatch.setattr(tools.SEARCH_INDEX, "_complete", True)
+        tool_cache.TOOL_CACHE.clear()
+
+        asyncio.run(warmup_module._warm_tool_cache())
+        assert len(calls) == 1 + len(tools.BOROUGH_CODES)
+
+        asyncio.run(tools.search_neighborhoods.ainvoke({"borough": "brooklyn"}))
+        assert len(calls) == 1 + len(tools.BOROUGH_CODES)
+
+    def test_ready_endpoint(self, client, monkeypatch):
+        """Test that /ready is 503 until warmup has finished"""
+        warmup = Warmup()
+        monkeypatch.setattr(main, "warmup", warmup)
+
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "warming_up"
+
+        asyncio.run(warmup.run([("model", lambda: None, True)]))
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+        assert "model" in response.json()["components"]
@@ -6,6 +6,7 @@ import {
   BarChart3, 
   Users, 
   MapPin,
+  TrendingUp,
   CheckCircle2,
   Loader2,
   AlertCircle
@@ -46,6 +47,14 @@ const TOOL_META: Record<string, {
     bgColor: "bg-amber-50 dark:bg-amber-900/20 border-amber-200 dark:border-amber-800",
     getDescription: (args) => `Comparing ${args.zip_code_a || "..."} vs ${args.zip_code_b || "..."}`,
   },
+  compare_many_neighborhoods: {
+    icon: BarChart3,
+    label: "Comparison",
+    color: "text-amber-600 dark:text-amber-400",
+    bgColor: "bg-amber-50 dark:bg-amber-900/20 border-amber-200 dark:border-amber-800",
+    getDescription: (args) =>
+      `Comparing ${Array.isArray(args.zip_codes) ? args.zip_codes.join(", ") : "..."}`,
+  },
   search_neighborhoods: {
     icon: Search,
     label: "Search",
@@ -62,6 +71,20 @@ const TOOL_META: Record<string, {
         : "Searching neighborhoods...";
     },
   },
+  find_similar_neighborhoods: {
+    icon: MapPin,
+    label: "Similar Areas",
+    color: "text-teal-600 dark:text-teal-400",
+    bgColor: "bg-teal-50 dark:bg-teal-900/20 border-teal-200 dark:border-teal-800",
+    getDescription: (args) => `Finding areas similar to ZIP ${args.zip_code || "..."}`,
+  },
+  get_neighborhood_trends: {
+    icon: TrendingUp,
+    label: "Trends",
+    color: "text-indigo-600 dark:text-indigo-400",
+    bgColor: "bg-indigo-50 dark:bg-indigo-900/20 border-indigo-200 dark:border-indigo-800",
+    getDescription: (args) => `Checking trends for ZIP ${args.zip_code || "..."}`,
+  },
 };
 
 const DEFAULT_META = {
@@ -29,7 +29,12 @@ type ToolCallStartEvent = { event: "tool_call_start"; tool_name: string; tool_ca
 type ToolCallEvent = { event: "tool_call"; tool_name: string; tool_args: Record<string, unknown>; tool_call_id: string };
 type ToolResultEvent = { event: "tool_result"; tool_name: string; content: string; tool_call_id: string };
 type CustomEvent = { event: "custom"; message: string };
-type DoneEvent = { event: "done"; thread_id: string; final_message: string };
+type DoneEvent = {
+  event: "done";
+  thread_id: string;
+  final_message: string;
+  tokens_saved?: number;
+};
 type ErrorEvent = { event: "error"; error: string; error_type?: string };
 
 type SSEEvent = 
@@ -224,64 +229,97 @@ export function useAgentChat(options: UseAgentChatOptions = {}): UseAgentChatRet
       // Get auth token
       const token = typeof window !== "undefined" ? localStorage.getItem("token") : null;
 
-      const response = await fetch(apiEndpoint, {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-          ...(token ? { Authorization: `Bearer ${token}` } : {}),
-        },
-        body: JSON.stringify({
-          message: content.trim(),
-          thread_id: threadId,
-        }),
-        signal: abortControllerRef.current.signal,
-      });
-
-      if (!response.ok) {
-        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-      }
-
-      // Get thread ID from response header if available
-      const responseThreadId = response.headers.get("X-Thread-ID");
-      if (responseThreadId) {
-        setThreadId(responseThreadId);
-      }
-
-      // Read the stream
-      const reader = response.body?.getReader();
-      if (!reader) {
-        throw new Error("No response body reader available");
-      }
+      // ID of the last event received, for resuming after a dropped connection
+      let lastEventId: string | null = null;
+      let streamThreadId = threadId;
+      let finished = false;
+
+      for (let attempt = 0; !finished; attempt++) {
+        const response = await fetch(apiEndpoint, {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+            ...(token ? { Authorization: `Bearer ${token}` } : {}),
+            ...(lastEventId ? { "Last-Event-ID": lastEventId } : {}),
+          },
+          body: JSON.stringify({
+            message: content.trim(),
+            thread_id: streamThreadId,
+          }),
+          signal: abortControllerRef.current.signal,
+        });
+
+        if (response.status === 429) {
+          const retryAfter = response.headers.get("Retry-After") ?? "a few";
+          throw new Error(`The assistant is busy. Please try again in ${retryAfter} seconds.`);
+        }
+        if (response.status === 410) {
+          throw new Error("The connection was lost and the response can't be resumed. Please try again.");
+        }
+        if (!response.ok) {
+          throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
 
-      const decoder = new TextDecoder();
-      let buffer = "";
+        // Get thread ID from response header if available
+        const responseThreadId = response.headers.get("X-Thread-ID");
+        if (responseThreadId) {
+          streamThreadId = responseThreadId;
+          setThreadId(responseThreadId);
+        }
 
-      while (true) {
-        const { done, value } = await reader.read();
-        if (done) break;
+        // Read the stream
+        const reader = response.body?.getReader();
+        if (!reader) {
+          throw new Error("No response body reader available");
+        }
 
-        buffer += decoder.decode(value, { stream: true });
-        
-        // Process complete lines
-        const lines = buffer.split("\n");
-        buffer = lines.pop() || ""; // Keep incomplete line in buffer
+        const decoder = new TextDecoder();
+        let buffer = "";
 
-        for (const line of lines) {
-          const trimmedLine = line.trim();
-          if (!trimmedLine || trimmedLine === "") continue;
-          
-          const event = parseSSELine(trimmedLine);
+        const handleLine = (line: string) => {
+          if (line.startsWith("id: ")) {
+            lastEventId = line.slice(4);
+            return;
+          }
+          const event = parseSSELine(line);
           if (event) {
+            if (event.event === "done" || event.event === "error") finished = true;
             processSSEEvent(event, assistantMessageId, toolCallsMap);
           }
+        };
+
+        try {
+          while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+
+            // Process complete lines
+            const lines = buffer.split("\n");
+            buffer = lines.pop() || ""; // Keep incomplete line in buffer
+
+            for (const line of lines) {
+              const trimmedLine = line.trim();
+              if (!trimmedLine) continue;
+              handleLine(trimmedLine);
+            }
+          }
+        } catch (err) {
+          // The connection dropped mid-response: resume from the last event
+          if (err instanceof Error && err.name === "AbortError") throw err;
+          if (!lastEventId || attempt >= 2) throw err;
+          continue;
+        }
+
+        // Process any remaining buffer
+        if (buffer.trim()) {
+          handleLine(buffer.trim());
         }
-      }
 
-      // Process any remaining buffer
-      if (buffer.trim()) {
-        const event = parseSSELine(buffer.trim());
-        if (event) {
-          processSSEEvent(event, assistantMessageId, toolCallsMap);
+        // The server closed the stream early: resume unless there is nothing to resume
+        if (!finished && (!lastEventId || attempt >= 2)) {
+          finished = true;
         }
       }
 